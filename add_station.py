@@ -1,108 +1,179 @@
 import os
+import time
 from linebot.models import TextSendMessage
-from station_data import STATION_COORDINATES
+from station_index import station_index
 from pin import send_map_with_pins
+from profile_cache import profile_cache, PROFILE_WARMUP
+from advantage import start_game_logic
+from prerender import MAP_PRERENDER, prerenderer
+from map_crop import MAP_CROP, render_cropped_map
+from chat_locks import chat_locks
+from metrics import REGISTRATION_SECONDS, ROUND_COMPLETE_SECONDS, REPORTS, REJECTED_INPUTS, ROUNDS_COMPLETED
 
-def handle_registration_logic(event, line_bot_api, participant_data, users_participated, USER_CONFIG, REQUIRED_USERS):
-    text = event.message.text.strip()
+def get_chat_id(source):
+    if source.type == 'group':
+        return source.group_id
+    elif source.type == 'room':
+        return source.room_id
+    return source.user_id
 
-    # 1. チャットIDとユーザー情報の取得
-    if event.source.type == 'group':
-        chat_id = event.source.group_id
-    elif event.source.type == 'room':
-        chat_id = event.source.room_id
-    else:
-        chat_id = event.source.user_id
+def handle_chat_reports(events, line_bot_api, state_store, USER_CONFIG, REQUIRED_USERS):
+    """1回のWebhookで届いた同じチャットの報告をまとめて処理する
+
+    報告は届いた順にストアへ反映し、人数が揃った時点でそのラウンドを締める
+    （同じ配信で後から届いた報告は、1件ずつ届いたときと同じく次のラウンドに入る）。
+    地図は人数を揃えた報告への返信として送り、ほかの報告にはそれぞれの受付結果を返す。
+    """
+    chat_id = get_chat_id(events[0].source)
+    results = []
+    # 揃ったラウンドごとの (揃えた報告, その処理時間, 参加者, 描き方)
+    completed = []
+    # 最後に締めたラウンドのあとに受け付けた報告があるか（途中経過の地図を描き進める）
+    pending = False
+
+    # 表示名の問い合わせ（LINE API）はロックを取る前に済ませておく
+    usernames = [_display_name(event, line_bot_api) for event in events]
+
+    # 状態の確認と更新は同じチャットの中で1つずつ（返信と地図の送信はロックの外で行う）
+    with chat_locks.hold(chat_id):
+        for event, username in zip(events, usernames):
+            start = time.perf_counter()
+            outcome, reply_text, count = _apply_report(event, username, line_bot_api, state_store, USER_CONFIG, REQUIRED_USERS)
+            elapsed = time.perf_counter() - start
+            results.append((event, outcome, reply_text, elapsed))
+            if outcome != "accepted":
+                continue
+            pending = True
+            if count < REQUIRED_USERS:
+                continue
+
+            # 揃った時点の参加者を取り出してリセット（二重に描画されないようストア側で一度だけ）
+            participants = state_store.complete_round(chat_id, REQUIRED_USERS)
+            if participants is None:
+                continue
+            render = None
+            if MAP_CROP:
+                # ピンのまわりだけを描く（描きかけの全体の地図は使わない）
+                render = render_cropped_map
+            elif MAP_PRERENDER:
+                # 描きかけの地図はここで受け取る（次のラウンドの報告で上書きされないように）
+                render = prerenderer.take(chat_id)
+            completed.append((event, elapsed, participants, render))
+            pending = False
+
+        if pending and MAP_PRERENDER and not MAP_CROP:
+            # 途中経過の地図を裏で描き進めておく（最後の報告では差分だけ描けばよい）
+            prerenderer.submit(chat_id, state_store.get_participants(chat_id))
 
-    user_id = event.source.user_id
+    # 地図より先に、ほかの報告への返信を済ませる
+    triggers = {id(trigger) for trigger, _, _, _ in completed}
+    for event, outcome, reply_text, elapsed in results:
+        if id(event) in triggers:
+            continue
+        start = time.perf_counter()
+        try:
+            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_text))
+        except Exception as e:
+            # 1件の返信に失敗しても、ほかの返信と地図の送信は続ける
+            print(f"返信に失敗: {e}")
+        REGISTRATION_SECONDS.observe(elapsed + time.perf_counter() - start, outcome)
+
+    for trigger, trigger_elapsed, participants, render in completed:
+        start = time.perf_counter()
+        with ROUND_COMPLETE_SECONDS.time():
+            send_map_with_pins(chat_id, participants, line_bot_api, reply_token=trigger.reply_token, render=render)
+        ROUNDS_COMPLETED.inc()
+        REGISTRATION_SECONDS.observe(trigger_elapsed + time.perf_counter() - start, "completed")
+
+
+def _display_name(event, line_bot_api):
     try:
-        if event.source.type == 'group':
-            profile = line_bot_api.get_group_member_profile(chat_id, user_id)
-        else:
-            profile = line_bot_api.get_profile(user_id)
-        username = profile.display_name
+        # 表示名はキャッシュ優先（訂正のたびにLINEへ問い合わせない）
+        return profile_cache.get_display_name(
+            line_bot_api, event.source.type, get_chat_id(event.source), event.source.user_id)
     except Exception:
-        username = "Unknown User"
+        return "Unknown User"
+
+
+def _apply_report(event, username, line_bot_api, state_store, USER_CONFIG, REQUIRED_USERS):
+    """報告1件をストアに反映し、(結果, 返信文, 現在の人数) を返す（返信はしない）
+
+    結果は accepted / rejected / pass_denied のいずれか。
+    """
+    text = event.message.text.strip()
+
+    # 1. チャットIDの取得（表示名は呼び出し元で取得済み）
+    chat_id = get_chat_id(event.source)
 
     # ユーザー設定（チーム・本名）の取得
     config = USER_CONFIG.get(username, {"team": "白", "real_name": username})
     team = config["team"]
     real_name = config["real_name"]
 
-    # データの初期化
-    if chat_id not in participant_data:
-        participant_data[chat_id] = {}
-        users_participated[chat_id] = set()
-
     score_info = ""
 
     # --- 初回投稿（1人目）の処理 ---
-    if len(users_participated[chat_id]) == 0:
+    # まだ報告を1件も受け付けていない間は、届いたメッセージ（駅名でない雑談も含む）のたびにスコアを取り直す
+    # （少し古いだけなら前回の値をすぐ使って裏で取り直し、SCORE_CACHE_MAX_AGE より古ければ取り直した値を待つ）。
+    # パス枠は最初の報告を受け付けた時点で固まる（それ以降の set_pass_limits はストア側で無視される）
+    if state_store.participant_count(chat_id) == 0:
         try:
-            from advantage import start_game_logic
             score_msg, p_limit, m_teams = start_game_logic(event, line_bot_api)
             score_info = score_msg + "\n\n"
-            
-            team_pass_limits = {t: p_limit for t in m_teams}
-            participant_data[chat_id]["_rules"] = {
-                "team_pass_limits": team_pass_limits
-            }
+
+            # 取得に失敗したとき（対象チームなし）は、前に設定した枠を消さない
+            if m_teams:
+                state_store.set_pass_limits(chat_id, {t: p_limit for t in m_teams})
         except Exception:
             score_info = "スコア取得に失敗しましたが、受付を開始します！\n\n"
 
-    # 以前の状態を確認（パスの差し戻し判定用）
-    previous_data = participant_data[chat_id].get(username, {})
-    was_pass = previous_data.get("station") == "パス"
-    is_update = username in participant_data[chat_id]
-
     # --- 3. 駅名（またはパス）判定とデータ更新 ---
     display_text = ""
-    rules = participant_data[chat_id].get("_rules", {"team_pass_limits": {}})
-    limits = rules.get("team_pass_limits", {})
+    # 「渋谷駅」「ｇ０１」「しぶや」などの表記ゆれは正式な駅名に直す
+    station = station_index.lookup(text) if text != "パス" else None
 
     if text == "パス":
+        # パス枠の確認と消費はストア側でまとめて行う
+        result = state_store.report_pass(chat_id, username, team)
+        status = result["status"]
+
         # すでにパスなら何もしない
-        if was_pass:
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"既にパスを受理しています。\n（{team}残り枠:{limits.get(team, 0)}）"))
-            return
-
-        if team not in limits:
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"❌{team}チームは現在パス権を持っていません。"))
-            return
-        if limits[team] <= 0:
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"⚠️{team}チームのパス枠は使い切られました！"))
-            return
-
-        # パス消費
-        limits[team] -= 1
-        participant_data[chat_id][username] = {"station": "パス"}
-        users_participated[chat_id].add(username)
-        display_text = f"パス（{team}残り枠:{limits[team]}）"
-    
-    elif text in STATION_COORDINATES:
-        # 【追加機能】以前がパスで、今回が駅名なら、パス枠を1つ戻す
-        if was_pass and team in limits:
-            limits[team] += 1
-        
-        participant_data[chat_id][username] = {"station": text}
-        users_participated[chat_id].add(username)
-        
+        if status == "already":
+            return "pass_denied", f"{score_info}既にパスを受理しています。\n（{team}残り枠:{result['remaining']}）", None
+        if status == "no_rights":
+            return "pass_denied", f"{score_info}❌{team}チームは現在パス権を持っていません。", None
+        if status == "exhausted":
+            return "pass_denied", f"{score_info}⚠️{team}チームのパス枠は使い切られました！", None
+
+        display_text = f"パス（{team}残り枠:{result['remaining']}）"
+        REPORTS.inc("pass")
+
+    elif station is not None:
+        # 以前がパスで、今回が駅名なら、パス枠を1つ戻す（ストア側で処理）
+        result = state_store.report_station(chat_id, username, team, station)
+
         # 枠を戻した場合はメッセージに反映
-        back_msg = f"（{team}パス枠を1つ戻しました。残り:{limits.get(team, 0)}）" if was_pass else ""
-        display_text = f"{text} {back_msg}".strip()
-    
+        back_msg = f"（{team}パス枠を1つ戻しました。残り:{result['remaining']}）" if result["was_pass"] else ""
+        display_text = f"{station} {back_msg}".strip()
+        REPORTS.inc("correction" if result["is_update"] else "station")
+
     else:
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"「{text}」は駅名リストにありません。"))
-        return
+        # 近い駅名があれば候補として返す（送り直しの手間を減らす）
+        suggestions = station_index.suggest(text)
+        hint = f"\nもしかして: {' / '.join(suggestions)}" if suggestions else ""
+        REPORTS.inc("rejected")
+        REJECTED_INPUTS.inc("yes" if suggestions else "no")
+        return "rejected", f"{score_info}「{text}」は駅名リストにありません。{hint}", None
 
-    # 人数チェックと送信
-    current_count = len(users_participated[chat_id])
+    is_update = result["is_update"]
 
-    if current_count >= REQUIRED_USERS:
-        send_map_with_pins(chat_id, participant_data[chat_id], line_bot_api, reply_token=event.reply_token)
-        participant_data[chat_id] = {}
-        users_participated[chat_id] = set()
-    else:
-        status_line = "【報告更新】" if is_update else "【報告受理】"
-        reply_text = f"{score_info}{status_line}\n名前: {real_name}\nチーム: {team}\n内容: {display_text}\n現在: {current_count} / {REQUIRED_USERS} 人"
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_text))
+    # ラウンド最初の報告（複数ワーカーでも count が1になるのは1回だけ）
+    if result["count"] == 1 and not is_update and PROFILE_WARMUP and event.source.type == 'group':
+        profile_cache.warmup_async(line_bot_api, chat_id)
+
+    # 人数チェック（地図の送信は handle_chat_reports でまとめて行う）
+    current_count = result["count"]
+
+    status_line = "【報告更新】" if is_update else "【報告受理】"
+    reply_text = f"{score_info}{status_line}\n名前: {real_name}\nチーム: {team}\n内容: {display_text}\n現在: {current_count} / {REQUIRED_USERS} 人"
+    return "accepted", reply_text, current_count
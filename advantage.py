@@ -1,15 +1,188 @@
+import os
+import json
+import sqlite3
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from metrics import SCORE_FETCH_SECONDS
+from env_config import env_float
+
+# 【重要】新しくデプロイして発行されたURLに貼り替えてください（環境変数 GAS_SCORE_URL でも指定できます）
+gas_url = os.environ.get('GAS_SCORE_URL')
+#もし点数を参照するならこのurlを有効にしてください
+# gas_url = "https://script.google.com/macros/s/AKfycby3NrsqlzHftyw9NdKa1mZ3UrJSRsnSMqDSWmnxsOn4DElSPefxVWdNIgCJ5DVc5jJg/exec"
+
+# オフラインでの確認用に、SCORE_SOURCE でローカルの取得元にも切り替えられます
+#   SCORE_SOURCE=file:scores.json   … {"red_score": .., "blue_score": .., "white_score": ..}
+#   SCORE_SOURCE=sqlite:scores.db   … scores(team, score) テーブル（team は red/blue/white）
+SCORE_SOURCE = os.environ.get('SCORE_SOURCE', '')
+
+SCORE_TIMEOUT = env_float('SCORE_TIMEOUT', 5.0)
+
+# 前回取得できたスコアをそのまま使う秒数（過ぎたら前回の値を返しつつ、裏で取り直す）
+SCORE_CACHE_TTL = env_float('SCORE_CACHE_TTL', 60.0)
+
+# 前回の値を返してよい上限の秒数。これより古ければ返さず、取り直した値を待つ
+# （前のラウンドのスコアでパス枠を決めてしまわないように）
+SCORE_CACHE_MAX_AGE = env_float('SCORE_CACHE_MAX_AGE', 120.0)
+
+
+class GasScoreSource:
+    """GAS（Google Apps Script）から集計データを取得する"""
+
+    def __init__(self, url, timeout=SCORE_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        # 接続を使い回すセッション（fork後に初めて使うプロセスで作る）
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=1)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def fetch(self):
+        if not self.url:
+            raise RuntimeError("GAS_SCORE_URL が設定されていません")
+        # (接続, 読み取り) のタイムアウト。GASはリダイレクトを挟むので読み取りを長めに
+        response = self._get_session().get(
+            self.url, allow_redirects=True, timeout=(min(3.0, self.timeout), self.timeout))
+        return response.json()
+
+
+class FileScoreSource:
+    """ローカルのJSONファイルからスコアを読む（オフライン確認用）"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+class SQLiteScoreSource:
+    """ローカルのSQLiteからスコアを読む（オフライン確認用）"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute("SELECT team, score FROM scores").fetchall()
+        finally:
+            conn.close()
+        return {f"{team}_score": score for team, score in rows}
+
+
+def create_score_source(spec=SCORE_SOURCE):
+    if spec.startswith("file:"):
+        return FileScoreSource(spec[len("file:"):])
+    if spec.startswith("sqlite:"):
+        return SQLiteScoreSource(spec[len("sqlite:"):])
+    return GasScoreSource(gas_url)
+
+
+class ScoreFetcher:
+    """スコア取得元の前に置くキャッシュ
+
+    ttl までは前回の値をそのまま返す。ttl を過ぎて max_age までは前回の値を返しつつ裏で取り直す
+    （次の呼び出しから新しい値になる）。max_age を過ぎた値やまだ取得できていないときは、取得元の応答を待つ。
+    """
+
+    def __init__(self, source, ttl=SCORE_CACHE_TTL, max_age=SCORE_CACHE_MAX_AGE):
+        self.source = source
+        self.ttl = ttl
+        self.max_age = max(ttl, max_age)
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self._inflight = None
+
+    def _fetch_and_store(self):
+        res = self.source.fetch()
+        # GAS側のエラー応答はキャッシュしない
+        if "error" not in res:
+            with self._lock:
+                self._cached = res
+                self._cached_at = time.monotonic()
+        return res
+
+    def prefetch(self):
+        """バックグラウンドで取得を始める（すでに取得中なら何もしない）"""
+        with self._lock:
+            if self._inflight is not None and self._inflight.is_alive():
+                return
+            thread = threading.Thread(target=self._prefetch, name="score-prefetch", daemon=True)
+            self._inflight = thread
+        thread.start()
+
+    def _prefetch(self):
+        try:
+            self._fetch_and_store()
+        except Exception as e:
+            print(f"スコアの先読みに失敗: {e}")
+
+    def get(self):
+        start = time.perf_counter()
+        with self._lock:
+            res, age = self._cached, time.monotonic() - self._cached_at
+        if res is not None and age <= self.ttl:
+            SCORE_FETCH_SECONDS.observe(time.perf_counter() - start, "cache")
+            return res
+        if res is not None and age <= self.max_age:
+            # 前回の値を返し、裏で取り直す
+            self.prefetch()
+            SCORE_FETCH_SECONDS.observe(time.perf_counter() - start, "stale")
+            return res
+
+        # まだ取得できていないか、古すぎる。先読み中ならそれを待つ（二重に問い合わせない）
+        with self._lock:
+            inflight = self._inflight
+        if inflight is not None and inflight.is_alive():
+            inflight.join(self.source_timeout())
+            with self._lock:
+                res, age = self._cached, time.monotonic() - self._cached_at
+            if res is not None and age <= self.max_age:
+                SCORE_FETCH_SECONDS.observe(time.perf_counter() - start, "prefetch")
+                return res
+        try:
+            res = self._fetch_and_store()
+        except Exception:
+            SCORE_FETCH_SECONDS.observe(time.perf_counter() - start, "error")
+            raise
+        SCORE_FETCH_SECONDS.observe(time.perf_counter() - start, "fetch")
+        return res
+
+    def source_timeout(self):
+        return getattr(self.source, "timeout", SCORE_TIMEOUT)
+
+
+score_fetcher = ScoreFetcher(create_score_source())
+
+
+def prefetch_scores():
+    """スコアを裏で取りに行く（ワーカーの起動時に、最初のラウンドで待たせないため）"""
+    source = score_fetcher.source
+    if isinstance(source, GasScoreSource) and not source.url:
+        return
+    score_fetcher.prefetch()
+
 
 def start_game_logic(event, line_bot_api):
-    # 【重要】新しくデプロイして発行されたURLに貼り替えてください
-    #もし点数を参照するならこのurlを有効にしてください
-    # gas_url = "https://script.google.com/macros/s/AKfycby3NrsqlzHftyw9NdKa1mZ3UrJSRsnSMqDSWmnxsOn4DElSPefxVWdNIgCJ5DVc5jJg/exec"
-    
     try:
-        # GASから集計データを取得
-        response = requests.get(gas_url, allow_redirects=True)
-        res = response.json()
-        
+        # GAS（または設定したローカルの取得元）から集計データを取得
+        res = score_fetcher.get()
+
         # GAS側でエラーが発生していないかチェック
         if "error" in res:
             print(f"GASエラー報告: {res['error']}")
@@ -19,13 +192,13 @@ def start_game_logic(event, line_bot_api):
         red_score = res.get("red_score", 0)
         blue_score = res.get("blue_score", 0)
         white_score = res.get("white_score", 0)
-        
+
         score_dict = {
             "赤": red_score,
             "青": blue_score,
             "白": white_score
         }
-        
+
         # 判定ロジック
         max_val = max(score_dict.values())
         min_val = min(score_dict.values())
@@ -53,7 +226,7 @@ def start_game_logic(event, line_bot_api):
             f"🐢最下位: {min_teams_str}チーム\n"
             f"🎁特典: 対象チームは各【 {pass_limit}人 】までパス可能です！"
         )
-        
+
         return message, pass_limit, min_teams
 
     except Exception as e:
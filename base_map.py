@@ -0,0 +1,118 @@
+import os
+import threading
+from PIL import Image
+from env_config import env_int_list
+
+# 路線図（背景）画像のパスと加工設定
+BASE_MAP_PATH = os.path.join(os.path.dirname(__file__), "Rosenzu.png")
+BASE_MAP_ALPHA = 0.7
+
+# 縮小した背景を先に作っておく幅（出力サイズそのものは main.warmup で加わる）
+# 低速回線向けの小さい地図は、この中から選ぶ
+BASE_MAP_LEVEL_WIDTHS = sorted(set(env_int_list('BASE_MAP_LEVEL_WIDTHS', [1280, 1024, 640])))
+
+_lock = threading.Lock()
+# (ファイルの署名, 加工済み画像) の組を丸ごと差し替えて更新する
+_cache = (None, None)
+# 縮小した背景（(元の背景の署名, {サイズ: 画像})）。元の背景が変わったら作り直す
+_levels_lock = threading.Lock()
+_levels = (None, {})
+
+
+def _file_signature(path):
+    # 更新時刻とサイズが変わっていればPNGが差し替えられたとみなす
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def open_source(path=BASE_MAP_PATH):
+    return Image.open(path).convert("RGBA")
+
+
+def composite_faded(orig_img):
+    # 背景の加工（70%の透明度で白背景に合成）。orig_img のアルファは書き換わる
+    target_alpha = int(255 * BASE_MAP_ALPHA)
+    orig_img.putalpha(Image.new('L', orig_img.size, color=target_alpha))
+    img = Image.new("RGBA", orig_img.size, (255, 255, 255, 255))
+    img.paste(orig_img, (0, 0), orig_img)
+    return img
+
+
+def _build_base_map(path):
+    return composite_faded(open_source(path))
+
+
+def load_base_map(path=BASE_MAP_PATH):
+    """加工済みの背景画像を返す（共有のキャッシュ本体なので書き換えないこと）"""
+    global _cache
+    signature = _file_signature(path)
+    cached_signature, cached_img = _cache
+    if cached_signature == signature and cached_img is not None:
+        return cached_img
+
+    with _lock:
+        cached_signature, cached_img = _cache
+        if cached_signature != signature or cached_img is None:
+            cached_img = _build_base_map(path)
+            _cache = (signature, cached_img)
+        return cached_img
+
+
+def base_map_signature():
+    return _cache[0]
+
+
+def level_size(base_size, width):
+    """元の背景を幅 width に縮小したときのサイズ（縦横比を保つ）"""
+    orig_w, orig_h = base_size
+    return width, max(1, round(orig_h * width / orig_w))
+
+
+def level_sizes(path=BASE_MAP_PATH):
+    """あらかじめ用意する背景のサイズ（元のサイズを含む、小さい順）"""
+    base_size = load_base_map(path).size
+    sizes = {level_size(base_size, w) for w in BASE_MAP_LEVEL_WIDTHS if 0 < w < base_size[0]}
+    return sorted(sizes | {base_size})
+
+
+def pick_level_size(max_width, path=BASE_MAP_PATH):
+    """幅が max_width 以下でいちばん大きい背景のサイズ（どれも大きければいちばん小さいもの）"""
+    sizes = level_sizes(path)
+    fitting = [size for size in sizes if size[0] <= max_width]
+    return fitting[-1] if fitting else sizes[0]
+
+
+def load_base_map_level(size, path=BASE_MAP_PATH):
+    """size に縮小した加工済みの背景を返す（共有のキャッシュ本体なので書き換えないこと）
+
+    縮小は背景ごと・サイズごとに一度だけ行い、描画のたびに画像全体を縮小し直さない。
+    """
+    global _levels
+    base = load_base_map(path)
+    size = tuple(size)
+    if size == base.size:
+        return base
+    signature = base_map_signature()
+    cached_signature, levels = _levels
+    img = levels.get(size) if cached_signature == signature else None
+    if img is not None:
+        return img
+
+    with _levels_lock:
+        cached_signature, levels = _levels
+        if cached_signature != signature:
+            levels = {}
+        img = levels.get(size)
+        if img is None:
+            img = base.resize(size, Image.LANCZOS)
+            # 読み取り側はロックを取らないので、辞書ごと差し替える
+            levels = dict(levels)
+            levels[size] = img
+            _levels = (signature, levels)
+        return img
+
+
+def build_pyramid(path=BASE_MAP_PATH, sizes=()):
+    """用意する背景（と sizes で指定したサイズ）をまとめて作っておく"""
+    for size in level_sizes(path) + list(sizes):
+        load_base_map_level(size, path)
@@ -0,0 +1,262 @@
+"""地図描画のベンチマーク
+
+LINE と画像の置き場所は偽物に差し替え、描画パイプラインだけを測る。
+
+    python -m benchmarks.bench_render --output bench_render.json
+    python -m benchmarks.bench_render --compare old.json --output new.json
+
+段階ごとの時間（load / composite / resize / draw / encode / upload）とメモリの最大値を
+ピン数ごとに（ケースごとに新しいプロセスで）測り、結果をJSONで保存する。--compare を付けると前回の結果との差を表示する。
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import PIL  # noqa: E402
+import base_map  # noqa: E402
+import pin  # noqa: E402
+from stations import STATIONS, STATION_XY  # noqa: E402
+from linebot.models import ImageSendMessage  # noqa: E402
+from metrics import RENDER_ERRORS  # noqa: E402
+from benchmarks.fakes import FakeLineBotApi, FakeUploader  # noqa: E402
+
+TEAMS = ["赤", "青", "白"]
+STAGES = ["load", "composite", "resize", "draw", "encode", "upload", "reply"]
+DEFAULT_PIN_COUNTS = [1, 5, 15, 50, 100, len(STATIONS)]
+
+
+def _register_players(n):
+    # pin.USER_CONFIG に架空のプレイヤーを足す（チームは順番に割り当てる）
+    names = []
+    for i in range(n):
+        name = f"bench_player_{i}"
+        pin.USER_CONFIG[name] = {"team": TEAMS[i % 3], "real_name": chr(0x3042 + i % 80) + "田"}
+        names.append(name)
+    return names
+
+
+def _dense_station_order():
+    # 都心（銀座あたり）から近い順。重なりの多いケース用
+    cx, cy = STATION_XY[[s.id for s in STATIONS if s.name == "銀座"][0]]
+    return sorted(range(len(STATIONS)), key=lambda i: (STATION_XY[i, 0] - cx) ** 2 + (STATION_XY[i, 1] - cy) ** 2)
+
+
+def make_participants(pins, scenario, seed=0):
+    """シナリオごとの参加者データ（{ユーザー名: {"station": 駅名}}）を作る
+
+    spread  : 1人1駅で散らばる
+    passes  : spread に加えて各チーム2人ずつパス
+    overlap : 都心の狭い範囲に、1駅あたり3人ずつ集まる
+    """
+    rng = random.Random(seed)
+    if scenario == "overlap":
+        stations = _dense_station_order()[:pins]
+        per_station = 3
+    else:
+        stations = rng.sample(range(len(STATIONS)), pins)
+        per_station = 1
+
+    players = _register_players(pins * per_station + (6 if scenario == "passes" else 0))
+    participants = {}
+    i = 0
+    for sid in stations:
+        for _ in range(per_station):
+            participants[players[i]] = {"station": STATIONS[sid].name}
+            i += 1
+    if scenario == "passes":
+        for name in players[i:]:
+            participants[name] = {"station": "パス"}
+    return participants
+
+
+def _cold_base_map():
+    # 背景の読み込みと合成（キャッシュが効いていない初回分）を別に測る
+    timings = {}
+    t = time.perf_counter()
+    src = base_map.open_source()
+    timings["load"] = time.perf_counter() - t
+    t = time.perf_counter()
+    base_map.composite_faded(src)
+    timings["composite"] = time.perf_counter() - t
+    return timings
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        "mean": statistics.fmean(values),
+        "min": values[0],
+        "p50": statistics.median(values),
+        "max": values[-1],
+    }
+
+
+def _render_errors():
+    return sum(RENDER_ERRORS.snapshot().values())
+
+
+def _send_map(participants, api, uploader, timings=None):
+    """地図を1回送る。描画に失敗した（「描画エラー」を返した・画像を送らなかった）ら例外にする
+
+    send_map_with_pins は失敗を返信で知らせて例外を外に出さないので、そのままだと速く終わった成功に見える。
+    """
+    errors, sent = _render_errors(), len(api.sent)
+    pin.send_map_with_pins("bench", participants, api, reply_token="bench", uploader=uploader, timings=timings)
+    if _render_errors() != errors:
+        reply = getattr(api.sent[-1][2], "text", "返信なし") if len(api.sent) > sent else "返信なし"
+        raise RuntimeError(f"描画に失敗しました（{reply}）")
+    if len(api.sent) != sent + 1 or not any(isinstance(m, ImageSendMessage) for m in api.sent[-1][2]):
+        raise RuntimeError("地図の画像が送られませんでした")
+
+
+def _run_case(pins, scenario, repeat, upload_latency):
+    # 子プロセスの中で1ケースを測る（最大RSSはこのプロセスの起動からの最大値）
+    participants = make_participants(pins, scenario)
+    api = FakeLineBotApi()
+    uploader = FakeUploader(latency=upload_latency)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # 1回目はキャッシュを温めるため捨てる
+    _send_map(participants, api, uploader)
+
+    # 時間は tracemalloc を止めた状態で測る（確保のたびに記録するぶん遅くなるため）
+    per_stage = {name: [] for name in STAGES}
+    totals = []
+    for _ in range(repeat):
+        gc.collect()
+        timings = {}
+        t = time.perf_counter()
+        _send_map(participants, api, uploader, timings)
+        totals.append(time.perf_counter() - t)
+        for name in STAGES:
+            per_stage[name].append(timings.get(name, 0.0))
+
+    # Python 側の確保の最大値は、時間とは別にもう1回描いて測る
+    gc.collect()
+    tracemalloc.start()
+    _send_map(participants, api, uploader)
+    py_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    last_uploads = uploader.uploads[-2:]
+    return {
+        "scenario": scenario,
+        "pins": pins,
+        "participants": len(participants),
+        "repeat": repeat,
+        "total": _summary(totals),
+        "stages": {name: _summary(v) for name, v in per_stage.items() if any(v)},
+        # tracemalloc は Python 側の確保だけ。Pillow の画像バッファはプロセスの最大RSSで見る
+        "python_peak_kb": py_peak // 1024,
+        # ケースごとに新しいプロセスで測るので、ほかのケースの最大値は混ざらない
+        # （baseline は import までの値。背景の読み込みと描画の分は含まない）
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "baseline_rss_kb": baseline_rss,
+        "bytes": {"image": last_uploads[0][0], "preview": last_uploads[-1][0]} if last_uploads else {},
+    }
+
+
+def run_case(pins, scenario, repeat, upload_latency=0.0):
+    """1ケースを新しいプロセス（spawn）で測る"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_run_case, pins, scenario, repeat, upload_latency).result()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _config():
+    from image_encoding import MAP_OUTPUT_FORMAT
+    return {
+        "map_output_format": MAP_OUTPUT_FORMAT,
+        "map_output_size": [pin.MAP_OUTPUT_WIDTH, pin.MAP_OUTPUT_HEIGHT],
+    }
+
+
+def compare(old, new):
+    old_cases = {(c["scenario"], c["pins"]): c for c in old["results"] if "error" not in c}
+    print(f"\n比較: {old.get('commit')} → {new.get('commit')}")
+    for case in new["results"]:
+        if "error" in case:
+            continue
+        key = (case["scenario"], case["pins"])
+        prev = old_cases.get(key)
+        if not prev:
+            continue
+        before, after = prev["total"]["p50"], case["total"]["p50"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {key[0]:8s} {key[1]:4d}ピン  {before * 1000:8.1f}ms → {after * 1000:8.1f}ms  ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pins", type=int, nargs="*", default=DEFAULT_PIN_COUNTS)
+    parser.add_argument("--scenarios", nargs="*", default=["spread", "passes", "overlap"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="偽アップロードの待ち時間（秒）")
+    parser.add_argument("--output", default="bench_render.json")
+    parser.add_argument("--compare", help="比較する前回の結果JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "config": _config(),
+        "cold_base_map": _cold_base_map(),
+        "results": [],
+    }
+
+    failed = 0
+    for scenario in args.scenarios:
+        for pins in args.pins:
+            count = min(pins, len(STATIONS))
+            try:
+                case = run_case(count, scenario, args.repeat, args.upload_latency)
+            except RuntimeError as e:
+                # 失敗したケースは時間を残さない（壊れた描画が速い結果に見えないように）
+                failed += 1
+                results["results"].append({"scenario": scenario, "pins": count, "error": str(e)})
+                print(f"{scenario:8s} {count:4d}ピン  失敗: {e}")
+                continue
+            results["results"].append(case)
+            stages = " ".join(f"{k}={v['p50'] * 1000:.1f}" for k, v in case["stages"].items())
+            print(f"{scenario:8s} {count:4d}ピン  total={case['total']['p50'] * 1000:.1f}ms  {stages}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+    if failed:
+        print(f"{failed} ケースで描画に失敗しました")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeLineBotApi:
+    """LINE Messaging API の代わり（送ったメッセージを記録するだけ）"""
+
+    def __init__(self, display_names=None, latency=0.0):
+        self.display_names = display_names or {}
+        self.latency = latency
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def _record(self, kind, target, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.sent.append((kind, target, messages))
+
+    def reply_message(self, reply_token, messages, *args, **kwargs):
+        self._record("reply", reply_token, messages)
+
+    def push_message(self, to, messages, *args, **kwargs):
+        self._record("push", to, messages)
+
+    def get_profile(self, user_id, *args, **kwargs):
+        return SimpleNamespace(display_name=self.display_names.get(user_id, user_id))
+
+    def get_group_member_profile(self, group_id, user_id, *args, **kwargs):
+        return self.get_profile(user_id)
+
+
+class FakeUploader:
+    """画像の置き場所の代わり（バイト数とハッシュだけ記録してURLを返す）"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.uploads = []
+
+    def upload(self, data, ext, subfolder=None):
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha256(data).hexdigest()
+        self.uploads.append((len(data), ext, subfolder))
+        return f"https://example.invalid/{subfolder or 'maps'}/{digest}.{ext}"
+
+    def probe_size(self, data, default_size):
+        return default_size
@@ -0,0 +1,233 @@
+"""Webhook の負荷試験
+
+正しく署名した LINE の Webhook を、複数のグループから一定のペースで送り続ける。
+LINE API は benchmarks.stub_line_api、画像の置き場所はローカル保存（IMAGE_HOST=local）を使う。
+
+    # アプリも同じプロセスで起動して試す
+    python -m benchmarks.loadtest_webhook --chats 20 --players 15 --rate 50 --duration 30
+
+    # 別に起動したアプリ（gunicorn など）に向けて送る。アプリ側の LINE_API_ENDPOINT は
+    # python -m benchmarks.stub_line_api で起動した代わりのサーバーに向けておく
+    python -m benchmarks.loadtest_webhook --target http://127.0.0.1:8000/callback --secret xxx
+
+Webhook の応答時間（予定時刻から数えるので、送信の詰まりも含む）の p50/p95/p99、
+エラー率、スループットを表示する。同じプロセスで起動した場合は、返信が届くまでの時間も表示する。
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.stub_line_api import StubLineApi  # noqa: E402
+
+
+def sign(body, channel_secret):
+    """X-Line-Signature（本文の HMAC-SHA256 を base64 にしたもの）"""
+    digest = hmac.new(channel_secret.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def message_event(chat_id, user_id, text, reply_token):
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "group", "groupId": chat_id, "userId": user_id},
+        "webhookEventId": reply_token,
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": reply_token,
+        "message": {"type": "text", "id": reply_token, "text": text},
+    }
+
+
+def webhook_body(events):
+    return json.dumps({"destination": "Uloadtest", "events": events}, ensure_ascii=False)
+
+
+class TrafficModel:
+    """グループごとに「プレイヤーが順番に駅を報告する」流れを作る
+
+    ときどき訂正（同じ人の再報告）とパスを混ぜる。
+    """
+
+    def __init__(self, chats, players, stations, correction_rate=0.1, pass_rate=0.05, seed=0):
+        self.rng = random.Random(seed)
+        self.chats = [f"Cloadtest{i:04d}" for i in range(chats)]
+        self.players = players
+        self.stations = stations
+        self.correction_rate = correction_rate
+        self.pass_rate = pass_rate
+        self._next_player = {chat: 0 for chat in self.chats}
+        self._seq = 0
+
+    def next_event(self):
+        chat = self.rng.choice(self.chats)
+        idx = self._next_player[chat]
+        if idx > 0 and self.rng.random() < self.correction_rate:
+            user = f"U{chat}p{self.rng.randrange(idx)}"
+        else:
+            user = f"U{chat}p{idx}"
+            self._next_player[chat] = (idx + 1) % self.players
+        text = "パス" if self.rng.random() < self.pass_rate else self.rng.choice(self.stations)
+        self._seq += 1
+        return chat, message_event(chat, user, text, f"rt{self._seq:08d}")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def _start_local_app(stub_url, secret, required_users):
+    # アプリの設定は import 前に環境変数で渡す
+    workdir = tempfile.mkdtemp(prefix="tetsuoni_loadtest_")
+    scores = os.path.join(workdir, "scores.json")
+    with open(scores, "w", encoding="utf-8") as f:
+        json.dump({"red_score": 40, "blue_score": 10, "white_score": 20}, f)
+    os.environ.update({
+        "LINE_CHANNEL_SECRET": secret,
+        "LINE_CHANNEL_ACCESS_TOKEN": "loadtest",
+        "LINE_API_ENDPOINT": stub_url,
+        "IMAGE_HOST": "local",
+        "LOCAL_IMAGE_DIR": os.path.join(workdir, "maps"),
+        "PUBLIC_BASE_URL": "https://loadtest.invalid",
+        "SCORE_SOURCE": f"file:{scores}",
+        "REQUIRED_USERS": str(required_users),
+    })
+    from werkzeug.serving import make_server
+    import main as app_main
+
+    server = make_server("127.0.0.1", 0, app_main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/callback", server
+
+
+def run(args):
+    stub = None
+    server = None
+    target = args.target
+    if not target:
+        # アクセスログで結果が埋もれないようにする
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        stub = StubLineApi(latency=args.api_latency)
+        stub_url = stub.start()
+        target, server = _start_local_app(stub_url, args.secret, args.players)
+
+    from stations import STATIONS
+    model = TrafficModel(args.chats, args.players, [s.name for s in STATIONS], seed=args.seed)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+    sent_at = {}
+
+    def send(scheduled, events):
+        body = webhook_body(events)
+        headers = {"Content-Type": "application/json", "X-Line-Signature": sign(body, args.secret)}
+        for ev in events:
+            sent_at[ev["replyToken"]] = scheduled
+        try:
+            res = session.post(target, data=body.encode("utf-8"), headers=headers, timeout=args.timeout)
+            ok = res.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors.append(elapsed)
+
+    total = int(args.rate * args.duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for i in range(total):
+            # 予定時刻どおりに送る（応答を待たない開ループ）
+            scheduled = start + i / args.rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            events = [model.next_event()[1] for _ in range(args.batch)]
+            pool.submit(send, scheduled, events)
+    elapsed = time.perf_counter() - start
+
+    # 非同期モードでは返信が後から届くので少し待つ
+    if stub:
+        time.sleep(args.drain)
+
+    print(f"送信: {total} 件（{args.batch} イベント/件） {elapsed:.1f}秒  スループット {len(latencies) / elapsed:.1f} 件/秒")
+    print(f"エラー率: {len(errors) / max(1, len(latencies)) * 100:.2f}%")
+    print("Webhook 応答時間: " + "  ".join(
+        f"p{q}={percentile(latencies, q) * 1000:.1f}ms" for q in (50, 95, 99)))
+
+    result = {
+        "requests": total,
+        "batch": args.batch,
+        "duration": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "error_rate": len(errors) / max(1, len(latencies)),
+        "webhook_latency": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+    }
+
+    if stub:
+        reply_latencies = [t - sent_at[token] for token, (t, _) in stub.replies.items() if token in sent_at]
+        images = sum(1 for _, msgs in stub.replies.values() if any(m.get("type") == "image" for m in msgs))
+        print(f"返信: {len(stub.replies)} 件（地図 {images} 件） プッシュ: {len(stub.pushes)} 件"
+              f"  プロフィール取得: {stub.profile_calls} 回")
+        print("返信までの時間: " + "  ".join(
+            f"p{q}={percentile(reply_latencies, q) * 1000:.1f}ms" for q in (50, 95, 99)))
+        result["reply_latency"] = {f"p{q}": percentile(reply_latencies, q) for q in (50, 95, 99)}
+        result["replies"] = len(stub.replies)
+        result["maps"] = images
+        result["pushes"] = len(stub.pushes)
+        server.shutdown()
+        stub.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Webhook のURL（省略時はアプリを同じプロセスで起動）")
+    parser.add_argument("--secret", default="loadtest-secret", help="チャネルシークレット（署名用）")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--players", type=int, default=15, help="1グループの人数（=REQUIRED_USERS）")
+    parser.add_argument("--rate", type=float, default=20.0, help="1秒あたりの Webhook 数")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=1, help="1回の Webhook に入れるイベント数")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--api-latency", type=float, default=0.02, help="代わりの LINE API の応答遅延（秒）")
+    parser.add_argument("--drain", type=float, default=5.0, help="送信後に返信を待つ秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果をJSONで保存するファイル")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""ラウンド記録（ROUND_LOG_PATH）の再生
+
+本番の記録を、報告の処理（add_station.handle_chat_reports）にもう一度通す。
+LINE は偽物、画像はローカル保存、ラウンド開始時のパス枠は記録にある値をそのまま使う。
+
+    python -m benchmarks.replay_round_log rounds.jsonl
+    python -m benchmarks.replay_round_log rounds.jsonl --chat Cxxxx --speed 10
+
+再生した結果（パスの受理・拒否など）が記録と食い違った箇所と、報告1件あたりの処理時間を表示する。
+障害の再現や、実際の試合を入力にしたベンチマークに使う。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 画像は一時ディレクトリに保存する（読み込み前に設定する）
+_workdir = tempfile.mkdtemp(prefix="tetsuoni_replay_")
+os.environ.setdefault("IMAGE_HOST", "local")
+os.environ.setdefault("LOCAL_IMAGE_DIR", os.path.join(_workdir, "maps"))
+os.environ.setdefault("PUBLIC_BASE_URL", "https://replay.invalid")
+
+from linebot.models import MessageEvent  # noqa: E402
+import add_station  # noqa: E402
+from pin import USER_CONFIG  # noqa: E402
+from round_log import RoundLog, LoggedStateStore, read_records  # noqa: E402
+from state_store import MemoryStateStore  # noqa: E402
+from benchmarks.fakes import FakeLineBotApi  # noqa: E402
+from benchmarks.loadtest_webhook import message_event  # noqa: E402
+
+REPORT_OPS = ("station", "pass")
+
+
+def _infer_required(records):
+    # 揃ったときの人数の最小値を REQUIRED_USERS とみなす
+    counts = [len(r.get("participants", {})) for r in records if r["op"] == "complete"]
+    return min(counts) if counts else int(os.environ.get("REQUIRED_USERS", "15"))
+
+
+class _LoggedLimits:
+    """ラウンド開始時のスコア取得の代わりに、記録にあるパス枠を返す"""
+
+    def __init__(self):
+        self.pending = {}
+
+    def start_game_logic(self, event, line_bot_api):
+        chat_id = add_station.get_chat_id(event.source)
+        if chat_id not in self.pending:
+            # 記録にない（本番でも設定されなかった）ときは、取得の失敗として扱い枠を変えない
+            raise RuntimeError("記録にパス枠がありません")
+        limits = self.pending.pop(chat_id)
+        p_limit = max(limits.values()) if limits else 0
+        return "（記録から再生）", p_limit, list(limits)
+
+
+def _comparable(record):
+    return (record["op"], record["chat"], record.get("user"), record.get("station"), record.get("status"))
+
+
+def replay(records, required_users, speed=0.0):
+    api = FakeLineBotApi()
+    limits = _LoggedLimits()
+    add_station.start_game_logic = limits.start_game_logic
+
+    # 再生中の状態変化も記録し、元の記録と突き合わせる
+    replay_log_path = os.path.join(_workdir, "replayed.jsonl")
+    store = LoggedStateStore(MemoryStateStore(), RoundLog(replay_log_path, snapshot_every=0))
+
+    latencies = []
+    seq = 0
+    prev_ts = None
+    for record in records:
+        if speed > 0 and prev_ts is not None:
+            time.sleep(max(0.0, (record["ts"] - prev_ts) / speed))
+        prev_ts = record.get("ts", prev_ts)
+
+        if record["op"] == "limits":
+            limits.pending[record["chat"]] = record["limits"]
+            continue
+        if record["op"] not in REPORT_OPS:
+            continue
+
+        # 記録の表示名をそのままユーザーIDにする（偽のLINEは表示名としてそのまま返す）
+        user = record["user"]
+        config = USER_CONFIG.setdefault(user, {"team": record["team"], "real_name": user})
+        if config["team"] != record["team"]:
+            print(f"チームが記録と違います: {user} 記録={record['team']} 現在={config['team']}")
+
+        seq += 1
+        text = "パス" if record["op"] == "pass" else record["station"]
+        event = MessageEvent.new_from_json_dict(message_event(record["chat"], user, text, f"replay{seq:08d}"))
+        start = time.perf_counter()
+        add_station.handle_chat_reports([event], api, store, USER_CONFIG, required_users)
+        latencies.append(time.perf_counter() - start)
+
+    replayed = list(read_records(replay_log_path))
+    return api, latencies, replayed
+
+
+def compare(original, replayed):
+    """記録と再生結果の食い違い（元の記録, 再生した記録）を返す"""
+    # start は以前の形式の記録にだけある
+    skip = ("limits", "start")
+    a = [r for r in original if r["op"] not in skip]
+    b = [r for r in replayed if r["op"] not in skip]
+    diffs = []
+    for i in range(max(len(a), len(b))):
+        left = a[i] if i < len(a) else None
+        right = b[i] if i < len(b) else None
+        if left is None or right is None or _comparable(left) != _comparable(right):
+            diffs.append((left, right))
+    return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="ラウンド記録（JSONL）")
+    parser.add_argument("--chat", help="このチャットだけ再生する")
+    parser.add_argument("--since", type=float, help="この時刻（UNIX秒）以降だけ")
+    parser.add_argument("--until", type=float, help="この時刻（UNIX秒）まで")
+    parser.add_argument("--required-users", type=int, help="省略時は記録から推定")
+    parser.add_argument("--speed", type=float, default=0.0, help="記録の時間間隔を何倍速で再現するか（0で待たない）")
+    parser.add_argument("--output", help="結果をJSONで保存するファイル")
+    args = parser.parse_args(argv)
+
+    records = [r for r in read_records(args.log)
+               if (not args.chat or r["chat"] == args.chat)
+               and (args.since is None or r.get("ts", 0) >= args.since)
+               and (args.until is None or r.get("ts", 0) <= args.until)]
+    required = args.required_users or _infer_required(records)
+    print(f"{len(records)} 件の記録を再生します（REQUIRED_USERS={required}）")
+
+    t = time.perf_counter()
+    api, latencies, replayed = replay(records, required, args.speed)
+    elapsed = time.perf_counter() - t
+
+    diffs = compare(records, replayed)
+    maps = sum(1 for kind, _, msgs in api.sent if isinstance(msgs, list) and len(msgs) > 1)
+    print(f"報告 {len(latencies)} 件 / 地図 {maps} 枚 / {elapsed:.2f}秒")
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"1件あたり: p50={statistics.median(ordered) * 1000:.1f}ms"
+              f"  p95={ordered[int(0.95 * (len(ordered) - 1))] * 1000:.1f}ms  max={ordered[-1] * 1000:.1f}ms")
+    print(f"記録との食い違い: {len(diffs)} 件")
+    for left, right in diffs[:20]:
+        print(f"  記録: {left and _comparable(left)}\n  再生: {right and _comparable(right)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"records": len(records), "reports": len(latencies), "maps": maps, "seconds": elapsed,
+                       "latencies": latencies, "mismatches": len(diffs)}, f, ensure_ascii=False, indent=2)
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
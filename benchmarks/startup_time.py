@@ -0,0 +1,97 @@
+"""起動時間の計測
+
+新しいプロセスで main を読み込み、段階ごとの時間（import / warmup）と全体の時間を測る。
+重い import や事前準備が増えていないかを確かめる（デプロイ直後の最初の Webhook はこの分だけ遅れる）。
+
+    python -m benchmarks.startup_time --runs 5
+    python -m benchmarks.startup_time --importtime 15   # 時間のかかったモジュールも表示
+
+gunicorn で動かしたときの値（worker / ready を含む）は /metrics の tetsuoni_startup_seconds で見られる。
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# metrics.record_startup のログ行
+PHASE_RE = re.compile(r"^起動: (\w+) ([0-9.]+)秒")
+# python -X importtime の行（自身の時間 | 累計 | モジュール名、単位はマイクロ秒）
+IMPORTTIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)")
+
+
+def _env():
+    env = dict(os.environ)
+    # LINE には接続しない（トークンは形式だけ）。スコアの先読みもしない
+    env.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "startup")
+    env.setdefault("LINE_CHANNEL_SECRET", "startup")
+    env.setdefault("IMAGE_HOST", "local")
+    env["DEFER_WORKER_START"] = "1"
+    return env
+
+
+def run_once(importtime=False):
+    """1回起動して ({段階: 秒}, 全体の秒, importtime の行) を返す"""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", "import main"]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=_env(), capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "起動に失敗")
+    phases = {}
+    for line in proc.stdout.splitlines():
+        m = PHASE_RE.match(line)
+        if m:
+            phases[m.group(1)] = float(m.group(2))
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            modules.append((int(m.group(1)) / 1e6, m.group(2)))
+    return phases, elapsed, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="読み込みに時間のかかったモジュールを上位 N 件表示する")
+    parser.add_argument("--output", help="結果をJSONで保存するファイル")
+    args = parser.parse_args(argv)
+
+    results = {}
+    totals = []
+    for _ in range(max(1, args.runs)):
+        phases, elapsed, _ = run_once()
+        totals.append(elapsed)
+        for phase, seconds in phases.items():
+            results.setdefault(phase, []).append(seconds)
+
+    print(f"{len(totals)} 回の中央値")
+    for phase, values in results.items():
+        print(f"  {phase:<8} {statistics.median(values) * 1000:8.1f}ms")
+    print(f"  {'total':<8} {statistics.median(totals) * 1000:8.1f}ms  （インタプリタの起動を含む）")
+
+    if args.importtime:
+        _, _, modules = run_once(importtime=True)
+        # 累計時間の大きい順（ほかのモジュールから読まれたものも含む）
+        print(f"読み込みに時間のかかったモジュール（累計、上位 {args.importtime} 件）")
+        for seconds, name in sorted(modules, reverse=True)[:args.importtime]:
+            print(f"  {seconds * 1000:8.1f}ms  {name}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": len(totals), "total": totals, "phases": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
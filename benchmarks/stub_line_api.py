@@ -0,0 +1,88 @@
+"""負荷試験用の LINE Messaging API の代わり
+
+返信・プッシュ・プロフィール取得だけを受け付け、届いた時刻を記録する。
+単体で起動して、本体の LINE_API_ENDPOINT をここに向けることもできる。
+
+    python -m benchmarks.stub_line_api --port 8081
+"""
+import argparse
+import threading
+import time
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+
+class StubLineApi:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.app = Flask("stub_line_api")
+        self._lock = threading.Lock()
+        self.replies = {}
+        self.pushes = []
+        self.profile_calls = 0
+        self._server = None
+        self._thread = None
+        self._routes()
+
+    def _routes(self):
+        app = self.app
+
+        @app.route("/v2/bot/message/reply", methods=["POST"])
+        def reply():
+            self._wait()
+            body = request.get_json(force=True)
+            with self._lock:
+                self.replies[body.get("replyToken")] = (time.perf_counter(), body.get("messages", []))
+            return jsonify({})
+
+        @app.route("/v2/bot/message/push", methods=["POST"])
+        def push():
+            self._wait()
+            body = request.get_json(force=True)
+            with self._lock:
+                self.pushes.append((time.perf_counter(), body.get("to"), body.get("messages", [])))
+            return jsonify({})
+
+        @app.route("/v2/bot/profile/<user_id>")
+        @app.route("/v2/bot/group/<chat_id>/member/<user_id>")
+        @app.route("/v2/bot/room/<chat_id>/member/<user_id>")
+        def profile(user_id, chat_id=None):
+            self._wait()
+            with self._lock:
+                self.profile_calls += 1
+            return jsonify({"displayName": user_id, "userId": user_id})
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def start(self, host="127.0.0.1", port=0):
+        self._server = make_server(host, port, self.app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="各APIの応答を遅らせる秒数")
+    args = parser.parse_args()
+
+    stub = StubLineApi(latency=args.latency)
+    url = stub.start(args.host, args.port)
+    print(f"LINE API の代わりを起動しました: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import threading
+import time
+from contextlib import contextmanager
+from metrics import CHAT_LOCK_WAIT_SECONDS
+
+
+class ChatLocks:
+    """チャットごとのロック
+
+    同じチャットの報告は1つずつ順番に処理し、別のチャットは並行して進める
+    （gunicorn の --threads で複数スレッドにしても、パス枠の二重消費や二重の描画が起きない）。
+    使っているスレッドがいなくなったチャットのロックは消す。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # chat_id → [ロック, 使っているスレッド数]
+        self._locks = {}
+
+    @contextmanager
+    def hold(self, chat_id):
+        with self._lock:
+            entry = self._locks.get(chat_id)
+            if entry is None:
+                entry = self._locks[chat_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            start = time.perf_counter()
+            with entry[0]:
+                CHAT_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start)
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[chat_id]
+
+
+chat_locks = ChatLocks()
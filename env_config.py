@@ -0,0 +1,42 @@
+import os
+
+# --- 環境変数からの設定値の読み込み ---
+# 未設定・空なら default。数値として読めない値や min_value より小さい値もログに出して default を使う
+# （設定の書き間違いで起動が止まらないように）。gunicorn.conf.py からも使う
+
+
+def _env_number(name, default, cast, min_value):
+    raw = os.environ.get(name, '').strip()
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        print(f"環境変数 {name} の値が読めないため {default} を使います: {raw}")
+        return default
+    if min_value is not None and value < min_value:
+        print(f"環境変数 {name} は {min_value} 以上にしてください（{default} を使います）: {raw}")
+        return default
+    return value
+
+
+def env_int(name, default, min_value=None):
+    """整数の設定値"""
+    return _env_number(name, default, int, min_value)
+
+
+def env_float(name, default, min_value=None):
+    """小数の設定値"""
+    return _env_number(name, default, float, min_value)
+
+
+def env_int_list(name, default):
+    """カンマ区切りの整数の設定値（1つでも読めなければ default）"""
+    raw = os.environ.get(name, '').strip()
+    if not raw:
+        return list(default)
+    try:
+        return [int(v) for v in raw.split(',') if v.strip()]
+    except ValueError:
+        print(f"環境変数 {name} の値が読めないため {','.join(map(str, default))} を使います: {raw}")
+        return list(default)
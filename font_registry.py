@@ -0,0 +1,51 @@
+import os
+import threading
+from PIL import ImageFont
+
+FONT_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+DEFAULT_FONT_FACE = 'NotoSansJP-Regular.ttf'
+
+# 1 にするとフォントが読めないときに代替フォントを使わずエラーにする
+FONT_REQUIRED = os.environ.get('FONT_REQUIRED', '0') == '1'
+
+_lock = threading.Lock()
+_fonts = {}
+_fallback_faces = set()
+
+
+def _load(face, size):
+    path = face if os.path.isabs(face) else os.path.join(FONT_DIR, face)
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError as e:
+        if FONT_REQUIRED:
+            raise
+        if face not in _fallback_faces:
+            # 黙って代替フォントにすると設定ミスに気づけないので一度だけ知らせる
+            print(f"フォントを読み込めないため代替フォントを使います: {path} ({e})")
+        _fallback_faces.add(face)
+        return ImageFont.load_default()
+
+
+def is_fallback(face=DEFAULT_FONT_FACE):
+    """代替（ビットマップ）フォントで描画しているか"""
+    return face in _fallback_faces
+
+
+def get_font(size, face=DEFAULT_FONT_FACE):
+    """(書体, サイズ) ごとにプロセス内で1回だけ読み込んだフォントを返す"""
+    key = (face, size)
+    font = _fonts.get(key)
+    if font is not None:
+        return font
+    with _lock:
+        font = _fonts.get(key)
+        if font is None:
+            font = _load(face, size)
+            _fonts[key] = font
+        return font
+
+
+def preload(sizes, face=DEFAULT_FONT_FACE):
+    for size in sizes:
+        get_font(size, face)
@@ -0,0 +1,66 @@
+import gc
+import os
+import tempfile
+import time
+from env_config import env_int
+
+# --- gunicorn の設定（Procfile から -c で読み込む） ---
+# ワーカー数は gunicorn が WEB_CONCURRENCY から、待ち受けのポートは PORT から読む
+
+_master_started = time.perf_counter()
+
+
+# マスターでアプリを読み込み（main.warmup で背景・フォント・駅の索引まで作り）、それから fork する。
+# ワーカーはそれをコピーオンライトで共有するので、デプロイ直後の最初のラウンドも待たせない
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# 1ワーカーあたりのスレッド数。同じチャットの処理はチャットごとのロックで1つずつになるので、
+# 別のチャットの Webhook を並行して受けられる
+threads = env_int('GUNICORN_THREADS', 4, min_value=1)
+
+timeout = env_int('GUNICORN_TIMEOUT', 30, min_value=0)
+
+# /metrics を全ワーカーの合計にするため、各ワーカーが値を書き出すディレクトリ（metrics.py）。
+# 指定がなければ起動ごとに一時ディレクトリを作る（main を読み込む前に決めておく）
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='tetsuoni-metrics-')
+
+if preload_app:
+    # マスターではスレッド（スコアの先読みなど）を作らない。fork 後の post_worker_init で始める
+    os.environ['DEFER_WORKER_START'] = '1'
+
+
+def on_starting(server):
+    # 前回の起動で書き出した値を消す（同じ METRICS_DIR を使い回す場合）
+    import metrics
+
+    metrics.clear_dir()
+
+
+def when_ready(server):
+    if preload_app:
+        # 読み込み済みのオブジェクトを GC の対象から外し、ワーカーでのコピーオンライトを起こしにくくする
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    import main
+    import metrics
+
+    main.start_worker()
+    metrics.record_startup("worker", time.perf_counter() - worker.forked_at)
+    metrics.record_startup("ready", time.perf_counter() - _master_started)
+
+
+def worker_exit(server, worker):
+    # 200 を返し済みで、まだ処理していない Webhook を捨てずに処理し終えてから終わる
+    import main
+    import metrics
+
+    main.event_pool.shutdown()
+    # 終了するワーカーの分も /metrics の合計に残す
+    metrics.registry.flush()
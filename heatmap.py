@@ -0,0 +1,153 @@
+import threading
+import numpy as np
+from PIL import Image
+from linebot.models import TextSendMessage, ImageSendMessage
+from stations import STATIONS, STATION_XY, station_id, station_name
+from round_log import ROUND_LOG_PATH, iter_records
+from pin import prepare_canvas, upload_map
+from image_hosting import uploader as default_uploader
+from stage_timer import stage
+from env_config import env_float
+
+# --- これまでのラウンドの居場所のヒートマップ（/heatmap） ---
+# ラウンド記録（ROUND_LOG_PATH）から、揃ったラウンドの最終的な駅をチームごとに数え、
+# 駅の座標を中心にしたガウス分布を重ねて背景に色を付ける
+
+TEAMS = ("赤", "青", "白")
+# 白チームは背景が白いので灰色で塗る
+HEATMAP_COLORS = {"赤": (255, 0, 0), "青": (0, 110, 255), "白": (90, 90, 90)}
+
+# ぼかしの広さ（背景の元画像のピクセル）
+HEATMAP_SIGMA = env_float('HEATMAP_SIGMA', 30.0)
+
+# いちばん濃いところの不透明度
+HEATMAP_MAX_ALPHA = env_float('HEATMAP_MAX_ALPHA', 0.6)
+
+# 返信に書く「よくいた駅」の数
+HEATMAP_TOP_STATIONS = 3
+
+
+class VisitCounter:
+    """ラウンド記録からチャットごと・チームごとの駅の回数を数える
+
+    前回読んだ位置を覚えておき、呼ばれるたびに増えた分だけ読む。
+    """
+
+    def __init__(self, path=ROUND_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0
+        # chat_id → {ユーザー名: チーム}（進行中のラウンド）
+        self._teams = {}
+        # chat_id → (チーム数, 駅数) の回数
+        self._counts = {}
+        self.rounds = {}
+
+    def _apply(self, record):
+        chat_id = record["chat"]
+        op = record["op"]
+        if op == "start" or op == "reset":
+            self._teams.pop(chat_id, None)
+        elif op in ("station", "pass") and record.get("status", "ok") == "ok":
+            self._teams.setdefault(chat_id, {})[record["user"]] = record["team"]
+        elif op == "complete":
+            teams = self._teams.pop(chat_id, {})
+            counts = self._counts.get(chat_id)
+            if counts is None:
+                counts = self._counts[chat_id] = np.zeros((len(TEAMS), len(STATIONS)), dtype=np.int32)
+            for user, station in record.get("participants", {}).items():
+                sid = station_id(station)
+                team = teams.get(user)
+                if sid is not None and team in TEAMS:
+                    counts[TEAMS.index(team), sid] += 1
+            self.rounds[chat_id] = self.rounds.get(chat_id, 0) + 1
+
+    def counts(self, chat_id):
+        """(チーム数, 駅数) の回数と、数えたラウンド数を返す"""
+        with self._lock:
+            for record, offset in iter_records(self.path, self._offset):
+                self._apply(record)
+                self._offset = offset
+            counts = self._counts.get(chat_id)
+            counts = counts.copy() if counts is not None else np.zeros((len(TEAMS), len(STATIONS)), dtype=np.int32)
+            return counts, self.rounds.get(chat_id, 0)
+
+
+def _gaussian(coords, length, sigma):
+    # (駅数, length) の1次元ガウス分布
+    axis = np.arange(length, dtype=np.float32)
+    return np.exp(-((axis[None, :] - coords[:, None]) ** 2) / (2 * sigma * sigma))
+
+
+def density(weights, size, scale, sigma=HEATMAP_SIGMA):
+    """駅ごとの重み（駅数）から (高さ, 幅) の密度を作る
+
+    2次元のガウス分布は x と y の積に分けられるので、
+    (駅数×高さ) と (駅数×幅) の行列積1回で全画素を計算する。
+    """
+    width, height = size
+    nz = np.nonzero(weights)[0]
+    if len(nz) == 0:
+        return np.zeros((height, width), dtype=np.float32)
+    xy = STATION_XY[nz] * np.asarray(scale, dtype=np.float32)
+    s = sigma * (scale[0] + scale[1]) / 2
+    gx = _gaussian(xy[:, 0], width, s)
+    gy = _gaussian(xy[:, 1], height, s) * weights[nz, None].astype(np.float32)
+    return gy.T @ gx
+
+
+def render_heatmap(counts, teams=TEAMS, uploader=None, timings=None):
+    """チームごとの回数 (チーム数, 駅数) を背景に重ねた画像を返す"""
+    img, base_size = prepare_canvas(uploader, timings)
+    scale = (img.width / base_size[0], img.height / base_size[1])
+    with stage(timings, "heatmap"):
+        for team in teams:
+            weights = counts[TEAMS.index(team)]
+            d = density(weights, img.size, scale)
+            peak = d.max()
+            if peak <= 0:
+                continue
+            # チームごとに、いちばん濃いところを HEATMAP_MAX_ALPHA にそろえる
+            alpha = np.sqrt(d / peak) * (HEATMAP_MAX_ALPHA * 255)
+            layer = np.empty((img.height, img.width, 4), dtype=np.uint8)
+            layer[..., :3] = HEATMAP_COLORS[team]
+            layer[..., 3] = alpha.astype(np.uint8)
+            img.alpha_composite(Image.fromarray(layer, "RGBA"))
+    return img
+
+
+def summary_text(counts, rounds, teams=TEAMS):
+    lines = [f"🔥 これまでの {rounds} ラウンドの居場所 🔥"]
+    for team in teams:
+        row = counts[TEAMS.index(team)]
+        top = [sid for sid in np.argsort(-row, kind="stable")[:HEATMAP_TOP_STATIONS] if row[sid] > 0]
+        if top:
+            lines.append(f"{team}: " + " / ".join(f"{station_name(sid)}({row[sid]})" for sid in top))
+    return "\n".join(lines)
+
+
+visit_counter = VisitCounter()
+
+
+def handle_heatmap_command(event, line_bot_api, chat_id, args, uploader=None):
+    """/heatmap [チーム] にヒートマップの画像で返信する"""
+    if not visit_counter.path:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(
+            text="ラウンド記録（ROUND_LOG_PATH）が設定されていないため、ヒートマップを作れません。"))
+        return
+
+    teams = tuple(t for t in args if t in TEAMS) or TEAMS
+    counts, rounds = visit_counter.counts(chat_id)
+    if rounds == 0:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text="まだ記録されたラウンドがありません。"))
+        return
+
+    try:
+        uploader = uploader or default_uploader
+        img = render_heatmap(counts, teams, uploader)
+        image_url, preview_url = upload_map(img, uploader)
+        line_bot_api.reply_message(event.reply_token, [
+            TextSendMessage(text=summary_text(counts, rounds, teams)),
+            ImageSendMessage(image_url, preview_url)])
+    except Exception as e:
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=f"描画エラー: {e}"))
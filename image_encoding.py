@@ -0,0 +1,71 @@
+import os
+import io
+from PIL import Image
+from env_config import env_int
+
+# --- 出力画像のエンコード設定 ---
+# png   : フルカラーPNG（従来どおり）
+# png8  : 256色に減色したパレットPNG
+# jpeg  : JPEG（MAP_OUTPUT_QUALITY で画質を指定）
+# webp  : WebP（LINEの画像メッセージはJPEG/PNGのみ対応なので、LINE以外への配信や比較用）
+MAP_OUTPUT_FORMAT = os.environ.get('MAP_OUTPUT_FORMAT', 'png').lower()
+
+MAP_OUTPUT_QUALITY = env_int('MAP_OUTPUT_QUALITY', 85)
+
+MAP_PNG_COMPRESS_LEVEL = env_int('MAP_PNG_COMPRESS_LEVEL', 6)
+
+MAP_PNG_COLORS = env_int('MAP_PNG_COLORS', 256)
+
+# プレビュー（トーク画面のサムネイル）の長辺
+MAP_PREVIEW_MAX = env_int('MAP_PREVIEW_MAX', 240)
+
+OUTPUT_PROFILES = ("png", "png8", "jpeg", "webp")
+
+if MAP_OUTPUT_FORMAT not in OUTPUT_PROFILES:
+    print(f"不明なMAP_OUTPUT_FORMAT: {MAP_OUTPUT_FORMAT}（pngを使います）")
+    MAP_OUTPUT_FORMAT = "png"
+elif MAP_OUTPUT_FORMAT == "webp":
+    print("MAP_OUTPUT_FORMAT=webp はLINEの画像メッセージでは表示できません")
+
+
+def _flatten(img):
+    # 透明部分を白で埋めてRGBにする（JPEG・減色用）
+    if img.mode == "RGB":
+        return img
+    bg = Image.new("RGB", img.size, (255, 255, 255))
+    bg.paste(img, (0, 0), img if img.mode == "RGBA" else None)
+    return bg
+
+
+def encode_image(img, profile=None, quality=None):
+    """(画像のバイト列, 拡張子) を返す"""
+    profile = profile or MAP_OUTPUT_FORMAT
+    quality = quality or MAP_OUTPUT_QUALITY
+    buf = io.BytesIO()
+
+    if profile == "png8":
+        paletted = _flatten(img).quantize(colors=MAP_PNG_COLORS, method=Image.Quantize.FASTOCTREE)
+        paletted.save(buf, format="PNG", optimize=False, compress_level=MAP_PNG_COMPRESS_LEVEL)
+        ext = "png"
+    elif profile == "jpeg":
+        _flatten(img).save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+        ext = "jpg"
+    elif profile == "webp":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+        ext = "webp"
+    else:
+        img.save(buf, format="PNG", compress_level=MAP_PNG_COMPRESS_LEVEL)
+        ext = "png"
+    return buf.getvalue(), ext
+
+
+def make_preview(img, max_side=None):
+    """トーク画面用に縮小したJPEGを作る（(バイト列, 拡張子)）"""
+    max_side = max_side or MAP_PREVIEW_MAX
+    ratio = min(1.0, max_side / max(img.size))
+    size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+    # 先に縮小してから白で埋める（元の画像は書き換えない）
+    preview = _flatten(img.resize(size, Image.BILINEAR, reducing_gap=2.0))
+    buf = io.BytesIO()
+    preview.save(buf, format="JPEG", quality=80, optimize=True)
+    return buf.getvalue(), "jpg"
@@ -0,0 +1,123 @@
+import os
+import io
+import hashlib
+import threading
+
+# --- 画像の置き場所 ---
+# cloudinary : Cloudinary にアップロード（従来どおり）
+# local      : このサーバーのディスクに保存し、Flask の /maps/ から配信する
+IMAGE_HOST = os.environ.get('IMAGE_HOST', 'cloudinary')
+LOCAL_IMAGE_DIR = os.environ.get('LOCAL_IMAGE_DIR', os.path.join(os.path.dirname(__file__), 'static', 'maps'))
+LOCAL_IMAGE_URL_PATH = '/maps'
+# LINEに渡すURLの先頭（例: https://tetsuoni.herokuapp.com）。LINEは https のURLしか受け付けない
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+
+CLOUDINARY_FOLDER = "tetsuoni_maps"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class CloudinaryUploader:
+    """Cloudinary に置く。同じ内容の画像は2回アップロードしない"""
+
+    def __init__(self, folder=CLOUDINARY_FOLDER):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._uploader = None
+        self._urls = {}
+        self._sizes = {}
+
+    def _cloudinary(self):
+        # cloudinary の読み込みは最初にアップロードするときまで遅らせる（起動を速くするため）
+        if self._uploader is None:
+            import cloudinary
+            import cloudinary.uploader
+
+            cloudinary.config(
+                cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
+                api_key=os.environ.get('CLOUDINARY_API_KEY'),
+                api_secret=os.environ.get('CLOUDINARY_API_SECRET'),
+                secure=True
+            )
+            self._uploader = cloudinary.uploader
+        return self._uploader
+
+    def _upload(self, data, digest, folder):
+        # public_id を内容のハッシュにして、別プロセスからの同じ画像も上書きせずに使い回す
+        res = self._cloudinary().upload(
+            io.BytesIO(data), resource_type="image", folder=folder,
+            public_id=digest[:32], overwrite=False, unique_filename=False)
+        with self._lock:
+            self._urls[(digest, folder)] = res.get("secure_url")
+            if res.get("width") and res.get("height"):
+                self._sizes[digest] = (int(res["width"]), int(res["height"]))
+        return res
+
+    def upload(self, data, ext, subfolder=None):
+        """画像を置いてURLを返す"""
+        folder = f"{self.folder}/{subfolder}" if subfolder else self.folder
+        digest = content_hash(data)
+        with self._lock:
+            url = self._urls.get((digest, folder))
+        if url:
+            return url
+        return self._upload(data, digest, folder).get("secure_url")
+
+    def close(self):
+        """接続を閉じる（preload_app のマスターで問い合わせたあと、fork 前に呼ぶ）"""
+        if self._uploader is not None:
+            # 使い回しの接続をワーカー間で共有しないように
+            self._uploader._http.clear()
+
+    def probe_size(self, data, default_size):
+        """Cloudinary 上で保存されたサイズを返す"""
+        digest = content_hash(data)
+        with self._lock:
+            size = self._sizes.get(digest)
+        if size:
+            return size
+        res = self._upload(data, digest, self.folder)
+        return int(res.get("width", default_size[0])), int(res.get("height", default_size[1]))
+
+
+class LocalUploader:
+    """ディスクに保存して自前で配信する。ファイル名が内容のハッシュなので同じ画像は1つだけ"""
+
+    def __init__(self, directory=LOCAL_IMAGE_DIR, base_url=PUBLIC_BASE_URL, url_path=LOCAL_IMAGE_URL_PATH):
+        self.directory = directory
+        self.base_url = base_url
+        self.url_path = url_path
+        os.makedirs(directory, exist_ok=True)
+        if not base_url:
+            print("PUBLIC_BASE_URL が未設定のため、画像のURLがLINEから参照できません")
+
+    def upload(self, data, ext, subfolder=None):
+        name = f"{content_hash(data)}.{ext}"
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            # 書きかけのファイルを配信しないよう、一時ファイルから置き換える
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{self.base_url}{self.url_path}/{name}"
+
+    def probe_size(self, data, default_size):
+        # 自前で配信するのでサイズはそのまま
+        return default_size
+
+    def close(self):
+        pass
+
+
+def create_uploader(host=IMAGE_HOST):
+    if host == 'local':
+        return LocalUploader()
+    if host != 'cloudinary':
+        print(f"不明なIMAGE_HOST: {host}（cloudinaryを使います）")
+    return CloudinaryUploader()
+
+
+uploader = create_uploader()
@@ -0,0 +1,124 @@
+from collections import namedtuple
+
+# ラベルの配置結果
+#   box       : ラベルの矩形 (x0, y0, x1, y1)
+#   displaced : ピンのすぐ横に置けなかった（引き出し線を描く）
+Placement = namedtuple("Placement", ["box", "displaced"])
+
+# ピンとラベルの間隔
+LABEL_GAP = 5
+# 近くに置けなかったときに何段階まで離して探すか
+MAX_RINGS = 3
+
+
+class GridIndex:
+    """矩形の重なり判定用の一様グリッド"""
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {}
+
+    def _cells_for(self, box):
+        cs = self.cell_size
+        x0, y0, x1, y1 = box
+        for cx in range(int(x0 // cs), int(x1 // cs) + 1):
+            for cy in range(int(y0 // cs), int(y1 // cs) + 1):
+                yield cx, cy
+
+    def insert(self, box):
+        for cell in self._cells_for(box):
+            self._cells.setdefault(cell, []).append(box)
+
+    def intersects(self, box):
+        x0, y0, x1, y1 = box
+        for cell in self._cells_for(box):
+            for bx0, by0, bx1, by1 in self._cells.get(cell, ()):
+                if x0 < bx1 and bx0 < x1 and y0 < by1 and by0 < y1:
+                    return True
+        return False
+
+
+def _candidates(x, y, r, w, h, ring):
+    # ring=0 はピンのすぐ隣。右 → 左 → 下 → 上 → 斜めの順に試す
+    d = LABEL_GAP + ring * (max(w, h) // 2 + LABEL_GAP)
+    right = x + r + d
+    left = x - r - d - w
+    top = y - r
+    yield right, top
+    yield left, top
+    yield x - w // 2, y + r + d
+    yield x - w // 2, y - r - d - h
+    yield right, y - r - d - h
+    yield right, y + r + d
+    yield left, y - r - d - h
+    yield left, y + r + d
+
+
+def place_labels(pins, sizes, bounds, obstacles=()):
+    """ピンに重ならず、ラベル同士も重ならない位置を貪欲法で選ぶ
+
+    pins      : [(x, y, 半径), ...]
+    sizes     : 各ピンのラベルの (幅, 高さ)
+    bounds    : 画像サイズ (幅, 高さ)
+    obstacles : 避けたい矩形（パス待機の一覧など）
+    """
+    width, height = bounds
+    index = GridIndex(cell_size=max(32, max((max(w, h) for w, h in sizes), default=32)))
+    for box in obstacles:
+        index.insert(box)
+    for x, y, r in pins:
+        index.insert((x - r, y - r, x + r, y + r))
+
+    # 混み合ったところから先に場所を取る（周りのピンが多い順）
+    crowding = _crowding(pins, index.cell_size)
+    order = sorted(range(len(pins)), key=lambda i: -crowding[i])
+
+    placements = [None] * len(pins)
+    for i in order:
+        x, y, r = pins[i]
+        w, h = sizes[i]
+        chosen = None
+        for ring in range(MAX_RINGS + 1):
+            for lx, ly in _candidates(x, y, r, w, h, ring):
+                box = (lx, ly, lx + w, ly + h)
+                if lx < 0 or ly < 0 or lx + w > width or ly + h > height:
+                    continue
+                if not index.intersects(box):
+                    chosen = Placement(box, ring > 0)
+                    break
+            if chosen:
+                break
+
+        if chosen is None:
+            # どこにも置けなければ従来どおりピンの右に置く
+            lx, ly = x + r + LABEL_GAP, y - r
+            chosen = Placement((lx, ly, lx + w, ly + h), False)
+
+        index.insert(chosen.box)
+        placements[i] = chosen
+    return placements
+
+
+def _crowding(pins, cell_size):
+    # 各ピンの周囲（3x3セル）にあるピンの数
+    buckets = {}
+    for x, y, _ in pins:
+        cell = (int(x // cell_size), int(y // cell_size))
+        buckets[cell] = buckets.get(cell, 0) + 1
+
+    counts = []
+    for x, y, _ in pins:
+        cx, cy = int(x // cell_size), int(y // cell_size)
+        counts.append(sum(buckets.get((cx + dx, cy + dy), 0) for dx in (-1, 0, 1) for dy in (-1, 0, 1)))
+    return counts
+
+
+def leader_line(pin, box):
+    """ピンの縁からラベルの最寄りの点までの線分"""
+    x, y, r = pin
+    x0, y0, x1, y1 = box
+    tx = min(max(x, x0), x1)
+    ty = min(max(y, y0), y1)
+    dx, dy = tx - x, ty - y
+    dist = (dx * dx + dy * dy) ** 0.5 or 1
+    return (x + dx * r / dist, y + dy * r / dist), (tx, ty)
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+from env_config import env_int
+
+# 縁取り付き文字画像（スプライト）のキャッシュ件数
+LABEL_SPRITE_CACHE_SIZE = env_int('LABEL_SPRITE_CACHE_SIZE', 512)
+
+OUTLINE_COLOR = (0, 0, 0)
+OUTLINE_WIDTH = 1
+
+_lock = threading.Lock()
+_sprites = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+# 文字サイズを測るためだけの作業用キャンバス
+_measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+
+def _font_key(font):
+    return (getattr(font, "path", None), getattr(font, "size", None))
+
+
+def _render(text, color, font):
+    # stroke で縁取りを1回で描く（8方向にずらして重ね描きしない）
+    left, top, right, bottom = _measure.textbbox((0, 0), text, font=font, stroke_width=OUTLINE_WIDTH)
+    sprite = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).text((-left, -top), text, fill=color, font=font,
+                                stroke_width=OUTLINE_WIDTH, stroke_fill=OUTLINE_COLOR)
+    return sprite, (left, top)
+
+
+def label_sprite(text, color, font):
+    """(スプライト画像, 文字の原点からのずれ) を返す。同じ文字・色・フォントは使い回す"""
+    key = (text, tuple(color), _font_key(font))
+    with _lock:
+        cached = _sprites.get(key)
+        if cached is not None:
+            _sprites.move_to_end(key)
+            _stats["hits"] += 1
+            return cached
+        _stats["misses"] += 1
+
+    cached = _render(text, color, font)
+    with _lock:
+        _sprites[key] = cached
+        while len(_sprites) > LABEL_SPRITE_CACHE_SIZE:
+            _sprites.popitem(last=False)
+    return cached
+
+
+def paste_sprite(img, sprite, pos):
+    """はみ出す部分を切り取ってから合成する（alpha_composite は負の座標を受け付けない）"""
+    x, y = int(pos[0]), int(pos[1])
+    x0, y0 = max(0, -x), max(0, -y)
+    x1 = min(sprite.width, img.width - x)
+    y1 = min(sprite.height, img.height - y)
+    if x0 >= x1 or y0 >= y1:
+        return
+    if (x0, y0, x1, y1) != (0, 0, sprite.width, sprite.height):
+        sprite = sprite.crop((x0, y0, x1, y1))
+    img.alpha_composite(sprite, (x + x0, y + y0))
+
+
+def draw_label(img, xy, text, color, font):
+    """ImageDraw.text と同じ位置合わせで縁取り文字を描く"""
+    sprite, (left, top) = label_sprite(text, color, font)
+    paste_sprite(img, sprite, (xy[0] + left, xy[1] + top))
+
+
+def sprite_cache_stats():
+    with _lock:
+        return dict(_stats, size=len(_sprites))
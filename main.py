@@ -1,53 +1,202 @@
+import atexit
 import os
-from flask import Flask, request, abort
+import time
+_import_started = time.perf_counter()
+from flask import Flask, request, abort, send_from_directory, Response
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
 
 # 外部ファイルから必要なものだけを呼ぶ
-from add_station import handle_registration_logic
-from pin import send_map_with_pins, USER_CONFIG # USER_CONFIGもpin.pyにあるので借りる
+from add_station import handle_chat_reports, get_chat_id
+from pin import send_map_with_pins, get_output_size, USER_CONFIG, LABEL_FONT_SIZE, PASS_TITLE_FONT_SIZE # USER_CONFIGもpin.pyにあるので借りる
+from base_map import build_pyramid, load_base_map
+from map_crop import MAP_CROP, inset_size
+import font_registry
+from state_store import create_state_store
+from advantage import prefetch_scores
+from webhook_worker import ASYNC_WEBHOOK, EventWorkerPool, ReplyFallbackApi
+from image_hosting import IMAGE_HOST, LOCAL_IMAGE_DIR, LOCAL_IMAGE_URL_PATH, uploader as default_uploader
+import metrics
+from profile_cache import profile_cache
+from label_sprites import sprite_cache_stats
+from heatmap import handle_heatmap_command
+from env_config import env_int
 
 app = Flask(__name__)
 
 # --- 基本設定 ---
-try:
-    REQUIRED_USERS = int(os.environ.get('REQUIRED_USERS', '15'))
-except ValueError:
-    REQUIRED_USERS = 15
+REQUIRED_USERS = env_int('REQUIRED_USERS', 15)
 
 # LINE & Cloudinary 認証設定
 LINE_CHANNEL_ACCESS_TOKEN = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
 LINE_CHANNEL_SECRET = os.environ.get('LINE_CHANNEL_SECRET')
+# 負荷試験などでLINE APIの代わりのサーバーに向けるとき用
+LINE_API_ENDPOINT = os.environ.get('LINE_API_ENDPOINT', 'https://api.line.me')
 
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
+# 呼び出し時間と失敗回数を /metrics で見られるようにラップしておく
+line_bot_api = metrics.InstrumentedLineApi(LineBotApi(LINE_CHANNEL_ACCESS_TOKEN, endpoint=LINE_API_ENDPOINT))
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
-# 状態保持用
-participant_data = {}
-users_participated = {}
+def warmup():
+    """ワーカーで共有できるもの（加工済みの背景・フォント）を作っておく
+
+    駅の索引と駅間の駅数の表は import の時点でできている。
+    gunicorn の preload_app ではマスターで一度だけ呼ばれ、ワーカーは fork 後にそのまま使う（コピーオンライト）。
+    """
+    # 背景画像（と縮小版）は一度だけ加工しておく（失敗しても初回描画時に再挑戦）
+    try:
+        # 送る地図の出力サイズ（設定がなければ画像の置き場所に一度だけ問い合わせた結果）の背景も作る。
+        # 切り抜きモードでは隅に入れる全体図の縮小版も作っておく
+        sizes = [get_output_size(load_base_map())]
+        if MAP_CROP and inset_size():
+            sizes.append(inset_size())
+        build_pyramid(sizes=sizes)
+    except Exception as e:
+        print(f"背景画像の事前読み込みに失敗: {e}")
+    finally:
+        # 問い合わせに使った接続は fork 前に閉じる
+        default_uploader.close()
+
+    # 描画用フォントも読み込んでおく（代替フォントならここでログに出る）
+    font_registry.preload([LABEL_FONT_SIZE, PASS_TITLE_FONT_SIZE])
+
+
+_worker_pid = None
+# 報告の状態（start_worker で作る）
+state_store = None
+
+def start_worker():
+    """プロセスごとに持つもの（スレッド・接続）を使い始める（fork 後のワーカーで一度だけ）"""
+    global _worker_pid, state_store
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+    # 状態保持用（STATE_BACKEND=sqlite で複数ワーカー間で共有）。
+    # SQLite の接続とラウンド記録のファイルは、preload_app のマスターでは開かずワーカーごとに開く
+    state_store = create_state_store()
+    # METRICS_DIR があれば、/metrics でほかのワーカーと合算できるよう値を書き出し始める
+    metrics.start_flusher()
+    # 最初のラウンドに備えてスコアを先読み
+    prefetch_scores()
+
+
+metrics.record_startup("import", time.perf_counter() - _import_started)
+_warmup_started = time.perf_counter()
+warmup()
+metrics.record_startup("warmup", time.perf_counter() - _warmup_started)
+
+# preload_app のマスターではスレッドも接続も作らない（gunicorn.conf.py がワーカーの起動後に呼ぶ）
+if os.environ.get('DEFER_WORKER_START') != '1':
+    start_worker()
+
+# 非同期モード用のワーカー（ASYNC_WEBHOOK=1 のときだけ使う）
+# 終了時はキューに残った分を処理してから終わる（gunicorn では worker_exit からも呼ぶ）
+event_pool = EventWorkerPool()
+atexit.register(event_pool.shutdown)
+
+# キャッシュのヒット率と待ち行列の長さも /metrics に出す
+metrics.register_cache("profile", profile_cache.stats)
+metrics.register_cache("label_sprite", sprite_cache_stats)
+metrics.registry.callback(
+    "tetsuoni_webhook_queue_pending", "非同期モードで処理待ちのWebhook数", "gauge", [],
+    lambda: {(): event_pool.pending()})
+# 描画用フォントを読めず代替フォントで描いているか（1 なら fonts/ の配置を確認する）
+metrics.registry.callback(
+    "tetsuoni_font_fallback", "代替フォントで描画しているか（1: 代替フォント）", "gauge", ["face"],
+    lambda: {(font_registry.DEFAULT_FONT_FACE,): int(font_registry.is_fallback())})
 
 
 @app.route("/callback", methods=['POST'])
 def callback():
     signature = request.headers.get('X-Line-Signature', '')
     body = request.get_data(as_text=True)
+    start = time.perf_counter()
+
+    if ASYNC_WEBHOOK:
+        # 署名だけ確認してすぐに200を返し、処理はワーカーに任せる
+        if not handler.parser.signature_validator.validate(body, signature):
+            abort(400)
+        mode = "async"
+        if not event_pool.submit(handle_delivery, body, signature):
+            # キューが満杯ならこのリクエスト内で処理する
+            mode = "inline"
+            handle_delivery(body, signature)
+        metrics.CALLBACK_SECONDS.observe(time.perf_counter() - start, mode)
+        return 'OK'
+
     try:
-        handler.handle(body, signature)
+        handle_delivery(body, signature)
     except InvalidSignatureError:
         abort(400)
+    metrics.CALLBACK_SECONDS.observe(time.perf_counter() - start, "sync")
     return 'OK'
 
-@handler.add(MessageEvent, message=TextMessage)
-def handle_message(event):
-    text = event.message.text.strip() if event.message and event.message.text else ""
-    if text.startswith('/'):
+@app.route("/metrics")
+def metrics_endpoint():
+    # Prometheus のテキスト形式（METRICS_DIR があれば全ワーカーの合計、なければこのプロセスの値）
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+if IMAGE_HOST == 'local':
+    # IMAGE_HOST=local のときは地図画像をここから配信する（ファイル名は内容のハッシュなので長くキャッシュさせる）
+    @app.route(f"{LOCAL_IMAGE_URL_PATH}/<path:filename>")
+    def serve_map_image(filename):
+        return send_from_directory(LOCAL_IMAGE_DIR, filename, max_age=86400 * 30)
+
+# '/' で始まるコマンド（handler(event, line_bot_api, chat_id, 引数のリスト)）
+COMMANDS = {
+    "/heatmap": handle_heatmap_command,
+}
+
+def _message_text(event):
+    if not isinstance(event, MessageEvent) or not isinstance(event.message, TextMessage):
+        return None
+    return event.message.text.strip() if event.message.text else ""
+
+def is_report_event(event):
+    """駅名・パスの報告として扱うイベントか（'/' で始まるコマンドは除く）"""
+    text = _message_text(event)
+    return text is not None and not text.startswith('/')
+
+def _chat_api(chat_id, event):
+    # 非同期モードでは返信が遅れることがあるので、期限切れならプッシュで送る
+    if ASYNC_WEBHOOK:
+        return ReplyFallbackApi(line_bot_api, chat_id, event.timestamp)
+    return line_bot_api
+
+def handle_command(event):
+    """COMMANDS にあるコマンドを実行する（知らないコマンドは無視）"""
+    words = _message_text(event).split()
+    command = COMMANDS.get(words[0].lower()) if words else None
+    if command is None:
         return
+    chat_id = get_chat_id(event.source)
+    try:
+        command(event, _chat_api(chat_id, event), chat_id, words[1:])
+    except Exception as e:
+        print(f"コマンドの処理に失敗: {words[0]} {chat_id} ({e})")
+
+def handle_delivery(body, signature):
+    """1回のWebhookで届いたイベントを、チャットごとにまとめて処理する
+
+    混雑時はLINEが複数のイベントを1回にまとめて送ってくる。ラウンドの終わりに報告が重なっても、
+    同じチャットの報告は1回で反映し、地図の描画もチャットごとに1回で済ませる。
+    """
+    events = handler.parser.parse(body, signature)
+
+    chats = {}
+    for event in events:
+        if is_report_event(event):
+            chats.setdefault(get_chat_id(event.source), []).append(event)
+        elif _message_text(event):
+            handle_command(event)
 
-    # すでに from add_station import handle_registration_logic しているので
-    # ファイル名抜きの関数名だけで呼び出せます
-    handle_registration_logic(
-        event, line_bot_api, participant_data, users_participated, USER_CONFIG, REQUIRED_USERS)
+    for chat_id, chat_events in chats.items():
+        try:
+            handle_chat_reports(chat_events, _chat_api(chat_id, chat_events[0]), state_store, USER_CONFIG, REQUIRED_USERS)
+        except Exception as e:
+            # 1つのチャットの失敗で、同じWebhookのほかのチャットを止めない
+            print(f"報告の処理に失敗: {chat_id} ({e})")
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+from PIL import Image, ImageDraw
+import pin
+from base_map import load_base_map, load_base_map_level, level_size
+from stage_timer import stage
+from env_config import env_int, env_float
+
+# --- ピンのまわりだけを切り抜いた地図 ---
+# 報告された駅（ピン・ラベル）が収まる範囲だけを描いて送る。
+# 全体のどこかが分かるよう、路線図全体の縮小版（いまの範囲に枠を付けたもの）を隅に入れる
+MAP_CROP = os.environ.get('MAP_CROP', '0') == '1'
+
+
+# ピン・ラベルのまわりに残す余白（出力画像のピクセル）
+MAP_CROP_MARGIN = env_int('MAP_CROP_MARGIN', 40, min_value=0)
+# 切り抜く範囲の最小の幅・高さ（駅が1つだけでも周りの路線が分かるように）
+MAP_CROP_MIN_SIZE = env_int('MAP_CROP_MIN_SIZE', 480, min_value=0)
+# 範囲が全体のこの割合より広ければ切り抜かずに全体を送る
+MAP_CROP_MAX_AREA = env_float('MAP_CROP_MAX_AREA', 0.8, min_value=0)
+# 全体図（隅に入れる縮小版）の幅。0 なら入れない
+MAP_CROP_INSET_WIDTH = env_int('MAP_CROP_INSET_WIDTH', 200, min_value=0)
+
+# 全体図と、切り抜いた範囲の端との間隔
+INSET_PADDING = 8
+# 切り抜いた範囲が地図の外にはみ出した部分の色
+OUTSIDE_COLOR = (255, 255, 255, 255)
+
+
+def _overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _expand(lo, hi, min_length, limit):
+    # 短すぎれば中心を保って広げ、はみ出した分は反対側へ寄せる
+    short = min(min_length, limit) - (hi - lo)
+    if short > 0:
+        lo -= short // 2
+        hi += short - short // 2
+    if lo < 0:
+        lo, hi = 0, hi - lo
+    if hi > limit:
+        lo, hi = lo - (hi - limit), limit
+    return max(0, lo), min(limit, hi)
+
+
+def crop_viewport(scene):
+    """ピン・ラベルが収まる範囲（余白込み、出力画像の座標）。切り抜くほどでなければ None"""
+    boxes = [pin.mark_box(scene, m, p) for m, p in zip(scene.marks, scene.placements)]
+    if not boxes:
+        return None
+    width, height = scene.size
+    x0, y0, x1, y1 = _union(boxes)
+    x0, x1 = _expand(x0 - MAP_CROP_MARGIN, x1 + MAP_CROP_MARGIN, MAP_CROP_MIN_SIZE, width)
+    y0, y1 = _expand(y0 - MAP_CROP_MARGIN, y1 + MAP_CROP_MARGIN, MAP_CROP_MIN_SIZE, height)
+    if (x1 - x0) * (y1 - y0) > MAP_CROP_MAX_AREA * width * height:
+        return None
+    return x0, y0, x1, y1
+
+
+def _shift_pass_items(scene, viewport):
+    # パス待機の一覧は、全体図での右上からの位置のまま切り抜いた範囲の右上へ移す
+    dx = viewport[2] - scene.size[0]
+    dy = viewport[1]
+    return [((x + dx, y + dy), text, color, font) for (x, y), text, color, font in scene.pass_items]
+
+
+def _layout(scene, viewport, inset_size):
+    """パス待機の一覧と全体図を置く場所を決める（(範囲, パス待機の一覧, 全体図の位置)）
+
+    ピン・ラベルと重なるときは、範囲を上（パス待機）・下（全体図）に広げて場所を作る。
+    """
+    obstacles = [pin.mark_box(scene, m, p) for m, p in zip(scene.marks, scene.placements)]
+    x0, y0, x1, y1 = viewport
+
+    pass_items = _shift_pass_items(scene, viewport)
+    box = pin.pass_box(scene._replace(pass_items=pass_items))
+    if box is not None:
+        if any(_overlap(box, o) for o in obstacles):
+            # 一覧の高さ分だけ上に広げる（地図の外は白）
+            y0 -= box[3] - y0 + INSET_PADDING
+            pass_items = _shift_pass_items(scene, (x0, y0, x1, y1))
+            box = pin.pass_box(scene._replace(pass_items=pass_items))
+        obstacles.append(box)
+
+    if inset_size is None:
+        return (x0, y0, x1, y1), pass_items, None
+
+    iw, ih = inset_size
+    corners = [
+        (x0 + INSET_PADDING, y1 - INSET_PADDING - ih),  # 左下
+        (x1 - INSET_PADDING - iw, y1 - INSET_PADDING - ih),  # 右下
+        (x0 + INSET_PADDING, y0 + INSET_PADDING),  # 左上
+        (x1 - INSET_PADDING - iw, y0 + INSET_PADDING),  # 右上
+    ]
+    for ix, iy in corners:
+        # 枠線の分も含めて重ならない隅を探す
+        if not any(_overlap((ix - 1, iy - 1, ix + iw + 1, iy + ih + 1), o) for o in obstacles):
+            return (x0, y0, x1, y1), pass_items, (ix, iy)
+    # どの隅も空いていなければ下に広げて左下に置く
+    y1 += ih + INSET_PADDING * 2
+    return (x0, y0, x1, y1), pass_items, (x0 + INSET_PADDING, y1 - INSET_PADDING - ih)
+
+
+def _background_region(background, viewport):
+    # 背景の viewport の範囲（地図の外にはみ出した部分は白）
+    x0, y0, x1, y1 = viewport
+    w, h = background.size
+    if x0 >= 0 and y0 >= 0 and x1 <= w and y1 <= h:
+        return background.crop(viewport)
+    region = Image.new("RGBA", (x1 - x0, y1 - y0), OUTSIDE_COLOR)
+    inside = (max(0, x0), max(0, y0), min(w, x1), min(h, y1))
+    region.paste(background.crop(inside), (inside[0] - x0, inside[1] - y0))
+    return region
+
+
+def inset_size():
+    """全体図のサイズ（入れない設定なら None）"""
+    if MAP_CROP_INSET_WIDTH <= 0:
+        return None
+    return level_size(load_base_map().size, MAP_CROP_INSET_WIDTH)
+
+
+def draw_inset(scene, viewport, width=MAP_CROP_INSET_WIDTH):
+    """路線図全体の縮小版に、ピンの位置と切り抜いた範囲の枠を描く"""
+    thumb = load_base_map_level(level_size(load_base_map().size, width)).copy()
+    sx, sy = thumb.width / scene.size[0], thumb.height / scene.size[1]
+    draw = ImageDraw.Draw(thumb)
+    for mark in scene.marks:
+        x, y = mark.x * sx, mark.y * sy
+        draw.ellipse((x - 2, y - 2, x + 2, y + 2), fill=mark.color, outline=(0, 0, 0))
+    x0, y0, x1, y1 = viewport
+    draw.rectangle((x0 * sx, y0 * sy, x1 * sx - 1, y1 * sy - 1), outline=(255, 0, 0), width=2)
+    draw.rectangle((0, 0, thumb.width - 1, thumb.height - 1), outline=(0, 0, 0))
+    return thumb
+
+
+def draw_cropped(scene, background):
+    """Scene をピンのまわりだけ描いた画像を返す（切り抜くほどでなければ全体を描く）"""
+    viewport = crop_viewport(scene)
+    if viewport is None:
+        img = background.copy()
+        pin.draw_scene(img, scene)
+        return img
+
+    outer, pass_items, inset_xy = _layout(scene, viewport, inset_size())
+
+    img = _background_region(background, outer)
+    pin.draw_scene(img, scene._replace(pass_items=pass_items), offset=outer[:2], clip=outer)
+    if inset_xy is not None:
+        # 枠は実際に地図が見えている範囲（外側の白い部分は除く）
+        w, h = scene.size
+        visible = (max(0, outer[0]), max(0, outer[1]), min(w, outer[2]), min(h, outer[3]))
+        img.paste(draw_inset(scene, visible), (inset_xy[0] - outer[0], inset_xy[1] - outer[1]))
+    return img
+
+
+def render_cropped_map(participants, uploader=None, timings=None, size=None):
+    """render_map と同じ引数・戻り値で、ピンのまわりだけを切り抜いた地図を描く"""
+    with stage(timings, "load"):
+        base = load_base_map()
+        size = size or pin.get_output_size(base, uploader)
+        background = load_base_map_level(size)
+    with stage(timings, "draw"):
+        scene = pin.build_scene(participants, size, base.size)
+        img = draw_cropped(scene, background)
+    return img, scene.report_text
@@ -0,0 +1,379 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from env_config import env_float
+
+# --- 処理時間と回数の計測（Prometheus のテキスト形式で /metrics から出す） ---
+# 値はプロセスごとに持つ。METRICS_DIR を設定すると、各プロセスが自分の値を
+# そのディレクトリに書き出し（<pid>.json）、/metrics では全プロセスの分を合算して出す。
+# gunicorn で複数ワーカーにするときは必ず設定する（gunicorn.conf.py が未設定なら一時ディレクトリを使う）。
+# 設定しなければ、/metrics はリクエストを受けたプロセスの値だけになる
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# 自分の値を METRICS_DIR に書き出す間隔（秒）。/metrics で見えるほかのワーカーの値はこの分だけ遅れる
+METRICS_FLUSH_INTERVAL = env_float('METRICS_FLUSH_INTERVAL', 1.0)
+
+# 秒単位のヒストグラムの区切り（Webhook 1件〜地図の描画・アップロードまでを想定）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """増えるだけの回数"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshots):
+        # プロセスごとの値を足す（終了したワーカーの分も残す）
+        merged = {}
+        for _, values in snapshots:
+            for labels, value in values.items():
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def collect(self, values=None):
+        values = sorted((self.snapshot() if values is None else values).items())
+        lines = [f"# HELP {self.name}_total {self.help}", f"# TYPE {self.name}_total counter"]
+        for labels, value in values:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """所要時間の分布（p99 などは Prometheus 側で histogram_quantile で出す）"""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: [list(e[0]), e[1], e[2]] for labels, e in self._values.items()}
+
+    def merge(self, snapshots):
+        # 区切りはどのプロセスでも同じなので、区切りごとの回数・合計・件数をそれぞれ足す
+        merged = {}
+        for _, values in snapshots:
+            for labels, (counts, total, count) in values.items():
+                entry = merged.get(labels)
+                if entry is None:
+                    merged[labels] = [list(counts), total, count]
+                    continue
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+        return merged
+
+    def collect(self, values=None):
+        values = sorted((self.snapshot() if values is None else values).items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts + [count - sum(counts)]):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """出力するときに関数を呼んで値を取る（各キャッシュの統計など、持ち主が数えているもの）"""
+
+    def __init__(self, name, help_text, metric_type, labelnames, func):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.func = func
+
+    def snapshot(self):
+        try:
+            return dict(self.func())
+        except Exception as e:
+            print(f"メトリクスの取得に失敗: {self.name} ({e})")
+            return None
+
+    def merge(self, snapshots):
+        # counter は足す。gauge（キャッシュの件数・起動時間など）はプロセスごとの値なので
+        # pid のラベルを付けて並べる（終了したワーカーの分は出さない）
+        merged = {}
+        for pid, values in snapshots:
+            if self.type != "counter" and not _pid_alive(pid):
+                continue
+            for labels, value in values.items():
+                if self.type == "counter":
+                    merged[labels] = merged.get(labels, 0) + value
+                else:
+                    merged[labels + (str(pid),)] = value
+        return merged
+
+    def collect(self, values=None, labelnames=None):
+        if values is None:
+            values = self.snapshot()
+            if values is None:
+                return []
+        labelnames = self.labelnames if labelnames is None else labelnames
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, metric_type, labelnames, func):
+        return self.register(CallbackMetric(name, help_text, metric_type, labelnames, func))
+
+    def _metrics_copy(self):
+        with self._lock:
+            return list(self._metrics)
+
+    def flush(self, directory=None):
+        """このプロセスの値を <directory>/<pid>.json に書き出す（途中の状態を読まれないよう置き換える）"""
+        directory = directory or METRICS_DIR
+        if not directory:
+            return
+        data = {}
+        for metric in self._metrics_copy():
+            values = metric.snapshot()
+            if values is not None:
+                data[metric.name] = [[list(labels), value] for labels, value in values.items()]
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def render(self, directory=None):
+        """Prometheus のテキスト形式にする（directory があれば全プロセスの分を合算する）"""
+        directory = directory or METRICS_DIR
+        metrics = self._metrics_copy()
+        lines = []
+        if not directory:
+            for metric in metrics:
+                lines.extend(metric.collect())
+            return "\n".join(lines) + "\n"
+
+        # 自分の分は最新の値を書き出してから、ほかのプロセスの分と一緒に読む
+        self.flush(directory)
+        snapshots = _read_snapshots(directory)
+        for metric in metrics:
+            values = metric.merge([(pid, data[metric.name]) for pid, data in snapshots if metric.name in data])
+            if isinstance(metric, CallbackMetric) and metric.type != "counter":
+                lines.extend(metric.collect(values, metric.labelnames + ("pid",)))
+            else:
+                lines.extend(metric.collect(values))
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshots(directory):
+    # [(pid, {名前: {ラベル: 値}})]。書き出し途中・壊れたファイルは飛ばす
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            pid = int(os.path.basename(path)[:-len(".json")])
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"メトリクスのファイルを読めません: {path} ({e})")
+            continue
+        snapshots.append((pid, {name: {tuple(labels): value for labels, value in values}
+                                for name, values in data.items()}))
+    return snapshots
+
+
+def clear_dir(directory=None):
+    """前回の起動で書き出した値を消す（gunicorn のマスターが起動時に呼ぶ）"""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+registry = Registry()
+
+_flusher_pid = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            registry.flush()
+        except Exception as e:
+            print(f"メトリクスの書き出しに失敗: {e}")
+
+
+def start_flusher():
+    """METRICS_DIR があれば、このプロセスの値を定期的に書き出す（fork 後のワーカーで一度だけ）"""
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    threading.Thread(target=_flush_loop, daemon=True, name="metrics-flush").start()
+    # 終了するワーカーの回数も合計に残す
+    atexit.register(registry.flush)
+
+# --- 各所で使う計測項目 ---
+CALLBACK_SECONDS = registry.histogram(
+    "tetsuoni_callback_seconds", "Webhook（/callback）の応答までの時間", ["mode"])
+REGISTRATION_SECONDS = registry.histogram(
+    "tetsuoni_registration_seconds", "報告1件の処理時間（返信・地図送信を含む）", ["outcome"])
+ROUND_COMPLETE_SECONDS = registry.histogram(
+    "tetsuoni_round_complete_seconds", "最後の報告から地図を送り終えるまでの時間")
+STAGE_SECONDS = registry.histogram(
+    "tetsuoni_stage_seconds", "処理段階ごとの時間（load/resize/draw/encode/upload/reply など）", ["stage"])
+UPLOAD_SECONDS = registry.histogram(
+    "tetsuoni_upload_seconds", "画像1枚のアップロード時間", ["kind"])
+SCORE_FETCH_SECONDS = registry.histogram(
+    "tetsuoni_score_fetch_seconds", "スコアの取得時間（cache/stale/prefetch/fetch/error）", ["result"])
+LINE_API_SECONDS = registry.histogram(
+    "tetsuoni_line_api_seconds", "LINE API の呼び出し時間", ["method"])
+LINE_API_ERRORS = registry.counter(
+    "tetsuoni_line_api_errors", "LINE API の呼び出しが失敗した回数", ["method"])
+REPORTS = registry.counter(
+    "tetsuoni_reports", "受け付けた報告の数（station/pass/correction/rejected）", ["kind"])
+REJECTED_INPUTS = registry.counter(
+    "tetsuoni_rejected_inputs", "駅名リストにない入力の数（候補を出せたかどうか）", ["suggested"])
+ROUNDS_COMPLETED = registry.counter(
+    "tetsuoni_rounds_completed", "地図を送ったラウンドの数")
+CHAT_LOCK_WAIT_SECONDS = registry.histogram(
+    "tetsuoni_chat_lock_wait_seconds", "同じチャットの処理が終わるのを待った時間")
+RENDER_ERRORS = registry.counter(
+    "tetsuoni_render_errors", "地図の描画・送信に失敗した回数")
+
+# 起動の段階ごとの所要時間（import / warmup / worker / ready）
+_startup_seconds = {}
+registry.callback(
+    "tetsuoni_startup_seconds", "起動の段階ごとの所要時間", "gauge", ["phase"],
+    lambda: dict(_startup_seconds))
+
+
+def record_startup(phase, seconds):
+    """起動の段階の所要時間を記録する（ログにも出す）"""
+    _startup_seconds[(phase,)] = seconds
+    print(f"起動: {phase} {seconds:.3f}秒 (pid={os.getpid()})")
+
+
+def register_cache(name, stats_func):
+    """hits/misses/size を返す関数を、キャッシュ名のラベル付きで出力に加える"""
+    registry.callback(
+        f"tetsuoni_{name}_cache_requests_total", f"{name} キャッシュの参照回数", "counter", ["result"],
+        lambda: {("hit",): stats_func()["hits"], ("miss",): stats_func()["misses"]})
+    registry.callback(
+        f"tetsuoni_{name}_cache_entries", f"{name} キャッシュの件数", "gauge", [],
+        lambda: {(): stats_func()["size"]})
+
+
+class InstrumentedLineApi:
+    """line_bot_api の呼び出し時間と失敗回数を数えるラッパー"""
+
+    METHODS = ("reply_message", "push_message", "get_profile", "get_group_member_profile",
+               "get_room_member_profile", "get_group_member_ids")
+
+    def __init__(self, line_bot_api):
+        self._api = line_bot_api
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if name not in self.METHODS:
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                LINE_API_ERRORS.inc(name)
+                raise
+            finally:
+                LINE_API_SECONDS.observe(time.perf_counter() - start, name)
+        return call
@@ -1,10 +1,19 @@
 import os
 import io
-from PIL import Image, ImageDraw, ImageFont
-import cloudinary
-import cloudinary.uploader
+from collections import namedtuple
+from PIL import ImageDraw
 from linebot.models import TextSendMessage, ImageSendMessage
-from station_data import STATION_COORDINATES
+from stations import STATION_XY, station_id, station_name
+from station_graph import MAP_NEAREST_SUMMARY, nearest_opponents
+from base_map import load_base_map, load_base_map_level, pick_level_size, base_map_signature
+from label_layout import place_labels, leader_line
+from label_sprites import label_sprite, paste_sprite, draw_label
+from font_registry import get_font
+from image_encoding import encode_image, make_preview
+from image_hosting import uploader as default_uploader
+from stage_timer import stage
+from metrics import UPLOAD_SECONDS, RENDER_ERRORS
+from env_config import env_int
 
 USER_CONFIG = {
     "上山of鉄オタ": {"team": "赤", "real_name": "上山"},
@@ -28,152 +37,329 @@ TEAM_COLORS = {
 
 PIN_RADIUS = 10
 PIN_OUTLINE_WIDTH = 2
+LABEL_LINE_HEIGHT = 18
+LABEL_FONT_SIZE = 16
+PASS_TITLE_FONT_SIZE = 18
+# 「いちばん近い他チーム」の行数の上限（MAP_NEAREST_SUMMARY=1 のとき）
+NEAREST_SUMMARY_MAX_LINES = 20
 
-CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
-CLOUDINARY_API_KEY = os.environ.get('CLOUDINARY_API_KEY')
-CLOUDINARY_API_SECRET = os.environ.get('CLOUDINARY_API_SECRET')
+# 出力画像のサイズ（0 なら指定なし。片方だけ指定した場合は縦横比を保つ）
+MAP_OUTPUT_WIDTH = env_int('MAP_OUTPUT_WIDTH', 0, min_value=0)
+MAP_OUTPUT_HEIGHT = env_int('MAP_OUTPUT_HEIGHT', 0, min_value=0)
 
-cloudinary.config(
-    cloud_name=CLOUDINARY_CLOUD_NAME,
-    api_key=CLOUDINARY_API_KEY,
-    api_secret=CLOUDINARY_API_SECRET,
-    secure=True
-)
+# 低速回線のチャット（カンマ区切りの chat_id）には、この幅以下の小さい背景で描いて送る
+MAP_LOW_BANDWIDTH_CHATS = {c.strip() for c in os.environ.get('MAP_LOW_BANDWIDTH_CHATS', '').split(',') if c.strip()}
+MAP_LOW_BANDWIDTH_WIDTH = env_int('MAP_LOW_BANDWIDTH_WIDTH', 640, min_value=1)
 
-def send_map_with_pins(chat_id, participants, line_bot_api, reply_token=None):
-    try:
-        orig_img = Image.open("Rosenzu.png").convert("RGBA")
-        orig_w, orig_h = orig_img.size
-
-        # 背景の加工
-        target_alpha = int(255 * 0.7)
-        new_alpha = Image.new('L', orig_img.size, color=target_alpha)
-        orig_img.putalpha(new_alpha)
-        img = Image.new("RGBA", (orig_w, orig_h), (255, 255, 255, 255))
-        img.paste(orig_img, (0, 0), orig_img)
-
-        # Cloudinary アップロード
-        buf_base = io.BytesIO()
-        img.save(buf_base, format='PNG')
-        buf_base.seek(0)
-        base_upload = cloudinary.uploader.upload(buf_base, resource_type="image", folder="tetsuoni_maps", overwrite=True)
-
-        uploaded_w = int(base_upload.get("width", orig_w))
-        uploaded_h = int(base_upload.get("height", orig_h))
-        img = img.resize((uploaded_w, uploaded_h), Image.LANCZOS)
-        
-        draw = ImageDraw.Draw(img)
-        scale_x, scale_y = uploaded_w / orig_w, uploaded_h / orig_h
-        scaled_radius = max(1, int(PIN_RADIUS * ((scale_x + scale_y) / 2)))
-        outline_extra = max(1, int(PIN_OUTLINE_WIDTH * ((scale_x + scale_y) / 2)))
-
-        # --- フォント読み込み ---
-        font_path = os.path.join(os.path.dirname(__file__), 'fonts', 'NotoSansJP-Regular.ttf')
+# 背景画像ごとに一度だけ問い合わせた出力サイズ
+_probed_sizes = {}
+
+
+def _probe_output_size(img, uploader):
+    # 画像の置き場所で保存されるサイズを一度だけ確認する
+    buf_base = io.BytesIO()
+    img.save(buf_base, format='PNG')
+    return uploader.probe_size(buf_base.getvalue(), img.size)
+
+
+def get_output_size(img, uploader=None):
+    """描画する出力サイズを返す（設定値 → キャッシュ済みの問い合わせ結果の順）"""
+    orig_w, orig_h = img.size
+    if MAP_OUTPUT_WIDTH and MAP_OUTPUT_HEIGHT:
+        return MAP_OUTPUT_WIDTH, MAP_OUTPUT_HEIGHT
+    if MAP_OUTPUT_WIDTH:
+        return MAP_OUTPUT_WIDTH, max(1, round(orig_h * MAP_OUTPUT_WIDTH / orig_w))
+    if MAP_OUTPUT_HEIGHT:
+        return max(1, round(orig_w * MAP_OUTPUT_HEIGHT / orig_h)), MAP_OUTPUT_HEIGHT
+
+    key = base_map_signature()
+    size = _probed_sizes.get(key)
+    if size is None:
         try:
-            font = ImageFont.truetype(font_path, 16) 
-            pass_title_font = ImageFont.truetype(font_path, 18) # パス見出し用
-        except:
-            font = ImageFont.load_default()
-            pass_title_font = ImageFont.load_default()
-
-        # 1. データの集約
-        station_to_users = {}
-        report_buckets = {"赤": [], "青": [], "白": []}
-        pass_members = {"赤": [], "青": [], "白": []} # パスした人用
-
-        for username, data in participants.items():
-            st_name = data.get("station")
-            if not st_name:
+            size = _probe_output_size(img, uploader or default_uploader)
+        except Exception as e:
+            # 問い合わせに失敗したら元のサイズで描画する（次回また問い合わせる）
+            print(f"出力サイズの取得に失敗: {e}")
+            return orig_w, orig_h
+        _probed_sizes[key] = size
+    return size
+
+def map_size(chat_id=None, uploader=None):
+    """このチャットに送る地図のサイズ（低速回線のチャットは小さい背景から選ぶ）"""
+    size = get_output_size(load_base_map(), uploader)
+    if chat_id in MAP_LOW_BANDWIDTH_CHATS and size[0] > MAP_LOW_BANDWIDTH_WIDTH:
+        size = pick_level_size(MAP_LOW_BANDWIDTH_WIDTH)
+    return size
+
+
+# 背景のサイズごとの駅の座標（(駅数, 2) の int32）
+_level_xy = {}
+
+
+def level_station_xy(size, base_size):
+    """出力サイズ size での駅の座標（サイズごとに一度だけ計算する）"""
+    key = (tuple(size), tuple(base_size))
+    xy = _level_xy.get(key)
+    if xy is None:
+        scale = (size[0] / base_size[0], size[1] / base_size[1])
+        xy = (STATION_XY * scale).astype("int32")
+        xy.setflags(write=False)
+        _level_xy[key] = xy
+    return xy
+
+
+# 描画する内容（画像には依存しないので、差分の計算にも使う）
+#   pass_items : パス待機の一覧の各行 ((x, y), 文字, 色, フォント)
+#   marks      : 駅ごとのピンとラベル（StationMark）
+#   placements : marks と同じ順のラベル配置（Placement）
+Scene = namedtuple("Scene", ["size", "report_text", "pass_items", "marks", "placements", "radius", "outline_radius"])
+#   lines : ラベルの各行 (文字, 色)
+StationMark = namedtuple("StationMark", ["sid", "x", "y", "color", "lines", "sprites"])
+
+
+def build_scene(participants, size, base_size):
+    """参加者の報告から描画内容（Scene）を組み立てる。size は出力サイズ、base_size は背景の元サイズ"""
+    uploaded_w, uploaded_h = size
+    orig_w, orig_h = base_size
+    scale_x, scale_y = uploaded_w / orig_w, uploaded_h / orig_h
+    scaled_radius = max(1, int(PIN_RADIUS * ((scale_x + scale_y) / 2)))
+    outline_extra = max(1, int(PIN_OUTLINE_WIDTH * ((scale_x + scale_y) / 2)))
+
+    # --- フォント（プロセス内で読み込み済みのものを使う） ---
+    font = get_font(LABEL_FONT_SIZE)
+    pass_title_font = get_font(PASS_TITLE_FONT_SIZE) # パス見出し用
+
+    # 1. データの集約
+    station_to_users = {}
+    report_buckets = {"赤": [], "青": [], "白": []}
+    pass_members = {"赤": [], "青": [], "白": []} # パスした人用
+
+    for username, data in participants.items():
+        st_name = data.get("station")
+        if not st_name:
+            continue
+
+        config = USER_CONFIG.get(username, {"team": "白", "real_name": username})
+        team = config["team"]
+        real_name = config["real_name"]
+        report_buckets[team].append(f"「{team}:{real_name}」: {st_name}")
+
+        # パスの場合はパスリストへ、駅の場合は駅リストへ
+        if st_name == "パス":
+            pass_members[team].append(real_name[0])
+        else:
+            # 駅名と駅ナンバリング（渋谷 / G01）は同じ駅としてまとめる
+            sid = station_id(st_name)
+            if sid is None:
                 continue
+            if sid not in station_to_users:
+                station_to_users[sid] = []
+            station_to_users[sid].append({"team": team, "char": real_name[0]})
+
+    # --- パスメンバーの一覧（右上） ---
+    pass_items = []
+    current_pass_y = 20
+    pass_x = uploaded_w - 180 # 右端から180pxの位置
+
+    # パスメンバーがいる場合のみ見出しを表示
+    has_pass = any(pass_members.values())
+    if has_pass:
+        pass_items.append(((pass_x, current_pass_y), "【パス待機】", (255, 255, 255), pass_title_font))
+        current_pass_y += 25
 
-            config = USER_CONFIG.get(username, {"team": "白", "real_name": username})
-            team = config["team"]
-            real_name = config["real_name"]
-            report_buckets[team].append(f"「{team}:{real_name}」: {st_name}")
-
-            # パスの場合はパスリストへ、駅の場合は駅リストへ
-            if st_name == "パス":
-                pass_members[team].append(real_name[0])
-            elif st_name in STATION_COORDINATES:
-                if st_name not in station_to_users:
-                    station_to_users[st_name] = []
-                station_to_users[st_name].append({"team": team, "char": real_name[0]})
-
-        # 2. 描画
-        
-        # --- パスメンバーの描画（右上） ---
-        current_pass_y = 20
-        pass_x = uploaded_w - 180 # 右端から180pxの位置
-        
-        # パスメンバーがいる場合のみ見出しを表示
-        has_pass = any(pass_members.values())
-        if has_pass:
-            # 縁取り付きで見出し描画
-            txt_title = "【パス待機】"
-            for dx, dy in [(-1,-1),(1,-1),(-1,1),(1,1)]:
-                draw.text((pass_x+dx, current_pass_y+dy), txt_title, fill=(0,0,0), font=pass_title_font)
-            draw.text((pass_x, current_pass_y), txt_title, fill=(255,255,255), font=pass_title_font)
-            current_pass_y += 25
-
-            for t_name in ["赤", "青", "白"]:
-                if pass_members[t_name]:
-                    txt = f"{t_name}:{ ''.join(pass_members[t_name]) }"
-                    text_color = TEAM_COLORS.get(t_name, (255, 255, 255))
-                    # 縁取り（黒）
-                    for dx, dy in [(-1,-1),(1,-1),(-1,1),(1,1)]:
-                        draw.text((pass_x+dx, current_pass_y+dy), txt, fill=(0,0,0), font=font)
-                    # 中身（チーム色）
-                    draw.text((pass_x, current_pass_y), txt, fill=text_color, font=font)
-                    current_pass_y += 20
-
-        # --- 駅ピンの描画 ---
-        for st_name, users in station_to_users.items():
-            x = int(STATION_COORDINATES[st_name][0] * scale_x)
-            y = int(STATION_COORDINATES[st_name][1] * scale_y)
-            pin_color = TEAM_COLORS["重複"] if len(users) > 1 else TEAM_COLORS.get(users[0]["team"], (255, 255, 255))
-
-            draw.ellipse((x - (scaled_radius + outline_extra), y - (scaled_radius + outline_extra), 
-                          x + (scaled_radius + outline_extra), y + (scaled_radius + outline_extra)), fill=(0, 0, 0))
-            draw.ellipse((x - scaled_radius, y - scaled_radius, x + scaled_radius, y + scaled_radius), fill=pin_color)
-            
-            team_summary = {"赤": [], "青": [], "白": []}
-            for u in users:
-                team_summary[u['team']].append(u['char'])
-
-            display_lines = []
-            for t in ["赤", "青", "白"]:
-                if team_summary[t]:
-                    line_txt = f"{t}:{ ''.join(team_summary[t]) }"
-                    display_lines.append((t, line_txt))
-
-            current_y = y - scaled_radius
-            for t_name, txt in display_lines:
-                text_color = TEAM_COLORS.get(t_name, (255, 255, 255))
-                text_pos = (x + scaled_radius + 5, current_y)
-                for dx, dy in [(-1,-1),(1,-1),(-1,1),(1,1),(0,-1),(0,1),(-1,0),(1,0)]:
-                    draw.text((text_pos[0]+dx, text_pos[1]+dy), txt, fill=(0,0,0), font=font)
-                draw.text(text_pos, txt, fill=text_color, font=font)
-                current_y += 18 
-
-        # 3. 出力
-        out_buf = io.BytesIO()
-        img.save(out_buf, format='PNG')
-        out_buf.seek(0)
-        final_upload = cloudinary.uploader.upload(out_buf, resource_type="image", folder="tetsuoni_maps")
-        image_url = final_upload.get("secure_url")
-
-        report_text = f"🚨 参加者 {len(report_buckets['赤']) + len(report_buckets['青']) + len(report_buckets['白'])} 人のデータ 🚨\n"
+        for t_name in ["赤", "青", "白"]:
+            if pass_members[t_name]:
+                txt = f"{t_name}:{ ''.join(pass_members[t_name]) }"
+                # 黒縁取り・チーム色の文字
+                pass_items.append(((pass_x, current_pass_y), txt, TEAM_COLORS.get(t_name, (255, 255, 255)), font))
+                current_pass_y += 20
+
+    # パス待機の一覧にはラベルを重ねない
+    obstacles = [(pass_x - 1, 19, uploaded_w, current_pass_y)] if has_pass else []
+
+    # --- 駅ピンとラベルの準備 ---
+    pin_radius = scaled_radius + outline_extra
+    pins = []
+    marks = []
+    sizes = []
+    station_xy = level_station_xy(size, base_size)
+    for sid, users in station_to_users.items():
+        x, y = (int(v) for v in station_xy[sid])
+        pin_color = TEAM_COLORS["重複"] if len(users) > 1 else TEAM_COLORS.get(users[0]["team"], (255, 255, 255))
+
+        team_summary = {"赤": [], "青": [], "白": []}
+        for u in users:
+            team_summary[u['team']].append(u['char'])
+
+        # 各行の縁取り文字はキャッシュ済みの画像を使う
+        lines = []
+        sprites = []
         for t in ["赤", "青", "白"]:
-            if report_buckets[t]:
-                report_text += "\n" + "\n".join(report_buckets[t])
+            if team_summary[t]:
+                line_txt = f"{t}:{ ''.join(team_summary[t]) }"
+                color = TEAM_COLORS.get(t, (255, 255, 255))
+                sprite, _ = label_sprite(line_txt, color, font)
+                lines.append((line_txt, color))
+                sprites.append(sprite)
+
+        # ラベル全体の大きさ
+        label_w = max(sp.width for sp in sprites)
+        label_h = LABEL_LINE_HEIGHT * (len(sprites) - 1) + sprites[-1].height
+        pins.append((x, y, pin_radius))
+        marks.append(StationMark(sid, x, y, pin_color, tuple(lines), sprites))
+        sizes.append((label_w, label_h))
+
+    # ピンにもほかのラベルにも重ならない位置を選ぶ
+    placements = place_labels(pins, sizes, (uploaded_w, uploaded_h), obstacles)
+
+    report_text = f"🚨 参加者 {len(report_buckets['赤']) + len(report_buckets['青']) + len(report_buckets['白'])} 人のデータ 🚨\n"
+    for t in ["赤", "青", "白"]:
+        if report_buckets[t]:
+            report_text += "\n" + "\n".join(report_buckets[t])
+    if MAP_NEAREST_SUMMARY:
+        report_text += nearest_summary(station_to_users)
+    return Scene((uploaded_w, uploaded_h), report_text.strip(), pass_items, marks, placements, scaled_radius, pin_radius)
+
+
+def nearest_summary(station_to_users):
+    """各駅からいちばん近い他チームの駅（駅数の少ない順）を報告文の末尾用に作る"""
+    team_stations = {"赤": [], "青": [], "白": []}
+    for sid, users in station_to_users.items():
+        for team in {u["team"] for u in users}:
+            team_stations[team].append(sid)
+
+    pairs = sorted(nearest_opponents(team_stations), key=lambda p: (p[4], p[0]))
+    if not pairs:
+        return ""
+    lines = [f"{team} {station_name(sid)} → {other_team} {station_name(other)}（{hops}駅）"
+             for sid, team, other, other_team, hops in pairs[:NEAREST_SUMMARY_MAX_LINES]]
+    return "\n\n【いちばん近い他チーム】\n" + "\n".join(lines)
+
+
+def _boxes_overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def mark_box(scene, mark, placement):
+    """駅ひとつ分（ピン・ラベル・引き出し線）が描かれる範囲"""
+    r = scene.outline_radius
+    x0, y0, x1, y1 = mark.x - r, mark.y - r, mark.x + r + 1, mark.y + r + 1
+    lx, ly = placement.box[0], placement.box[1]
+    for i, sprite in enumerate(mark.sprites):
+        top = ly + i * LABEL_LINE_HEIGHT
+        x0, y0 = min(x0, lx), min(y0, top)
+        x1, y1 = max(x1, lx + sprite.width), max(y1, top + sprite.height)
+    if placement.displaced:
+        # 引き出し線の太さ分も含める
+        (ax, ay), (bx, by) = leader_line((mark.x, mark.y, r), placement.box)
+        x0, y0 = min(x0, int(min(ax, bx)) - 2), min(y0, int(min(ay, by)) - 2)
+        x1, y1 = max(x1, int(max(ax, bx)) + 3), max(y1, int(max(ay, by)) + 3)
+    return x0, y0, x1, y1
+
+
+def pass_box(scene):
+    """パス待機の一覧が描かれる範囲（一覧がなければ None）"""
+    box = None
+    for (x, y), text, color, font in scene.pass_items:
+        sprite, (left, top) = label_sprite(text, color, font)
+        b = (x + left, y + top, x + left + sprite.width, y + top + sprite.height)
+        box = b if box is None else (min(box[0], b[0]), min(box[1], b[1]), max(box[2], b[2]), max(box[3], b[3]))
+    return box
+
+
+def draw_scene(img, scene, offset=(0, 0), clip=None):
+    """Scene を img に描く
+
+    offset は img の左上が地図上のどこか（一部分だけ描き直すとき用）。
+    clip を指定すると、その範囲（地図上の座標）にかかる要素だけを描く。
+    """
+    ox, oy = offset
+    draw = ImageDraw.Draw(img)
+    items = list(zip(scene.marks, scene.placements))
+    if clip is not None:
+        items = [(m, p) for m, p in items if _boxes_overlap(mark_box(scene, m, p), clip)]
+
+    # --- パス待機 → 引き出し線 → ピン → ラベルの順に描画 ---
+    for (x, y), text, color, font in scene.pass_items:
+        draw_label(img, (x - ox, y - oy), text, color, font)
+
+    r = scene.outline_radius
+    for mark, placement in items:
+        if placement.displaced:
+            (ax, ay), (bx, by) = leader_line((mark.x, mark.y, r), placement.box)
+            draw.line(((ax - ox, ay - oy), (bx - ox, by - oy)), fill=(0, 0, 0), width=2)
+
+    sr = scene.radius
+    for mark, _ in items:
+        x, y = mark.x - ox, mark.y - oy
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(0, 0, 0))
+        draw.ellipse((x - sr, y - sr, x + sr, y + sr), fill=mark.color)
+
+    for mark, placement in items:
+        current_y = placement.box[1] - oy
+        for sprite in mark.sprites:
+            paste_sprite(img, sprite, (placement.box[0] - ox, current_y))
+            current_y += LABEL_LINE_HEIGHT
+
+
+def prepare_canvas(uploader=None, timings=None, size=None):
+    """出力サイズ（size、省略時は通常の出力サイズ）の背景を返す（(背景, 背景の元サイズ)）"""
+    # 背景（加工済みのキャッシュ）
+    with stage(timings, "load"):
+        base = load_base_map()
+    size = size or get_output_size(base, uploader)
+
+    # 縮小済みの背景をコピーするだけ（縮小はサイズごとに一度だけ）
+    with stage(timings, "load"):
+        img = load_base_map_level(size).copy()
+    return img, base.size
+
+
+def render_map(participants, uploader=None, timings=None, size=None):
+    """参加者の報告から地図を描き、(画像, 報告文) を返す"""
+    img, base_size = prepare_canvas(uploader, timings, size)
+    with stage(timings, "draw"):
+        scene = build_scene(participants, img.size, base_size)
+        draw_scene(img, scene)
+    return img, scene.report_text
+
+
+def upload_map(img, uploader, timings=None):
+    """地図をエンコードして置き、(画像URL, プレビューURL) を返す"""
+    # 形式は MAP_OUTPUT_FORMAT。トーク画面用に小さいプレビューも別に作る
+    with stage(timings, "encode"):
+        out_data, out_ext = encode_image(img)
+    with stage(timings, "upload"), UPLOAD_SECONDS.time("image"):
+        image_url = uploader.upload(out_data, out_ext)
+
+    preview_url = image_url
+    try:
+        with stage(timings, "encode"):
+            preview_data, preview_ext = make_preview(img)
+        with stage(timings, "upload"), UPLOAD_SECONDS.time("preview"):
+            preview_url = uploader.upload(preview_data, preview_ext, subfolder="preview") or image_url
+    except Exception as e:
+        print(f"プレビュー画像のアップロードに失敗: {e}")
+    return image_url, preview_url
+
+
+def send_map_with_pins(chat_id, participants, line_bot_api, reply_token=None, uploader=None, timings=None, render=None):
+    """地図を描いて送る。render には render_map の代わりに使う描画関数を渡せる（先行描画など）"""
+    uploader = uploader or default_uploader
+    try:
+        size = map_size(chat_id, uploader)
+        img, report_text = (render or render_map)(participants, uploader, timings, size)
+        image_url, preview_url = upload_map(img, uploader, timings)
 
         if image_url:
-            msg = [TextSendMessage(text=report_text.strip()), ImageSendMessage(image_url, image_url)]
-            if reply_token:
-                line_bot_api.reply_message(reply_token, msg)
-            else:
-                line_bot_api.push_message(chat_id, msg)
+            msg = [TextSendMessage(text=report_text), ImageSendMessage(image_url, preview_url)]
+            with stage(timings, "reply"):
+                if reply_token:
+                    line_bot_api.reply_message(reply_token, msg)
+                else:
+                    line_bot_api.push_message(chat_id, msg)
 
     except Exception as e:
+        RENDER_ERRORS.inc()
         if reply_token:
             line_bot_api.reply_message(reply_token, TextSendMessage(text=f"描画エラー: {e}"))
@@ -0,0 +1,172 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+import pin
+from base_map import load_base_map, load_base_map_level, base_map_signature
+from stage_timer import stage
+from env_config import env_int
+
+# --- 先行描画 ---
+# 報告が届くたびに、チャットごとの途中までの地図を裏で更新しておく。
+# 最後の報告では差分だけを描き足してエンコードに進むので、最後の人の待ち時間が短くなる
+MAP_PRERENDER = os.environ.get('MAP_PRERENDER', '0') == '1'
+
+# 途中の地図を持っておくチャット数（1枚あたり 出力サイズ×4バイト のメモリを使う）
+MAP_PRERENDER_MAX_CHATS = env_int('MAP_PRERENDER_MAX_CHATS', 8)
+
+
+def _clean_background(size):
+    # 出力サイズの背景（(背景の署名とサイズ, 画像, 背景の元サイズ)）。各チャットはこれをコピーして使う
+    background = load_base_map_level(size)
+    return (base_map_signature(), tuple(size)), background, load_base_map().size
+
+
+def _elements(scene):
+    # 要素ごとに (描く内容, 描かれる範囲)。内容が同じなら描き直さない
+    items = {}
+    for mark, placement in zip(scene.marks, scene.placements):
+        items[mark.sid] = ((mark.x, mark.y, mark.color, mark.lines, placement), pin.mark_box(scene, mark, placement))
+    items["pass"] = (tuple((xy, text, color) for xy, text, color, _ in scene.pass_items), pin.pass_box(scene))
+    return items
+
+
+def dirty_boxes(old, new):
+    """old から new に変わるときに描き直す範囲（前の位置と新しい位置の両方）"""
+    old_items = _elements(old) if old is not None else {}
+    new_items = _elements(new)
+    boxes = []
+    for key in old_items.keys() | new_items.keys():
+        before, after = old_items.get(key), new_items.get(key)
+        if before is not None and after is not None and before[0] == after[0]:
+            continue
+        for item in (before, after):
+            if item is not None and item[1] is not None:
+                boxes.append(item[1])
+    return _merge(boxes)
+
+
+def _merge(boxes):
+    # 重なる範囲はまとめて、同じ場所を何度も描き直さない
+    merged = []
+    for box in boxes:
+        while True:
+            for i, other in enumerate(merged):
+                if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                    box = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    del merged[i]
+                    break
+            else:
+                break
+        merged.append(box)
+    return merged
+
+
+class ChatCanvas:
+    """1チャット分の描きかけの地図"""
+
+    def __init__(self, key, background, base_size):
+        self.key = key
+        self.background = background
+        self.base_size = base_size
+        self.img = background.copy()
+        self.scene = None
+
+    def update(self, participants):
+        """participants の内容に合わせ、変わった部分だけ描き直す（描き直した範囲の数を返す）"""
+        scene = pin.build_scene(participants, self.img.size, self.base_size)
+        boxes = dirty_boxes(self.scene, scene)
+        w, h = self.img.size
+        for x0, y0, x1, y1 in boxes:
+            box = (max(0, x0), max(0, y0), min(w, x1), min(h, y1))
+            if box[0] >= box[2] or box[1] >= box[3]:
+                continue
+            # 背景から切り出し、その範囲にかかる要素だけを重ね直して戻す
+            region = self.background.crop(box)
+            pin.draw_scene(region, scene, offset=box[:2], clip=box)
+            self.img.paste(region, box[:2])
+        self.scene = scene
+        return len(boxes)
+
+
+class _ChatState:
+    def __init__(self, chat_id=None):
+        self.chat_id = chat_id
+        self.lock = threading.Lock()
+        self.canvas = None
+        self.pending = None
+        self.running = False
+        # take で手放した（もう描き直さない）
+        self.closed = False
+
+
+class Prerenderer:
+    """チャットごとの描きかけの地図を管理する"""
+
+    def __init__(self, max_chats=MAP_PRERENDER_MAX_CHATS):
+        self.max_chats = max(1, max_chats)
+        self._lock = threading.Lock()
+        self._chats = OrderedDict()
+
+    def submit(self, chat_id, participants):
+        """途中経過を渡す（裏で描き直す。描き直し中に届いた分は最新のものだけ反映する）"""
+        with self._lock:
+            state = self._chats.get(chat_id)
+            if state is None:
+                state = self._chats[chat_id] = _ChatState(chat_id)
+            self._chats.move_to_end(chat_id)
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+            state.pending = participants
+            if state.running:
+                return
+            state.running = True
+        threading.Thread(target=self._run, args=(state,), name="map-prerender", daemon=True).start()
+
+    def _run(self, state):
+        while True:
+            with self._lock:
+                participants, state.pending = state.pending, None
+                if participants is None:
+                    state.running = False
+                    return
+            with state.lock:
+                if state.closed:
+                    continue
+                try:
+                    with stage(None, "prerender"):
+                        self._update(state, participants)
+                except Exception as e:
+                    # 次の報告か最後の描画でやり直す
+                    print(f"地図の先行描画に失敗: {e}")
+                    state.canvas = None
+
+    def _update(self, state, participants, uploader=None, timings=None, size=None):
+        key, background, base_size = _clean_background(size or pin.map_size(state.chat_id, uploader))
+        if state.canvas is None or state.canvas.key != key:
+            state.canvas = ChatCanvas(key, background, base_size)
+        state.canvas.update(participants)
+
+    def take(self, chat_id):
+        """このチャットの描きかけの地図を引き取り、仕上げる描画関数を返す
+
+        返す関数は render_map と同じ引数・戻り値（(画像, 報告文)）で、send_map_with_pins の render に渡せる。
+        引き取ったあとの報告は、新しい描きかけの地図に反映される。
+        """
+        with self._lock:
+            state = self._chats.pop(chat_id, None)
+            if state is not None:
+                state.pending = None
+        return partial(self._finalize, state or _ChatState(chat_id))
+
+    def _finalize(self, state, participants, uploader=None, timings=None, size=None):
+        # 裏で描き直している途中なら、それが終わるのを待つ
+        with state.lock:
+            with stage(timings, "draw"):
+                self._update(state, participants, uploader, timings, size)
+            canvas = state.canvas
+            state.closed = True
+        return canvas.img, canvas.scene.report_text
+
+
+prerenderer = Prerenderer()
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from env_config import env_int, env_float
+
+# --- プロフィール（表示名）キャッシュの設定 ---
+PROFILE_CACHE_TTL = env_float('PROFILE_CACHE_TTL', 600.0)
+
+PROFILE_CACHE_SIZE = env_int('PROFILE_CACHE_SIZE', 1000)
+
+# ラウンド開始時にグループのメンバー一覧から先読みするか
+# （メンバーID一覧APIは認証済み・プレミアムアカウントのみ使える）
+PROFILE_WARMUP = os.environ.get('PROFILE_WARMUP', '0') == '1'
+
+
+class ProfileCache:
+    """(chat_id, user_id) → 表示名 のTTL付きLRUキャッシュ"""
+
+    def __init__(self, ttl=PROFILE_CACHE_TTL, maxsize=PROFILE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id, user_id):
+        key = (chat_id, user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _is_fresh(self, chat_id, user_id):
+        # ヒット・ミスの集計に含めない確認用
+        with self._lock:
+            entry = self._entries.get((chat_id, user_id))
+            return entry is not None and entry[1] > time.monotonic()
+
+    def put(self, chat_id, user_id, display_name):
+        key = (chat_id, user_id)
+        with self._lock:
+            self._entries[key] = (display_name, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def get_display_name(self, line_bot_api, source_type, chat_id, user_id):
+        """キャッシュになければLINEに問い合わせる（失敗時は例外をそのまま投げる）"""
+        name = self.get(chat_id, user_id)
+        if name is not None:
+            return name
+
+        if source_type == 'group':
+            profile = line_bot_api.get_group_member_profile(chat_id, user_id)
+        else:
+            profile = line_bot_api.get_profile(user_id)
+        self.put(chat_id, user_id, profile.display_name)
+        return profile.display_name
+
+    def warmup(self, line_bot_api, group_id):
+        """グループ全員の表示名を先に読み込んでおく"""
+        start = None
+        while True:
+            member_ids = line_bot_api.get_group_member_ids(group_id, start=start)
+            for user_id in member_ids.member_ids or []:
+                if self._is_fresh(group_id, user_id):
+                    continue
+                try:
+                    profile = line_bot_api.get_group_member_profile(group_id, user_id)
+                except Exception:
+                    continue
+                self.put(group_id, user_id, profile.display_name)
+            start = member_ids.next
+            if not start:
+                break
+
+    def warmup_async(self, line_bot_api, group_id):
+        def run():
+            try:
+                self.warmup(line_bot_api, group_id)
+            except Exception as e:
+                print(f"プロフィールの先読みに失敗: {e}")
+
+        threading.Thread(target=run, name="profile-warmup", daemon=True).start()
+
+
+profile_cache = ProfileCache()
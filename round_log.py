@@ -0,0 +1,178 @@
+import os
+import json
+import threading
+import time
+from env_config import env_int
+
+# --- ラウンドの記録（追記のみのJSONL） ---
+# 報告・パス・訂正・ラウンドの開始と終了を1行ずつ書き足していく。
+# STATE_BACKEND=memory のときは、起動時にこの記録から途中のラウンドを復元する
+# （Heroku などディスクが再起動で消える環境では、永続ディスクのパスを指定すること）
+ROUND_LOG_PATH = os.environ.get('ROUND_LOG_PATH', '')
+
+# この件数を書き足すごとにスナップショットを取り、起動時の読み直しを短くする
+ROUND_LOG_SNAPSHOT_EVERY = env_int('ROUND_LOG_SNAPSHOT_EVERY', 500)
+
+# 1行ごとに fsync する（電源断にも耐えるが遅くなる）
+ROUND_LOG_FSYNC = os.environ.get('ROUND_LOG_FSYNC', '0') == '1'
+
+
+def snapshot_path(path):
+    return f"{path}.snapshot.json"
+
+
+class RoundLog:
+    """記録ファイルへの追記とスナップショット"""
+
+    def __init__(self, path, snapshot_every=ROUND_LOG_SNAPSHOT_EVERY, fsync=ROUND_LOG_FSYNC):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._since_snapshot = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # O_APPEND なので、1行ずつの書き込みはほかのプロセスの行と混ざらない
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def append(self, record):
+        """1件書き足す"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        os.write(self._fd, line.encode("utf-8"))
+        if self.fsync:
+            os.fsync(self._fd)
+        self._since_snapshot += 1
+
+    def snapshot_due(self):
+        return self.snapshot_every > 0 and self._since_snapshot >= self.snapshot_every
+
+    def write_snapshot(self, chats):
+        """chats（各チャットの途中経過）と、そこまでの記録の位置を保存する"""
+        offset = os.lseek(self._fd, 0, os.SEEK_END)
+        path = snapshot_path(self.path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "ts": time.time(), "chats": chats}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._since_snapshot = 0
+
+
+def iter_records(path, offset=0):
+    """(記録, その行の次の位置) を順に返す。書きかけの最後の行は読み飛ばす"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                yield json.loads(line), offset
+            except ValueError:
+                print(f"ラウンド記録の読めない行を飛ばします: {line[:80]!r}")
+
+
+def read_records(path, offset=0):
+    """記録を先頭（または offset）から順に返す"""
+    for record, _ in iter_records(path, offset):
+        yield record
+
+
+def apply_record(store, record):
+    """記録1件をストアに反映する（本番と同じストアのメソッドを通すので、結果も同じになる）"""
+    op = record["op"]
+    chat_id = record["chat"]
+    if op == "start":
+        # 以前の形式の記録（ラウンドの開始は最初の報告で決まるので、状態は変えない）
+        return None
+    if op == "limits":
+        return store.set_pass_limits(chat_id, record["limits"])
+    if op == "pass":
+        return store.report_pass(chat_id, record["user"], record["team"])
+    if op == "station":
+        return store.report_station(chat_id, record["user"], record["team"], record["station"])
+    if op == "complete":
+        # 記録にあるのは実際に揃ったときだけなので、人数は確認しない
+        return store.complete_round(chat_id, 0)
+    if op == "reset":
+        return store.reset(chat_id)
+    print(f"不明なラウンド記録: {op}")
+    return None
+
+
+def restore(store, path):
+    """スナップショットと、その後の記録からストアを復元する（反映した件数を返す）"""
+    offset = 0
+    snap = snapshot_path(path)
+    if os.path.exists(snap):
+        try:
+            with open(snap, encoding="utf-8") as f:
+                data = json.load(f)
+            store.import_state(data["chats"])
+            offset = data["offset"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"スナップショットを読めないため記録を最初から読み直します: {e}")
+            offset = 0
+    count = 0
+    for record in read_records(path, offset):
+        apply_record(store, record)
+        count += 1
+    return count
+
+
+class LoggedStateStore:
+    """状態ストアの前に置き、状態を変える呼び出しをすべて記録する"""
+
+    def __init__(self, store, log):
+        self._store = store
+        self._log = log
+        # 更新と記録を同じ順序にする（スナップショットと記録の位置がずれないように）
+        self._lock = threading.Lock()
+
+    def _logged(self, record, func, *args, skip=None, extra=None):
+        # skip(結果) が真なら記録しない。extra(結果) の内容は記録に足す
+        with self._lock:
+            result = func(*args)
+            if skip is not None and skip(result):
+                return result
+            if extra is not None:
+                record.update(extra(result))
+            record["ts"] = time.time()
+            if isinstance(result, dict) and "status" in result:
+                record["status"] = result["status"]
+            try:
+                self._log.append(record)
+                if self._log.snapshot_due() and hasattr(self._store, "export_state"):
+                    self._log.write_snapshot(self._store.export_state())
+            except OSError as e:
+                # 記録に失敗してもゲームは止めない
+                print(f"ラウンド記録の書き込みに失敗: {e}")
+            return result
+
+    def set_pass_limits(self, chat_id, team_pass_limits):
+        # 設定できたときだけ記録する（最初の報告のあとは変わらない）
+        return self._logged({"op": "limits", "chat": chat_id, "limits": dict(team_pass_limits)},
+                            self._store.set_pass_limits, chat_id, team_pass_limits,
+                            skip=lambda applied: not applied)
+
+    def report_pass(self, chat_id, username, team):
+        return self._logged({"op": "pass", "chat": chat_id, "user": username, "team": team},
+                            self._store.report_pass, chat_id, username, team)
+
+    def report_station(self, chat_id, username, team, station):
+        return self._logged({"op": "station", "chat": chat_id, "user": username, "team": team, "station": station},
+                            self._store.report_station, chat_id, username, team, station)
+
+    def complete_round(self, chat_id, required_users):
+        # 揃ったときの参加者も残しておく（あとから集計するため）
+        return self._logged({"op": "complete", "chat": chat_id}, self._store.complete_round, chat_id, required_users,
+                            skip=lambda participants: participants is None,
+                            extra=lambda participants: {"participants": {n: d["station"] for n, d in participants.items()}})
+
+    def reset(self, chat_id):
+        return self._logged({"op": "reset", "chat": chat_id}, self._store.reset, chat_id)
+
+    def __getattr__(self, name):
+        # 読み取りだけのメソッドはそのまま
+        return getattr(self._store, name)
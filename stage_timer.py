@@ -0,0 +1,19 @@
+import time
+from contextlib import contextmanager
+from metrics import STAGE_SECONDS
+
+
+@contextmanager
+def stage(timings, name):
+    """処理段階ごとの所要時間（秒）を timings に足し込む（timings が None なら測るだけ）
+
+    同じ時間を /metrics の tetsuoni_stage_seconds にも記録する。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
@@ -0,0 +1,284 @@
+import os
+import sqlite3
+import threading
+import copy
+from round_log import ROUND_LOG_PATH, RoundLog, LoggedStateStore, restore
+
+# --- ゲーム状態の保存先 ---
+# memory: プロセス内の辞書（ワーカー1つ向け）
+# sqlite: 同じホスト上の複数ワーカーで共有できるSQLite（WALモード）
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+STATE_DB_PATH = os.environ.get('STATE_DB_PATH', 'tetsuoni_state.db')
+
+PASS = "パス"
+
+
+class MemoryStateStore:
+    """プロセス内の辞書にラウンドの状態を持つ"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chats = {}
+
+    def _chat(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = {"reports": {}, "pass_limits": {}}
+            self._chats[chat_id] = chat
+        return chat
+
+    def set_pass_limits(self, chat_id, team_pass_limits):
+        """パス枠を設定する。最初の報告を受け付けたあとは変えない（変えられたらTrue）"""
+        with self._lock:
+            chat = self._chat(chat_id)
+            if chat["reports"]:
+                return False
+            chat["pass_limits"] = dict(team_pass_limits)
+            return True
+
+    def participant_count(self, chat_id):
+        """受け付けた報告の人数（0ならまだラウンドが始まっていない）"""
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            return len(chat["reports"]) if chat else 0
+
+    def get_participants(self, chat_id):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if not chat:
+                return {}
+            return {name: {"station": st} for name, st in chat["reports"].items()}
+
+    def report_pass(self, chat_id, username, team):
+        """パス枠を1つ消費して報告を記録する"""
+        with self._lock:
+            chat = self._chat(chat_id)
+            limits = chat["pass_limits"]
+            previous = chat["reports"].get(username)
+            if previous == PASS:
+                return {"status": "already", "remaining": limits.get(team, 0)}
+            if team not in limits:
+                return {"status": "no_rights", "remaining": 0}
+            if limits[team] <= 0:
+                return {"status": "exhausted", "remaining": 0}
+
+            limits[team] -= 1
+            chat["reports"][username] = PASS
+            return {"status": "ok", "remaining": limits[team],
+                    "is_update": previous is not None, "count": len(chat["reports"])}
+
+    def report_station(self, chat_id, username, team, station):
+        """駅の報告を記録する（直前がパスなら枠を1つ戻す）"""
+        with self._lock:
+            chat = self._chat(chat_id)
+            limits = chat["pass_limits"]
+            previous = chat["reports"].get(username)
+            was_pass = previous == PASS
+            if was_pass and team in limits:
+                limits[team] += 1
+
+            chat["reports"][username] = station
+            return {"status": "ok", "was_pass": was_pass, "remaining": limits.get(team, 0),
+                    "is_update": previous is not None, "count": len(chat["reports"])}
+
+    def complete_round(self, chat_id, required_users):
+        """人数が揃っていれば参加者を返してラウンドをリセットする（揃っていなければNone）"""
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if not chat or len(chat["reports"]) < required_users:
+                return None
+            participants = {name: {"station": st} for name, st in chat["reports"].items()}
+            del self._chats[chat_id]
+            return participants
+
+    def reset(self, chat_id):
+        with self._lock:
+            self._chats.pop(chat_id, None)
+
+    def export_state(self):
+        """全チャットの途中経過（スナップショット用）"""
+        with self._lock:
+            return copy.deepcopy(self._chats)
+
+    def import_state(self, chats):
+        with self._lock:
+            self._chats = copy.deepcopy(chats)
+
+
+class SQLiteStateStore:
+    """SQLite（WAL）に状態を持ち、同じホストの複数プロセスで共有する"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS rounds ("
+        " chat_id TEXT PRIMARY KEY,"
+        " participant_count INTEGER NOT NULL DEFAULT 0)",
+        "CREATE TABLE IF NOT EXISTS reports ("
+        " chat_id TEXT NOT NULL,"
+        " username TEXT NOT NULL,"
+        " station TEXT NOT NULL,"
+        " PRIMARY KEY (chat_id, username))",
+        "CREATE TABLE IF NOT EXISTS pass_limits ("
+        " chat_id TEXT NOT NULL,"
+        " team TEXT NOT NULL,"
+        " remaining INTEGER NOT NULL,"
+        " PRIMARY KEY (chat_id, team))",
+    )
+
+    def __init__(self, path=STATE_DB_PATH, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for stmt in self.SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self):
+        # 接続はスレッドごと・プロセスごと（fork後は作り直す）
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn())
+
+    def set_pass_limits(self, chat_id, team_pass_limits):
+        with self._transaction() as conn:
+            # 最初の報告を受け付けたあと（rounds の行ができたあと）は変えない
+            row = conn.execute(
+                "SELECT participant_count FROM rounds WHERE chat_id = ?", (chat_id,)).fetchone()
+            if row and row[0] > 0:
+                return False
+            conn.execute("DELETE FROM pass_limits WHERE chat_id = ?", (chat_id,))
+            conn.executemany(
+                "INSERT INTO pass_limits (chat_id, team, remaining) VALUES (?, ?, ?)",
+                [(chat_id, team, int(n)) for team, n in team_pass_limits.items()])
+            return True
+
+    def participant_count(self, chat_id):
+        row = self._conn().execute(
+            "SELECT participant_count FROM rounds WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_participants(self, chat_id):
+        rows = self._conn().execute(
+            "SELECT username, station FROM reports WHERE chat_id = ?", (chat_id,)).fetchall()
+        return {name: {"station": st} for name, st in rows}
+
+    def _previous_station(self, conn, chat_id, username):
+        row = conn.execute(
+            "SELECT station FROM reports WHERE chat_id = ? AND username = ?", (chat_id, username)).fetchone()
+        return row[0] if row else None
+
+    def _save_report(self, conn, chat_id, username, station, previous):
+        conn.execute(
+            "INSERT OR REPLACE INTO reports (chat_id, username, station) VALUES (?, ?, ?)",
+            (chat_id, username, station))
+        conn.execute("INSERT OR IGNORE INTO rounds (chat_id) VALUES (?)", (chat_id,))
+        if previous is None:
+            conn.execute(
+                "UPDATE rounds SET participant_count = participant_count + 1 WHERE chat_id = ?", (chat_id,))
+        return conn.execute(
+            "SELECT participant_count FROM rounds WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+
+    def _remaining(self, conn, chat_id, team):
+        row = conn.execute(
+            "SELECT remaining FROM pass_limits WHERE chat_id = ? AND team = ?", (chat_id, team)).fetchone()
+        return row[0] if row else None
+
+    def report_pass(self, chat_id, username, team):
+        with self._transaction() as conn:
+            previous = self._previous_station(conn, chat_id, username)
+            remaining = self._remaining(conn, chat_id, team)
+            if previous == PASS:
+                return {"status": "already", "remaining": remaining or 0}
+            if remaining is None:
+                return {"status": "no_rights", "remaining": 0}
+            if remaining <= 0:
+                return {"status": "exhausted", "remaining": 0}
+
+            conn.execute(
+                "UPDATE pass_limits SET remaining = remaining - 1 WHERE chat_id = ? AND team = ?",
+                (chat_id, team))
+            count = self._save_report(conn, chat_id, username, PASS, previous)
+            return {"status": "ok", "remaining": remaining - 1,
+                    "is_update": previous is not None, "count": count}
+
+    def report_station(self, chat_id, username, team, station):
+        with self._transaction() as conn:
+            previous = self._previous_station(conn, chat_id, username)
+            was_pass = previous == PASS
+            if was_pass:
+                conn.execute(
+                    "UPDATE pass_limits SET remaining = remaining + 1 WHERE chat_id = ? AND team = ?",
+                    (chat_id, team))
+            count = self._save_report(conn, chat_id, username, station, previous)
+            remaining = self._remaining(conn, chat_id, team)
+            return {"status": "ok", "was_pass": was_pass, "remaining": remaining or 0,
+                    "is_update": previous is not None, "count": count}
+
+    def complete_round(self, chat_id, required_users):
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT participant_count FROM rounds WHERE chat_id = ?", (chat_id,)).fetchone()
+            if not row or row[0] < required_users:
+                return None
+            rows = conn.execute(
+                "SELECT username, station FROM reports WHERE chat_id = ?", (chat_id,)).fetchall()
+            self._delete_chat(conn, chat_id)
+            return {name: {"station": st} for name, st in rows}
+
+    def reset(self, chat_id):
+        with self._transaction() as conn:
+            self._delete_chat(conn, chat_id)
+
+    @staticmethod
+    def _delete_chat(conn, chat_id):
+        for table in ("rounds", "reports", "pass_limits"):
+            conn.execute(f"DELETE FROM {table} WHERE chat_id = ?", (chat_id,))
+
+
+class _ImmediateTransaction:
+    # BEGIN IMMEDIATE で書き込みロックを先に取り、読み取り→更新を他プロセスと競合させない
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def _create_backend(backend):
+    if backend == 'sqlite':
+        return SQLiteStateStore(STATE_DB_PATH)
+    if backend != 'memory':
+        print(f"不明なSTATE_BACKEND: {backend}（memoryを使います）")
+    return MemoryStateStore()
+
+
+def create_state_store(backend=STATE_BACKEND, log_path=ROUND_LOG_PATH):
+    store = _create_backend(backend)
+    if not log_path:
+        return store
+
+    # プロセス内にしか状態がない memory は、記録から途中のラウンドを復元する
+    # （sqlite はDBに残っているので、記録は書き足すだけ）
+    if isinstance(store, MemoryStateStore):
+        try:
+            count = restore(store, log_path)
+            if count:
+                print(f"ラウンド記録から {count} 件を復元しました")
+        except OSError as e:
+            print(f"ラウンド記録からの復元に失敗: {e}")
+    return LoggedStateStore(store, RoundLog(log_path))
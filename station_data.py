@@ -1,611 +1,414 @@
 # 鉄鬼ごっこのゲームで使用する駅の座標データ
 # 路線図画像 (Rosenzu.png) 上のピクセル座標 (X, Y)
-STATION_COORDINATES = {
-    #銀座線
-    "渋谷": (482.00, 826.09),
-    "G01": (482.00, 826.09),
-    "表参道": (578.00, 815.09),
-    "G02": (578.00, 815.09),
-    "外苑前": (605.00, 816.09),
-    "G03": (605.00, 816.09),
-    "青山一丁目": (685.00, 818.09),
-    "G04": (685.00, 818.09),
-    "赤坂見附": (750.00, 854.09),
-    "G05": (750.00, 854.09),
-    "溜池山王": (808.00, 967.09),
-    "G06": (808.00, 967.09),
-    "虎ノ門": (900.00, 982.09),
-    "G07": (900.00, 982.09),
-    "新橋": (1018.00, 982.09),
-    "G08": (1018.00, 982.09),
-    "銀座": (1070.00, 892.09),
-    "G09": (1070.00, 892.09),
-    "京橋": (1151.00, 815.09),
-    "G10": (1151.00, 815.09),
-    "日本橋": (1192.00, 742.09),
-    "G11": (1192.00, 742.09),
-    "三越前": (1161.00, 684.09),
-    "G12": (1161.00, 684.09),
-    "神田": (1102.00, 655.09),
-    "G13": (1102.00, 655.09),
-    "末広町": (1084.00, 548.09),
-    "G14": (1084.00, 548.09),
-    "上野広小路": (1084.00, 481.09),
-    "G15": (1084.00, 481.09),
-    "上野": (1155.00, 415.09),
-    "G16": (1155.00, 415.09),
-    "稲荷町": (1218.00, 413.09),
-    "G17": (1218.00, 413.09),
-    "田原町": (1242.00, 415.09),
-    "G18": (1242.00, 415.09),
-    "浅草": (1304.00, 392.09),
-    "G19": (1304.00, 392.09),
 
-    #日比谷線
-    "中目黒": (442.00, 963.09),
-    "H01": (442.00, 963.09),
-    "恵比寿": (516.00, 1022.09),
-    "H02": (516.00, 1022.09),
-    "広尾": (596.00, 1022.09),
-    "H03": (596.00, 1022.09),
-    "六本木": (653.00, 1022.09),
-    "H04": (653.00, 1022.09),
-    "神谷町": (857.50, 1020.59),
-    "H05": (857.50, 1020.59),
-    "虎ノ門ヒルズ": (878.00, 1005.09),
-    "H06": (878.00, 1005.09),
-    "霞ヶ関": (877.00, 905.09),
-    "H07": (877.00, 905.09),
-    "日比谷": (982.00, 859.09),
-    "H08": (982.00, 859.09),
-    "銀座": (1071.00, 892.09),
-    "H09": (1071.00, 892.09),
-    "東銀座": (1109.00, 932.09),
-    "H10": (1109.00, 932.09),
-    "築地": (1175.00, 937.09),
-    "H11": (1175.00, 937.09),
-    "八丁堀": (1232.00, 879.09),
-    "H12": (1232.00, 879.09),
-    "茅場町": (1256.00, 758.09),
-    "H13": (1256.00, 758.09),
-    "人形町": (1233.00, 689.09),
-    "H14": (1233.00, 689.09),
-    "小伝馬町": (1171.00, 606.09),
-    "H15": (1171.00, 606.09),
-    "秋葉原": (1173.00, 563.59),
-    "H16": (1173.00, 563.59),
-    "仲御徒町": (1171.00, 537.09),
-    "H17": (1171.00, 537.09),
-    "上野": (1169.00, 430.09),
-    "H18": (1169.00, 430.09),
-    "入谷": (1170.00, 373.59),
-    "H19": (1170.00, 373.59),
-    "三ノ輪": (1171.00, 343.59),
-    "H20": (1171.00, 343.59),
-    "南千住": (1250.00, 287.59),
-    "H21": (1250.00, 287.59),
-    "北千住": (1279.00, 218.59),
-    "H22": (1279.00, 218.59),
+# 路線ごとの駅の並び: (路線記号, 路線名, [(駅名, 駅ナンバリング, 座標), ...])
+# 駅は駅ナンバリング順。支線は別の路線として分けて書く
+LINES = [
+    ("G", "銀座線", [
+        ("渋谷", "G01", (482.00, 826.09)),
+        ("表参道", "G02", (578.00, 815.09)),
+        ("外苑前", "G03", (605.00, 816.09)),
+        ("青山一丁目", "G04", (685.00, 818.09)),
+        ("赤坂見附", "G05", (750.00, 854.09)),
+        ("溜池山王", "G06", (808.00, 967.09)),
+        ("虎ノ門", "G07", (900.00, 982.09)),
+        ("新橋", "G08", (1018.00, 982.09)),
+        ("銀座", "G09", (1070.00, 892.09)),
+        ("京橋", "G10", (1151.00, 815.09)),
+        ("日本橋", "G11", (1192.00, 742.09)),
+        ("三越前", "G12", (1161.00, 684.09)),
+        ("神田", "G13", (1102.00, 655.09)),
+        ("末広町", "G14", (1084.00, 548.09)),
+        ("上野広小路", "G15", (1084.00, 481.09)),
+        ("上野", "G16", (1155.00, 415.09)),
+        ("稲荷町", "G17", (1218.00, 413.09)),
+        ("田原町", "G18", (1242.00, 415.09)),
+        ("浅草", "G19", (1304.00, 392.09)),
+    ]),
+    ("H", "日比谷線", [
+        ("中目黒", "H01", (442.00, 963.09)),
+        ("恵比寿", "H02", (516.00, 1022.09)),
+        ("広尾", "H03", (596.00, 1022.09)),
+        ("六本木", "H04", (653.00, 1022.09)),
+        ("神谷町", "H05", (857.50, 1020.59)),
+        ("虎ノ門ヒルズ", "H06", (878.00, 1005.09)),
+        ("霞ヶ関", "H07", (877.00, 905.09)),
+        ("日比谷", "H08", (982.00, 859.09)),
+        ("銀座", "H09", (1071.00, 892.09)),
+        ("東銀座", "H10", (1109.00, 932.09)),
+        ("築地", "H11", (1175.00, 937.09)),
+        ("八丁堀", "H12", (1232.00, 879.09)),
+        ("茅場町", "H13", (1256.00, 758.09)),
+        ("人形町", "H14", (1233.00, 689.09)),
+        ("小伝馬町", "H15", (1171.00, 606.09)),
+        ("秋葉原", "H16", (1173.00, 563.59)),
+        ("仲御徒町", "H17", (1171.00, 537.09)),
+        ("上野", "H18", (1169.00, 430.09)),
+        ("入谷", "H19", (1170.00, 373.59)),
+        ("三ノ輪", "H20", (1171.00, 343.59)),
+        ("南千住", "H21", (1250.00, 287.59)),
+        ("北千住", "H22", (1279.00, 218.59)),
+    ]),
+    ("M", "丸の内線", [
+        ("荻窪", "M01", (68.00, 472.59)),
+        ("南阿佐ヶ谷", "M02", (65.00, 497.59)),
+        ("新高円寺", "M03", (66.00, 518.59)),
+        ("東高円寺", "M04", (67.00, 543.59)),
+        ("新中野", "M05", (68.00, 564.59)),
+        ("中野坂上", "M06", (165.00, 583.59)),
+        ("西新宿", "M07", (281.00, 585.59)),
+        ("新宿", "M08", (381.00, 618.59)),
+        ("新宿三丁目", "M09", (505.50, 617.59)),
+        ("新宿御苑前", "M10", (569.00, 647.59)),
+        ("四谷三丁目", "M11", (649.00, 648.59)),
+        ("四ツ谷", "M12", (759.50, 661.59)),
+        ("赤坂見附", "M13", (760.00, 852.59)),
+        ("国会議事堂前", "M14", (831.50, 901.59)),
+        ("霞ヶ関", "M15", (892.50, 886.59)),
+        ("銀座", "M16", (1055.50, 875.59)),
+        ("東京", "M17", (1035.50, 743.59)),
+        ("大手町", "M18", (1034.50, 701.59)),
+        ("淡路町", "M19", (1020.00, 627.09)),
+        ("御茶ノ水", "M20", (962.00, 560.09)),
+        ("本郷三丁目", "M21", (924.00, 484.09)),
+        ("後楽園", "M22", (826.00, 458.09)),
+        ("茗荷谷", "M23", (766.00, 392.09)),
+        ("新大塚", "M24", (718.00, 354.09)),
+        ("池袋", "M25", (450.50, 371.09)),
+    ]),
+    ("Mb", "丸の内線（方南町支線）", [
+        ("中野新橋", "Mb05", (141.00, 610.09)),
+        ("中野富士見町", "Mb04", (141.00, 633.09)),
+        ("方南町", "Mb03", (141.00, 658.09)),
+    ]),
+    ("T", "東西線", [
+        ("中野", "T01", (131.00, 491.09)),
+        ("落合", "T02", (280.00, 511.59)),
+        ("高田馬場", "T03", (451.00, 493.59)),
+        ("早稲田", "T04", (530.50, 493.59)),
+        ("神楽坂", "T05", (658.50, 469.59)),
+        ("飯田橋", "T06", (778.00, 510.59)),
+        ("九段下", "T07", (838.00, 617.59)),
+        ("竹橋", "T08", (905.00, 677.59)),
+        ("大手町", "T09", (988.00, 712.59)),
+        ("日本橋", "T10", (1192.50, 734.59)),
+        ("茅場町", "T11", (1256.00, 758.59)),
+        ("門前仲町", "T12", (1309.00, 813.09)),
+        ("木場", "T13", (1355.00, 830.09)),
+        ("東陽町", "T14", (1355.00, 854.59)),
+        ("南砂町", "T15", (1357.00, 877.59)),
+        ("西葛西", "T16", (1358.00, 900.59)),
+        ("葛西", "T17", (1355.00, 921.59)),
+        ("浦安", "T18", (1357.00, 947.59)),
+        ("南行徳", "T19", (1357.00, 972.59)),
+        ("行徳", "T20", (1358.00, 994.59)),
+        ("妙典", "T21", (1380.00, 1022.09)),
+        ("原木中山", "T22", (1404.00, 1022.09)),
+        ("西船橋", "T23", (1445.00, 1020.09)),
+    ]),
+    ("C", "千代田線", [
+        ("代々木上原", "C01", (325.00, 769.59)),
+        ("代々木公園", "C02", (413.00, 769.59)),
+        ("明治神宮前", "C03", (496.00, 768.59)),
+        ("表参道", "C04", (579.00, 810.59)),
+        ("乃木坂", "C05", (642.50, 923.59)),
+        ("赤坂", "C06", (709.50, 923.59)),
+        ("国会議事堂前", "C07", (812.50, 922.59)),
+        ("霞ヶ関", "C08", (892.00, 922.59)),
+        ("日比谷", "C09", (964.00, 843.59)),
+        ("二重橋前", "C10", (982.00, 754.59)),
+        ("大手町", "C11", (982.00, 700.59)),
+        ("新御茶ノ水", "C12", (981.00, 596.09)),
+        ("湯島", "C13", (1021.50, 419.09)),
+        ("根津", "C14", (1021.50, 374.59)),
+        ("千駄木", "C15", (1021.50, 329.59)),
+        ("西日暮里", "C16", (1092.50, 265.59)),
+        ("町屋", "C17", (1179.50, 240.59)),
+        ("北千住", "C18", (1258.50, 218.59)),
+        ("綾瀬", "C19", (1333.50, 161.09)),
+        ("北綾瀬", "C20", (1356.00, 110.59)),
+    ]),
+    ("Y", "有楽町線", [
+        ("和光市", "Y01", (212.00, 173.09)),
+        ("地下鉄成増", "Y02", (294.00, 200.09)),
+        ("地下鉄赤塚", "Y03", (295.00, 222.09)),
+        ("平和台", "Y04", (296.00, 244.09)),
+        ("氷川台", "Y05", (294.00, 268.09)),
+        ("小竹向原", "Y06", (336.00, 310.09)),
+        ("千川", "Y07", (364.00, 354.09)),
+        ("要町", "Y08", (392.00, 388.09)),
+        ("池袋", "Y09", (452.00, 389.09)),
+        ("東池袋", "Y10", (571.00, 388.09)),
+        ("護国寺", "Y11", (694.50, 387.09)),
+        ("江戸川橋", "Y12", (745.50, 421.09)),
+        ("飯田橋", "Y13", (743.50, 508.09)),
+        ("市ヶ谷", "Y14", (753.50, 579.09)),
+        ("麹町", "Y15", (793.50, 732.09)),
+        ("永田町", "Y16", (806.50, 811.59)),
+        ("桜田門", "Y17", (896.00, 825.59)),
+        ("有楽町", "Y18", (1037.50, 825.59)),
+        ("銀座一丁目", "Y19", (1116.00, 866.59)),
+        ("新富町", "Y20", (1171.00, 920.09)),
+        ("月島", "Y21", (1230.00, 979.09)),
+        ("豊洲", "Y22", (1245.00, 1075.09)),
+        ("辰巳", "Y23", (1245.00, 1100.09)),
+        ("新木場", "Y24", (1372.50, 1125.09)),
+    ]),
+    ("Z", "半蔵門線", [
+        ("渋谷", "Z01", (497.00, 808.09)),
+        ("表参道", "Z02", (579.00, 807.09)),
+        ("青山一丁目", "Z03", (669.00, 806.09)),
+        ("永田町", "Z04", (779.50, 808.09)),
+        ("半蔵門", "Z05", (865.50, 755.09)),
+        ("九段下", "Z06", (833.50, 622.09)),
+        ("神保町", "Z07", (869.50, 622.09)),
+        ("大手町", "Z08", (979.00, 695.09)),
+        ("三越前", "Z09", (1160.00, 706.09)),
+        ("水天宮前", "Z10", (1284.50, 738.09)),
+        ("清澄白河", "Z11", (1381.00, 747.09)),
+        ("住吉", "Z12", (1430.00, 653.09)),
+        ("錦糸町", "Z13", (1429.00, 564.09)),
+        ("押上", "Z14", (1388.00, 424.09)),
+    ]),
+    ("N", "南北線", [
+        ("目黒", "N01", (509.00, 1087.59)),
+        ("白金台", "N02", (571.00, 1058.59)),
+        ("白金高輪", "N03", (707.00, 1084.59)),
+        ("麻布十番", "N04", (795.00, 1058.59)),
+        ("六本木一丁目", "N05", (795.00, 1005.59)),
+        ("溜池山王", "N06", (795.00, 952.59)),
+        ("永田町", "N07", (780.00, 803.59)),
+        ("四ツ谷", "N08", (743.00, 632.09)),
+        ("市ヶ谷", "N09", (743.00, 577.09)),
+        ("飯田橋", "N10", (753.00, 507.09)),
+        ("後楽園", "N11", (837.00, 443.09)),
+        ("東大前", "N12", (959.00, 349.09)),
+        ("本駒込", "N13", (959.00, 306.09)),
+        ("駒込", "N14", (958.50, 263.09)),
+        ("西ヶ原", "N15", (1009.50, 208.09)),
+        ("王子", "N16", (1106.50, 131.09)),
+        ("王子神谷", "N17", (1083.50, 108.09)),
+        ("志茂", "N18", (1017.50, 109.09)),
+        ("赤羽岩淵", "N19", (996.50, 61.09)),
+    ]),
+    ("F", "副都心線", [
+        ("和光市", "F01", (212.00, 173.09)),
+        ("地下鉄成増", "F02", (294.00, 200.09)),
+        ("地下鉄赤塚", "F03", (295.00, 222.09)),
+        ("平和台", "F04", (296.00, 244.09)),
+        ("氷川台", "F05", (294.00, 268.09)),
+        ("小竹向原", "F06", (336.00, 310.09)),
+        ("千川", "F07", (364.00, 354.09)),
+        ("要町", "F08", (392.00, 388.09)),
+        ("池袋", "F09", (452.00, 389.09)),
+        ("雑司ヶ谷", "F10", (503.50, 431.59)),
+        ("西早稲田", "F11", (504.50, 523.59)),
+        ("東新宿", "F12", (506.50, 561.59)),
+        ("新宿三丁目", "F13", (503.50, 618.59)),
+        ("北参道", "F14", (495.50, 726.59)),
+        ("明治神宮前", "F15", (494.50, 768.59)),
+        ("渋谷", "F16", (495.50, 809.59)),
+    ]),
+    ("A", "都営浅草線", [
+        ("西馬込", "A01", (334.00, 1146.09)),
+        ("馬込", "A02", (371.00, 1146.09)),
+        ("中延", "A03", (394.00, 1145.09)),
+        ("戸越", "A04", (466.00, 1146.09)),
+        ("五反田", "A05", (561.50, 1125.09)),
+        ("高輪台", "A06", (701.00, 1162.09)),
+        ("泉岳寺", "A07", (777.00, 1147.59)),
+        ("三田", "A08", (917.50, 1132.59)),
+        ("大門", "A09", (993.50, 1063.59)),
+        ("新橋", "A10", (1036.50, 999.59)),
+        ("東銀座", "A11", (1107.50, 930.59)),
+        ("宝町", "A12", (1189.00, 848.59)),
+        ("日本橋", "A13", (1219.50, 735.59)),
+        ("人形町", "A14", (1233.50, 688.59)),
+        ("東日本橋", "A15", (1294.50, 625.59)),
+        ("浅草橋", "A16", (1307.50, 569.59)),
+        ("蔵前", "A17", (1307.50, 512.59)),
+        ("浅草", "A18", (1306.50, 429.59)),
+        ("本所吾妻橋", "A19", (1330.50, 407.59)),
+        ("押上", "A20", (1374.00, 408.59)),
+    ]),
+    ("I", "都営三田線", [
+        ("目黒", "I01", (517.00, 1090.09)),
+        ("白金台", "I02", (572.00, 1066.09)),
+        ("白金高輪", "I03", (707.00, 1094.09)),
+        ("三田", "I04", (942.00, 1112.09)),
+        ("芝公園", "I05", (954.00, 1076.09)),
+        ("御成門", "I06", (955.00, 1030.09)),
+        ("内幸町", "I07", (954.00, 939.09)),
+        ("日比谷", "I08", (954.00, 827.09)),
+        ("大手町", "I09", (971.00, 708.09)),
+        ("神保町", "I10", (888.00, 620.09)),
+        ("水道橋", "I11", (888.00, 481.09)),
+        ("春日", "I12", (880.00, 410.09)),
+        ("白山", "I13", (882.00, 367.09)),
+        ("千石", "I14", (881.00, 340.59)),
+        ("巣鴨", "I15", (881.00, 262.59)),
+        ("西巣鴨", "I16", (881.00, 217.09)),
+        ("新板橋", "I17", (880.00, 177.09)),
+        ("板橋区役所前", "I18", (881.00, 154.09)),
+        ("板橋本町", "I19", (881.00, 131.59)),
+        ("本蓮沼", "I20", (849.00, 108.59)),
+        ("志村坂上", "I21", (825.00, 110.09)),
+        ("志村三丁目", "I22", (803.00, 109.09)),
+        ("蓮根", "I23", (779.00, 109.09)),
+        ("西台", "I24", (756.00, 109.09)),
+        ("高島平", "I25", (733.00, 109.09)),
+        ("新高島平", "I26", (710.00, 109.09)),
+        ("西高島平", "I27", (687.00, 109.09)),
+    ]),
+    ("S", "都営新宿線", [
+        ("新宿", "S01", (398.00, 657.59)),
+        ("新宿三丁目", "S02", (530.00, 626.59)),
+        ("曙橋", "S03", (647.00, 611.59)),
+        ("市ヶ谷", "S04", (785.50, 612.59)),
+        ("九段下", "S05", (837.00, 612.59)),
+        ("神保町", "S06", (887.50, 611.59)),
+        ("小川町", "S07", (1000.50, 612.59)),
+        ("岩本町", "S08", (1148.50, 592.59)),
+        ("馬喰横山", "S09", (1275.00, 625.59)),
+        ("浜町", "S10", (1319.00, 652.59)),
+        ("森下", "S11", (1383.50, 653.59)),
+        ("菊川", "S12", (1407.50, 653.59)),
+        ("住吉", "S13", (1429.50, 652.59)),
+        ("西大島", "S14", (1467.50, 684.59)),
+        ("大島", "S15", (1466.50, 708.59)),
+        ("東大島", "S16", (1467.50, 730.59)),
+        ("船堀", "S17", (1467.50, 753.59)),
+        ("一之江", "S18", (1466.50, 775.59)),
+        ("瑞江", "S19", (1467.50, 798.59)),
+        ("篠崎", "S20", (1466.50, 821.59)),
+        ("本八幡", "S21", (1494.50, 852.59)),
+    ]),
+    ("E", "都営大江戸線", [
+        ("新宿西口", "E01", (399.00, 607.59)),
+        ("東新宿", "E02", (504.00, 560.59)),
+        ("若松河田", "E03", (583.00, 562.59)),
+        ("牛込柳町", "E04", (613.00, 562.59)),
+        ("牛込神楽坂", "E05", (643.00, 562.59)),
+        ("飯田橋", "E06", (765.00, 478.59)),
+        ("春日", "E07", (863.50, 426.59)),
+        ("本郷三丁目", "E08", (940.50, 465.59)),
+        ("上野御徒町", "E09", (1102.50, 500.59)),
+        ("新御徒町", "E10", (1234.00, 502.59)),
+        ("蔵前", "E11", (1296.00, 500.59)),
+        ("両国", "E12", (1381.00, 568.59)),
+        ("森下", "E13", (1381.00, 654.09)),
+        ("清澄白河", "E14", (1381.00, 748.59)),
+        ("門前仲町", "E15", (1308.00, 810.59)),
+        ("月島", "E16", (1229.00, 979.59)),
+        ("勝どき", "E17", (1176.00, 1032.09)),
+        ("築地市場", "E18", (1137.00, 1020.09)),
+        ("汐留", "E19", (1088.00, 1034.09)),
+        ("大門", "E20", (994.00, 1064.09)),
+        ("赤羽橋", "E21", (858.00, 1087.09)),
+        ("麻布十番", "E22", (779.50, 1043.09)),
+        ("六本木", "E23", (669.50, 1007.09)),
+        ("青山一丁目", "E24", (667.50, 807.09)),
+        ("国立競技場", "E25", (557.50, 709.09)),
+        ("代々木", "E26", (412.00, 710.09)),
+        ("新宿", "E27", (384.00, 672.09)),
+        ("都庁前", "E28", (324.00, 636.09)),
+        ("西新宿五丁目", "E29", (237.00, 639.09)),
+        ("中野坂上", "E30", (167.50, 588.09)),
+        ("東中野", "E31", (167.50, 529.09)),
+        ("中井", "E32", (167.50, 420.09)),
+        ("落合南長崎", "E33", (167.50, 376.59)),
+        ("新江古田", "E34", (168.50, 353.09)),
+        ("練馬", "E35", (144.50, 312.09)),
+        ("豊島園", "E36", (119.50, 274.59)),
+        ("練馬春日町", "E37", (119.50, 249.59)),
+        ("光が丘", "E38", (119.50, 225.59)),
+    ]),
+]
 
-    #丸の内線(支線含む)
-    "荻窪": (68.00, 472.59),
-    "M01": (68.00, 472.59),
-    "南阿佐ヶ谷": (65.00, 497.59),
-    "M02": (65.00, 497.59),
-    "新高円寺": (66.00, 518.59),
-    "M03": (66.00, 518.59),
-    "東高円寺": (67.00, 543.59),
-    "M04": (67.00, 543.59),
-    "新中野": (68.00, 564.59),
-    "M05": (68.00, 564.59),
-    "中野坂上": (165.00, 583.59),
-    "M06": (165.00, 583.59),
-    "西新宿": (281.00, 585.59),
-    "M07": (281.00, 585.59),
-    "新宿": (381.00, 618.59),
-    "M08": (381.00, 618.59),
-    "新宿三丁目": (505.50, 617.59),
-    "M09": (505.50, 617.59),
-    "新宿御苑前": (569.00, 647.59),
-    "M10": (569.00, 647.59),
-    "四谷三丁目": (649.00, 648.59),
-    "M11": (649.00, 648.59),
-    "四ツ谷": (759.50, 661.59),
-    "M12": (759.50, 661.59),
-    "赤坂見附": (760.00, 852.59),
-    "M13": (760.00, 852.59),
-    "国会議事堂前": (831.50, 901.59),
-    "M14": (831.50, 901.59),
-    "霞ヶ関": (892.50, 886.59),
-    "M15": (892.50, 886.59),
-    "銀座": (1055.50, 875.59),
-    "M16": (1055.50, 875.59),
-    "東京": (1035.50, 743.59),
-    "M17": (1035.50, 743.59),
-    "大手町": (1034.50, 701.59),
-    "M18": (1034.50, 701.59),
-    "淡路町": (1020.00, 627.09),
-    "M19": (1020.00, 627.09),
-    "御茶ノ水": (962.00, 560.09),
-    "M20": (962.00, 560.09),
-    "本郷三丁目": (924.00, 484.09),
-    "M21": (924.00, 484.09),
-    "後楽園": (826.00, 458.09),
-    "M22": (826.00, 458.09),
-    "茗荷谷": (766.00, 392.09),
-    "M23": (766.00, 392.09),
-    "新大塚": (718.00, 354.09),
-    "M24": (718.00, 354.09),
-    "池袋": (450.50, 371.09),
-    "M25": (450.50, 371.09),
-    "中野新橋": (141.00, 610.09),
-    "Mb05": (141.00, 610.09),
-    "中野富士見町": (141.00, 633.09),
-    "Mb04": (141.00, 633.09),
-    "方南町": (141.00, 658.09),
-    "Mb03": (141.00, 658.09),
+# 路線の並びだけでは表せない隣り合う駅
+#   丸の内線の方南町支線は中野坂上で分かれる
+#   都営大江戸線は都庁前で環状部（新宿西口方面）と放射部（西新宿五丁目方面）に分かれる
+EXTRA_LINKS = [
+    ("中野坂上", "中野新橋"),
+    ("都庁前", "新宿西口"),
+]
 
-    #東西線
-    "中野": (131.00, 491.09),
-    "T01": (131.00, 491.09),
-    "落合": (280.00, 511.59),
-    "T02": (280.00, 511.59),
-    "高田馬場": (451.00, 493.59),
-    "T03": (451.00, 493.59),
-    "早稲田": (530.50, 493.59),
-    "T04": (530.50, 493.59),
-    "神楽坂": (658.50, 469.59),
-    "T05": (658.50, 469.59),
-    "飯田橋": (778.00, 510.59),
-    "T06": (778.00, 510.59),
-    "九段下": (838.00, 617.59),
-    "T07": (838.00, 617.59),
-    "竹橋": (905.00, 677.59),
-    "T08": (905.00, 677.59),
-    "大手町": (988.00, 712.59),
-    "T09": (988.00, 712.59),
-    "日本橋": (1192.50, 734.59),
-    "T10": (1192.50, 734.59),
-    "茅場町": (1256.00, 758.59),
-    "T11": (1256.00, 758.59),
-    "門前仲町": (1309.00, 813.09),
-    "T12": (1309.00, 813.09),
-    "木場": (1355.00, 830.09),
-    "T13": (1355.00, 830.09),
-    "東陽町": (1355.00, 854.59),
-    "T14": (1355.00, 854.59),
-    "南砂町": (1357.00, 877.59),
-    "T15": (1357.00, 877.59),
-    "西葛西": (1358.00, 900.59),
-    "T16": (1358.00, 900.59),
-    "葛西": (1355.00, 921.59),
-    "T17": (1355.00, 921.59),
-    "浦安": (1357.00, 947.59),
-    "T18": (1357.00, 947.59),
-    "南行徳": (1357.00, 972.59),
-    "T19": (1357.00, 972.59),
-    "行徳": (1358.00, 994.59),
-    "T20": (1358.00, 994.59),
-    "妙典": (1380.00, 1022.09),
-    "T21": (1380.00, 1022.09),
-    "原木中山": (1404.00, 1022.09),
-    "T22": (1404.00, 1022.09),
-    "西船橋": (1445.00, 1020.09),
-    "T23": (1445.00, 1020.09),
+# 駅名・駅ナンバリング → 座標
+# 同じ駅名が複数の路線にある場合は、後に書いた路線の座標になる
+STATION_COORDINATES = {}
+for _line_code, _line_name, _stations in LINES:
+    for _name, _number, _xy in _stations:
+        STATION_COORDINATES[_name] = _xy
+        STATION_COORDINATES[_number] = _xy
 
-    #千代田線
-    "代々木上原": (325.00, 769.59),
-    "C01": (325.00, 769.59),
-    "代々木公園": (413.00, 769.59),
-    "C02": (413.00, 769.59),
-    "明治神宮前": (496.00, 768.59),
-    "C03": (496.00, 768.59),
-    "表参道": (579.00, 810.59),
-    "C04": (579.00, 810.59),
-    "乃木坂": (642.50, 923.59),
-    "C05": (642.50, 923.59),
-    "赤坂": (709.50, 923.59),
-    "C06": (709.50, 923.59),
-    "国会議事堂前": (812.50, 922.59),
-    "C07": (812.50, 922.59),
-    "霞ヶ関": (892.00, 922.59),
-    "C08": (892.00, 922.59),
-    "日比谷": (964.00, 843.59),
-    "C09": (964.00, 843.59),
-    "二重橋前": (982.00, 754.59),
-    "C10": (982.00, 754.59),
-    "大手町": (982.00, 700.59),
-    "C11": (982.00, 700.59),
-    "新御茶ノ水": (981.00, 596.09),
-    "C12": (981.00, 596.09),
-    "湯島": (1021.50, 419.09),
-    "C13": (1021.50, 419.09),
-    "根津": (1021.50, 374.59),
-    "C14": (1021.50, 374.59),
-    "千駄木": (1021.50, 329.59),
-    "C15": (1021.50, 329.59),
-    "西日暮里": (1092.50, 265.59),
-    "C16": (1092.50, 265.59),
-    "町屋": (1179.50, 240.59),
-    "C17": (1179.50, 240.59),
-    "北千住": (1258.50, 218.59),
-    "C18": (1258.50, 218.59),
-    "綾瀬": (1333.50, 161.09),
-    "C19": (1333.50, 161.09),
-    "北綾瀬": (1356.00, 110.59),
-    "C20": (1356.00, 110.59),
-
-    #有楽町線
-    "和光市": (212.00, 173.09),
-    "Y01": (212.00, 173.09),
-    "地下鉄成増": (294.00, 200.09),
-    "Y02": (294.00, 200.09),
-    "地下鉄赤塚": (295.00, 222.09),
-    "Y03": (295.00, 222.09),
-    "平和台": (296.00, 244.09),
-    "Y04": (296.00, 244.09),
-    "氷川台": (294.00, 268.09),
-    "Y05": (294.00, 268.09),
-    "小竹向原": (336.00, 310.09),
-    "Y06": (336.00, 310.09),
-    "千川": (364.00, 354.09),
-    "Y07": (364.00, 354.09),
-    "要町": (392.00, 388.09),
-    "Y08": (392.00, 388.09),
-    "池袋": (452.00, 389.09),
-    "Y09": (452.00, 389.09),
-    "東池袋": (571.00, 388.09),
-    "Y10": (571.00, 388.09),
-    "護国寺": (694.50, 387.09),
-    "Y11": (694.50, 387.09),
-    "江戸川橋": (745.50, 421.09),
-    "Y12": (745.50, 421.09),
-    "飯田橋": (743.50, 508.09),
-    "Y13": (743.50, 508.09),
-    "市ヶ谷": (753.50, 579.09),
-    "Y14": (753.50, 579.09),
-    "麹町": (793.50, 732.09),
-    "Y15": (793.50, 732.09),
-    "永田町": (806.50, 811.59),
-    "Y16": (806.50, 811.59),
-    "桜田門": (896.00, 825.59),
-    "Y17": (896.00, 825.59),
-    "有楽町": (1037.50, 825.59),
-    "Y18": (1037.50, 825.59),
-    "銀座一丁目": (1116.00, 866.59),
-    "Y19": (1116.00, 866.59),
-    "新富町": (1171.00, 920.09),
-    "Y20": (1171.00, 920.09),
-    "月島": (1230.00, 979.09),
-    "Y21": (1230.00, 979.09),
-    "豊洲": (1245.00, 1075.09),
-    "Y22": (1245.00, 1075.09),
-    "辰巳": (1245.00, 1100.09),
-    "Y23": (1245.00, 1100.09),
-    "新木場": (1372.50, 1125.09),
-    "Y24": (1372.50, 1125.09),
-
-    #半蔵門線
-    "渋谷": (497.00, 808.09),
-    "Z01": (497.00, 808.09),
-    "表参道": (579.00, 807.09),
-    "Z02": (579.00, 807.09),
-    "青山一丁目": (669.00, 806.09),
-    "Z03": (669.00, 806.09),
-    "永田町": (779.50, 808.09),
-    "Z04": (779.50, 808.09),
-    "半蔵門": (865.50, 755.09),
-    "Z05": (865.50, 755.09),
-    "九段下": (833.50, 622.09),
-    "Z06": (833.50, 622.09),
-    "神保町": (869.50, 622.09),
-    "Z07": (869.50, 622.09),
-    "大手町": (979.00, 695.09),
-    "Z08": (979.00, 695.09),
-    "三越前": (1160.00, 706.09),
-    "Z09": (1160.00, 706.09),
-    "水天宮前": (1284.50, 738.09),
-    "Z10": (1284.50, 738.09),
-    "清澄白河": (1381.00, 747.09),
-    "Z11": (1381.00, 747.09),
-    "住吉": (1430.00, 653.09),
-    "Z12": (1430.00, 653.09),
-    "錦糸町": (1429.00, 564.09),
-    "Z13": (1429.00, 564.09),
-    "押上": (1388.00, 424.09),
-    "Z14": (1388.00, 424.09),
-
-    #南北線
-    "目黒": (509.00, 1087.59),
-    "N01": (509.00, 1087.59),
-    "白金台": (571.00, 1058.59),
-    "N02": (571.00, 1058.59),
-    "白金高輪": (707.00, 1084.59),
-    "N03": (707.00, 1084.59),
-    "麻布十番": (795.00, 1058.59),
-    "N04": (795.00, 1058.59),
-    "六本木一丁目": (795.00, 1005.59),
-    "N05": (795.00, 1005.59),
-    "溜池山王": (795.00, 952.59),
-    "N06": (795.00, 952.59),
-    "永田町": (780.00, 803.59),
-    "N07": (780.00, 803.59),
-    "四ツ谷": (743.00, 632.09),
-    "N08": (743.00, 632.09),
-    "市ヶ谷": (743.00, 577.09),
-    "N09": (743.00, 577.09),
-    "飯田橋": (753.00, 507.09),
-    "N10": (753.00, 507.09),
-    "後楽園": (837.00, 443.09),
-    "N11": (837.00, 443.09),
-    "東大前": (959.00, 349.09),
-    "N12": (959.00, 349.09),
-    "本駒込": (959.00, 306.09),
-    "N13": (959.00, 306.09),
-    "駒込": (958.50, 263.09),
-    "N14": (958.50, 263.09),
-    "西ヶ原": (1009.50, 208.09),
-    "N15": (1009.50, 208.09),
-    "王子": (1106.50, 131.09),
-    "N16": (1106.50, 131.09),
-    "王子神谷": (1083.50, 108.09),
-    "N17": (1083.50, 108.09),
-    "志茂": (1017.50, 109.09),
-    "N18": (1017.50, 109.09),
-    "赤羽岩淵": (996.50, 61.09),
-    "N19": (996.50, 61.09),
-
-    #副都心線
-    "和光市": (212.00, 173.09),
-    "F01": (212.00, 173.09),
-    "地下鉄成増": (294.00, 200.09),
-    "F02": (294.00, 200.09),
-    "地下鉄赤塚": (295.00, 222.09),
-    "F03": (295.00, 222.09),
-    "平和台": (296.00, 244.09),
-    "F04": (296.00, 244.09),
-    "氷川台": (294.00, 268.09),
-    "F05": (294.00, 268.09),
-    "小竹向原": (336.00, 310.09),
-    "F06": (336.00, 310.09),
-    "千川": (364.00, 354.09),
-    "F07": (364.00, 354.09),
-    "要町": (392.00, 388.09),
-    "F08": (392.00, 388.09),
-    "池袋": (452.00, 389.09),
-    "F09": (452.00, 389.09),
-    "雑司ヶ谷": (503.50, 431.59),
-    "F10": (503.50, 431.59),
-    "西早稲田": (504.50, 523.59),
-    "F11": (504.50, 523.59),
-    "東新宿": (506.50, 561.59),
-    "F12": (506.50, 561.59),
-    "新宿三丁目": (503.50, 618.59),
-    "F13": (503.50, 618.59),
-    "北参道": (495.50, 726.59),
-    "F14": (495.50, 726.59),
-    "明治神宮前": (494.50, 768.59),
-    "F15": (494.50, 768.59),
-    "渋谷": (495.50, 809.59),
-    "F16": (495.50, 809.59),
-
-    #都営浅草線
-    "西馬込": (334.00, 1146.09),
-    "A01": (334.00, 1146.09),
-    "馬込": (371.00, 1146.09),
-    "A02": (371.00, 1146.09),
-    "中延": (394.00, 1145.09),
-    "A03": (394.00, 1145.09),
-    "戸越": (466.00, 1146.09),
-    "A04": (466.00, 1146.09),
-    "五反田": (561.50, 1125.09),
-    "A05": (561.50, 1125.09),
-    "高輪台": (701.00, 1162.09),
-    "A06": (701.00, 1162.09),
-    "泉岳寺": (777.00, 1147.59),
-    "A07": (777.00, 1147.59),
-    "三田": (917.50, 1132.59),
-    "A08": (917.50, 1132.59),
-    "大門": (993.50, 1063.59),
-    "A09": (993.50, 1063.59),
-    "新橋": (1036.50, 999.59),
-    "A10": (1036.50, 999.59),
-    "東銀座": (1107.50, 930.59),
-    "A11": (1107.50, 930.59),
-    "宝町": (1189.00, 848.59),
-    "A12": (1189.00, 848.59),
-    "日本橋": (1219.50, 735.59),
-    "A13": (1219.50, 735.59),
-    "人形町": (1233.50, 688.59),
-    "A14": (1233.50, 688.59),
-    "東日本橋": (1294.50, 625.59),
-    "A15": (1294.50, 625.59),
-    "浅草橋": (1307.50, 569.59),
-    "A16": (1307.50, 569.59),
-    "蔵前": (1307.50, 512.59),
-    "A17": (1307.50, 512.59),
-    "浅草": (1306.50, 429.59),
-    "A18": (1306.50, 429.59),
-    "本所吾妻橋": (1330.50, 407.59),
-    "A19": (1330.50, 407.59),
-    "押上": (1374.00, 408.59),
-    "A20": (1374.00, 408.59),
-
-    #都営三田線
-    "目黒": (517.00, 1090.09),
-    "I01": (517.00, 1090.09),
-    "白金台": (572.00, 1066.09),
-    "I02": (572.00, 1066.09),
-    "白金高輪": (707.00, 1094.09),
-    "I03": (707.00, 1094.09),
-    "三田": (942.00, 1112.09),
-    "I04": (942.00, 1112.09),
-    "芝公園": (954.00, 1076.09),
-    "I05": (954.00, 1076.09),
-    "御成門": (955.00, 1030.09),
-    "I06": (955.00, 1030.09),
-    "内幸町": (954.00, 939.09),
-    "I07": (954.00, 939.09),
-    "日比谷": (954.00, 827.09),
-    "I08": (954.00, 827.09),
-    "大手町": (971.00, 708.09),
-    "I09": (971.00, 708.09),
-    "神保町": (888.00, 620.09),
-    "I10": (888.00, 620.09),
-    "水道橋": (888.00, 481.09),
-    "I11": (888.00, 481.09),
-    "春日": (880.00, 410.09),
-    "I12": (880.00, 410.09),
-    "白山": (882.00, 367.09),
-    "I13": (882.00, 367.09),
-    "千石": (881.00, 340.59),
-    "I14": (881.00, 340.59),
-    "巣鴨": (881.00, 262.59),
-    "I15": (881.00, 262.59),
-    "西巣鴨": (881.00, 217.09),
-    "I16": (881.00, 217.09),
-    "新板橋": (880.00, 177.09),
-    "I17": (880.00, 177.09),
-    "板橋区役所前": (881.00, 154.09),
-    "I18": (881.00, 154.09),
-    "板橋本町": (881.00, 131.59),
-    "I19": (881.00, 131.59),
-    "本蓮沼": (849.00, 108.59),
-    "I20": (849.00, 108.59),
-    "志村坂上": (825.00, 110.09),
-    "I21": (825.00, 110.09),
-    "志村三丁目": (803.00, 109.09),
-    "I22": (803.00, 109.09),
-    "蓮根": (779.00, 109.09),
-    "I23": (779.00, 109.09),
-    "西台": (756.00, 109.09),
-    "I24": (756.00, 109.09),
-    "高島平": (733.00, 109.09),
-    "I25": (733.00, 109.09),
-    "新高島平": (710.00, 109.09),
-    "I26": (710.00, 109.09),
-    "西高島平": (687.00, 109.09),
-    "I27": (687.00, 109.09),
-
-    #都営新宿線
-    "新宿": (398.00, 657.59),
-    "S01": (398.00, 657.59),
-    "新宿三丁目": (530.00, 626.59),
-    "S02": (530.00, 626.59),
-    "曙橋": (647.00, 611.59),
-    "S03": (647.00, 611.59),
-    "市ヶ谷": (785.50, 612.59),
-    "S04": (785.50, 612.59),
-    "九段下": (837.00, 612.59),
-    "S05": (837.00, 612.59),
-    "神保町": (887.50, 611.59),
-    "S06": (887.50, 611.59),
-    "小川町": (1000.50, 612.59),
-    "S07": (1000.50, 612.59),
-    "岩本町": (1148.50, 592.59),
-    "S08": (1148.50, 592.59),
-    "馬喰横山": (1275.00, 625.59),
-    "S09": (1275.00, 625.59),
-    "浜町": (1319.00, 652.59),
-    "S10": (1319.00, 652.59),
-    "森下": (1383.50, 653.59),
-    "S11": (1383.50, 653.59),
-    "菊川": (1407.50, 653.59),
-    "S12": (1407.50, 653.59),
-    "住吉": (1429.50, 652.59),
-    "S13": (1429.50, 652.59),
-    "西大島": (1467.50, 684.59),
-    "S14": (1467.50, 684.59),
-    "大島": (1466.50, 708.59),
-    "S15": (1466.50, 708.59),
-    "東大島": (1467.50, 730.59),
-    "S16": (1467.50, 730.59),
-    "船堀": (1467.50, 753.59),
-    "S17": (1467.50, 753.59),
-    "一之江": (1466.50, 775.59),
-    "S18": (1466.50, 775.59),
-    "瑞江": (1467.50, 798.59),
-    "S19": (1467.50, 798.59),
-    "篠崎": (1466.50, 821.59),
-    "S20": (1466.50, 821.59),
-    "本八幡": (1494.50, 852.59),
-    "S21": (1494.50, 852.59),
+# 駅名の読み（ひらがな入力の照合用）
+STATION_READINGS = {
+    "渋谷": "しぶや", "表参道": "おもてさんどう", "外苑前": "がいえんまえ", "青山一丁目": "あおやまいっちょうめ",
+    "赤坂見附": "あかさかみつけ", "溜池山王": "ためいけさんのう", "虎ノ門": "とらのもん", "新橋": "しんばし",
+    "銀座": "ぎんざ", "京橋": "きょうばし", "日本橋": "にほんばし", "三越前": "みつこしまえ",
+    "神田": "かんだ", "末広町": "すえひろちょう", "上野広小路": "うえのひろこうじ", "上野": "うえの",
+    "稲荷町": "いなりちょう", "田原町": "たわらまち", "浅草": "あさくさ",
+    "中目黒": "なかめぐろ", "恵比寿": "えびす", "広尾": "ひろお", "六本木": "ろっぽんぎ",
+    "神谷町": "かみやちょう", "虎ノ門ヒルズ": "とらのもんひるず", "霞ヶ関": "かすみがせき", "日比谷": "ひびや",
+    "東銀座": "ひがしぎんざ", "築地": "つきじ", "八丁堀": "はっちょうぼり", "茅場町": "かやばちょう",
+    "人形町": "にんぎょうちょう", "小伝馬町": "こでんまちょう", "秋葉原": "あきはばら", "仲御徒町": "なかおかちまち",
+    "入谷": "いりや", "三ノ輪": "みのわ", "南千住": "みなみせんじゅ", "北千住": "きたせんじゅ",
+    "荻窪": "おぎくぼ", "南阿佐ヶ谷": "みなみあさがや", "新高円寺": "しんこうえんじ", "東高円寺": "ひがしこうえんじ",
+    "新中野": "しんなかの", "中野坂上": "なかのさかうえ", "西新宿": "にししんじゅく", "新宿": "しんじゅく",
+    "新宿三丁目": "しんじゅくさんちょうめ", "新宿御苑前": "しんじゅくぎょえんまえ", "四谷三丁目": "よつやさんちょうめ",
+    "四ツ谷": "よつや", "国会議事堂前": "こっかいぎじどうまえ", "東京": "とうきょう", "大手町": "おおてまち",
+    "淡路町": "あわじちょう", "御茶ノ水": "おちゃのみず", "本郷三丁目": "ほんごうさんちょうめ", "後楽園": "こうらくえん",
+    "茗荷谷": "みょうがだに", "新大塚": "しんおおつか", "池袋": "いけぶくろ", "中野新橋": "なかのしんばし",
+    "中野富士見町": "なかのふじみちょう", "方南町": "ほうなんちょう",
+    "中野": "なかの", "落合": "おちあい", "高田馬場": "たかだのばば", "早稲田": "わせだ",
+    "神楽坂": "かぐらざか", "飯田橋": "いいだばし", "九段下": "くだんした", "竹橋": "たけばし",
+    "門前仲町": "もんぜんなかちょう", "木場": "きば", "東陽町": "とうようちょう", "南砂町": "みなみすなまち",
+    "西葛西": "にしかさい", "葛西": "かさい", "浦安": "うらやす", "南行徳": "みなみぎょうとく",
+    "行徳": "ぎょうとく", "妙典": "みょうでん", "原木中山": "ばらきなかやま", "西船橋": "にしふなばし",
+    "代々木上原": "よよぎうえはら", "代々木公園": "よよぎこうえん", "明治神宮前": "めいじじんぐうまえ", "乃木坂": "のぎざか",
+    "赤坂": "あかさか", "二重橋前": "にじゅうばしまえ", "新御茶ノ水": "しんおちゃのみず", "湯島": "ゆしま",
+    "根津": "ねづ", "千駄木": "せんだぎ", "西日暮里": "にしにっぽり", "町屋": "まちや",
+    "綾瀬": "あやせ", "北綾瀬": "きたあやせ",
+    "和光市": "わこうし", "地下鉄成増": "ちかてつなります", "地下鉄赤塚": "ちかてつあかつか", "平和台": "へいわだい",
+    "氷川台": "ひかわだい", "小竹向原": "こたけむかいはら", "千川": "せんかわ", "要町": "かなめちょう",
+    "東池袋": "ひがしいけぶくろ", "護国寺": "ごこくじ", "江戸川橋": "えどがわばし", "市ヶ谷": "いちがや",
+    "麹町": "こうじまち", "永田町": "ながたちょう", "桜田門": "さくらだもん", "有楽町": "ゆうらくちょう",
+    "銀座一丁目": "ぎんざいっちょうめ", "新富町": "しんとみちょう", "月島": "つきしま", "豊洲": "とよす",
+    "辰巳": "たつみ", "新木場": "しんきば",
+    "半蔵門": "はんぞうもん", "神保町": "じんぼうちょう", "水天宮前": "すいてんぐうまえ", "清澄白河": "きよすみしらかわ",
+    "住吉": "すみよし", "錦糸町": "きんしちょう", "押上": "おしあげ",
+    "目黒": "めぐろ", "白金台": "しろかねだい", "白金高輪": "しろかねたかなわ", "麻布十番": "あざぶじゅうばん",
+    "六本木一丁目": "ろっぽんぎいっちょうめ", "東大前": "とうだいまえ", "本駒込": "ほんこまごめ", "駒込": "こまごめ",
+    "西ヶ原": "にしがはら", "王子": "おうじ", "王子神谷": "おうじかみや", "志茂": "しも",
+    "赤羽岩淵": "あかばねいわぶち",
+    "雑司ヶ谷": "ぞうしがや", "西早稲田": "にしわせだ", "東新宿": "ひがししんじゅく", "北参道": "きたさんどう",
+    "西馬込": "にしまごめ", "馬込": "まごめ", "中延": "なかのぶ", "戸越": "とごし",
+    "五反田": "ごたんだ", "高輪台": "たかなわだい", "泉岳寺": "せんがくじ", "三田": "みた",
+    "大門": "だいもん", "宝町": "たからちょう", "東日本橋": "ひがしにほんばし", "浅草橋": "あさくさばし",
+    "蔵前": "くらまえ", "本所吾妻橋": "ほんじょあづまばし",
+    "芝公園": "しばこうえん", "御成門": "おなりもん", "内幸町": "うちさいわいちょう", "水道橋": "すいどうばし",
+    "春日": "かすが", "白山": "はくさん", "千石": "せんごく", "巣鴨": "すがも",
+    "西巣鴨": "にしすがも", "新板橋": "しんいたばし", "板橋区役所前": "いたばしくやくしょまえ", "板橋本町": "いたばしほんちょう",
+    "本蓮沼": "もとはすぬま", "志村坂上": "しむらさかうえ", "志村三丁目": "しむらさんちょうめ", "蓮根": "はすね",
+    "西台": "にしだい", "高島平": "たかしまだいら", "新高島平": "しんたかしまだいら", "西高島平": "にしたかしまだいら",
+    "曙橋": "あけぼのばし", "小川町": "おがわまち", "岩本町": "いわもとちょう", "馬喰横山": "ばくろよこやま",
+    "浜町": "はまちょう", "森下": "もりした", "菊川": "きくかわ", "西大島": "にしおおじま",
+    "大島": "おおじま", "東大島": "ひがしおおじま", "船堀": "ふなぼり", "一之江": "いちのえ",
+    "瑞江": "みずえ", "篠崎": "しのざき", "本八幡": "もとやわた",
+    "新宿西口": "しんじゅくにしぐち", "若松河田": "わかまつかわだ", "牛込柳町": "うしごめやなぎちょう", "牛込神楽坂": "うしごめかぐらざか",
+    "上野御徒町": "うえのおかちまち", "新御徒町": "しんおかちまち", "両国": "りょうごく", "勝どき": "かちどき",
+    "築地市場": "つきじしじょう", "汐留": "しおどめ", "赤羽橋": "あかばねばし", "国立競技場": "こくりつきょうぎじょう",
+    "代々木": "よよぎ", "都庁前": "とちょうまえ", "西新宿五丁目": "にししんじゅくごちょうめ", "東中野": "ひがしなかの",
+    "中井": "なかい", "落合南長崎": "おちあいみなみながさき", "新江古田": "しんえごた", "練馬": "ねりま",
+    "豊島園": "としまえん", "練馬春日町": "ねりまかすがちょう", "光が丘": "ひかりがおか",
+}
 
-    #都営大江戸線
-    "新宿西口": (399.00, 607.59),
-    "E01": (399.00, 607.59),
-    "東新宿": (504.00, 560.59),
-    "E02": (504.00, 560.59),
-    "若松河田": (583.00, 562.59),
-    "E03": (583.00, 562.59),
-    "牛込柳町": (613.00, 562.59),
-    "E04": (613.00, 562.59),
-    "牛込神楽坂": (643.00, 562.59),
-    "E05": (643.00, 562.59),
-    "飯田橋": (765.00, 478.59),
-    "E06": (765.00, 478.59),
-    "春日": (863.50, 426.59),
-    "E07": (863.50, 426.59),
-    "本郷三丁目": (940.50, 465.59),
-    "E08": (940.50, 465.59),
-    "上野御徒町": (1102.50, 500.59),
-    "E09": (1102.50, 500.59),
-    "新御徒町": (1234.00, 502.59),
-    "E10": (1234.00, 502.59),
-    "蔵前": (1296.00, 500.59),
-    "E11": (1296.00, 500.59),
-    "両国": (1381.00, 568.59),
-    "E12": (1381.00, 568.59),
-    "森下": (1381.00, 654.09),
-    "E13": (1381.00, 654.09),
-    "清澄白河": (1381.00, 748.59),
-    "E14": (1381.00, 748.59),
-    "門前仲町": (1308.00, 810.59),
-    "E15": (1308.00, 810.59),
-    "月島": (1229.00, 979.59),
-    "E16": (1229.00, 979.59),
-    "勝どき": (1176.00, 1032.09),
-    "E17": (1176.00, 1032.09),
-    "築地市場": (1137.00, 1020.09),
-    "E18": (1137.00, 1020.09),
-    "汐留": (1088.00, 1034.09),
-    "E19": (1088.00, 1034.09),
-    "大門": (994.00, 1064.09),
-    "E20": (994.00, 1064.09),
-    "赤羽橋": (858.00, 1087.09),
-    "E21": (858.00, 1087.09),
-    "麻布十番": (779.50, 1043.09),
-    "E22": (779.50, 1043.09),
-    "六本木": (669.50, 1007.09),
-    "E23": (669.50, 1007.09),
-    "青山一丁目": (667.50, 807.09),
-    "E24": (667.50, 807.09),
-    "国立競技場": (557.50, 709.09),
-    "E25": (557.50, 709.09),
-    "代々木": (412.00, 710.09),
-    "E26": (412.00, 710.09),
-    "新宿": (384.00, 672.09),
-    "E27": (384.00, 672.09),
-    "都庁前": (324.00, 636.09),
-    "E28": (324.00, 636.09),
-    "西新宿五丁目": (237.00, 639.09),
-    "E29": (237.00, 639.09),
-    "中野坂上": (167.50, 588.09),
-    "E30": (167.50, 588.09),
-    "東中野": (167.50, 529.09),
-    "E31": (167.50, 529.09),
-    "中井": (167.50, 420.09),
-    "E32": (167.50, 420.09),
-    "落合南長崎": (167.50, 376.59),
-    "E33": (167.50, 376.59),
-    "新江古田": (168.50, 353.09),
-    "E34": (168.50, 353.09),
-    "練馬": (144.50, 312.09),
-    "E35": (144.50, 312.09),
-    "豊島園": (119.50, 274.59),
-    "E36": (119.50, 274.59),
-    "練馬春日町": (119.50, 249.59),
-    "E37": (119.50, 249.59),
-    "光が丘": (119.50, 225.59),
-    "E38": (119.50, 225.59),
+# よく使われる別表記 → 駅名
+STATION_ALIASES = {
+    "四谷": "四ツ谷",
+    "お茶の水": "御茶ノ水",
+    "成増": "地下鉄成増",
+    "赤塚": "地下鉄赤塚",
+    "明治神宮": "明治神宮前",
+    "原宿": "明治神宮前",
 }
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import numpy as np
+from station_data import LINES, EXTRA_LINKS
+from stations import STATIONS, LINE_STATION_IDS, station_id
+
+# --- 駅のつながり（路線の並びから作るグラフ）と、全駅間の駅数 ---
+# 乗換駅は駅名でまとめた1つの駅（stations.STATIONS）として扱う。
+# 全駅間の駅数の表は一度計算したらディスクに保存し、次からは読み込むだけにする
+STATION_GRAPH_CACHE_DIR = os.environ.get(
+    'STATION_GRAPH_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache'))
+
+# 地図の報告文に「いちばん近い他チームの駅」を付ける
+MAP_NEAREST_SUMMARY = os.environ.get('MAP_NEAREST_SUMMARY', '0') == '1'
+
+# 行き来できない駅どうしの値
+UNREACHABLE = -1
+
+
+def _build_edges():
+    edges = set()
+    for line_code, _line_name, _stations in LINES:
+        ids = LINE_STATION_IDS[line_code]
+        for a, b in zip(ids[:-1], ids[1:]):
+            if a != b:
+                edges.add((min(a, b), max(a, b)))
+    for name_a, name_b in EXTRA_LINKS:
+        a, b = station_id(name_a), station_id(name_b)
+        edges.add((min(a, b), max(a, b)))
+    return np.array(sorted(edges), dtype=np.int32).reshape(-1, 2)
+
+
+def compute_hops(edges, n):
+    """全駅間の最少駅数（n×n、int16）。隣接行列を使った幅優先探索を全駅同時に進める"""
+    adj = np.zeros((n, n), dtype=np.float32)
+    adj[edges[:, 0], edges[:, 1]] = 1
+    adj[edges[:, 1], edges[:, 0]] = 1
+
+    hops = np.full((n, n), UNREACHABLE, dtype=np.int16)
+    np.fill_diagonal(hops, 0)
+    frontier = np.eye(n, dtype=np.float32)
+    distance = 0
+    while frontier.any():
+        distance += 1
+        # 今の端から1駅進んで、まだ届いていない駅が次の端
+        reached = (frontier @ adj > 0) & (hops == UNREACHABLE)
+        hops[reached] = distance
+        frontier = reached.astype(np.float32)
+    return hops
+
+
+def _cache_path(edges, n):
+    # 駅の並びが変わったら別のファイルになるよう、グラフの内容をファイル名に含める
+    digest = hashlib.sha1(np.int32(n).tobytes() + edges.tobytes()).hexdigest()[:16]
+    return os.path.join(STATION_GRAPH_CACHE_DIR, f"station_hops_{digest}.npy")
+
+
+def load_hops(edges, n):
+    path = _cache_path(edges, n)
+    try:
+        # 読み取り専用で mmap する（複数ワーカーでもメモリを共有できる）
+        hops = np.load(path, mmap_mode='r')
+        if hops.shape == (n, n):
+            return hops
+    except (OSError, ValueError):
+        pass
+
+    hops = compute_hops(edges, n)
+    try:
+        os.makedirs(STATION_GRAPH_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, hops)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"駅数の表を保存できませんでした（毎回計算します）: {e}")
+    hops.setflags(write=False)
+    return hops
+
+
+EDGES = _build_edges()
+HOPS = load_hops(EDGES, len(STATIONS))
+
+
+def nearest(sources, targets):
+    """sources の各駅について、targets の中でいちばん近い駅を (id, 駅数) で返す
+
+    targets が空か、どれにも行けない駅は (None, None)。
+    """
+    sources = np.asarray(sources, dtype=np.int32)
+    targets = np.asarray(targets, dtype=np.int32)
+    if len(targets) == 0:
+        return [(None, None)] * len(sources)
+    sub = HOPS[np.ix_(sources, targets)].astype(np.int32)
+    sub[sub == UNREACHABLE] = np.iinfo(np.int32).max
+    best = sub.argmin(axis=1)
+    dist = sub[np.arange(len(sources)), best]
+    return [(int(targets[j]), int(d)) if d != np.iinfo(np.int32).max else (None, None)
+            for j, d in zip(best, dist)]
+
+
+def nearest_opponents(team_stations):
+    """チームごとの駅（{チーム: [駅id, ...]}）から、各駅にいちばん近い他チームの駅を求める
+
+    [(駅id, チーム, 相手の駅id, 相手のチーム, 駅数), ...] を返す（相手がいなければ含めない）。
+    """
+    owner = {}
+    for team, sids in team_stations.items():
+        for sid in sids:
+            owner.setdefault(sid, []).append(team)
+
+    result = []
+    for team, sids in team_stations.items():
+        others = sorted({sid for t, ids in team_stations.items() if t != team for sid in ids})
+        if not sids or not others:
+            continue
+        for sid, (other, hops) in zip(sids, nearest(sids, others)):
+            if other is None:
+                continue
+            other_team = next(t for t in owner[other] if t != team)
+            result.append((sid, team, other, other_team, hops))
+    return result
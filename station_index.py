@@ -0,0 +1,147 @@
+import re
+import unicodedata
+from station_data import STATION_COORDINATES, STATION_READINGS, STATION_ALIASES
+
+# 駅ナンバリング（G01, Mb05 など）
+_CODE_RE = re.compile(r'^([A-Z]{1,2})-?0*(\d{1,2})$')
+# 全角・半角を問わない空白
+_SPACE_RE = re.compile(r'\s+')
+
+# 「ヶ」「ノ」など表記ゆれしやすい文字の置き換え候補
+_VARIANT_CHARS = {
+    "ヶ": ("ケ", "が", "ガ"),
+    "ノ": ("の",),
+    "が": ("ヶ", "ケ"),
+}
+
+
+def to_hiragana(text):
+    # カタカナ（ァ〜ヶ）をひらがなに寄せる
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
+
+
+def normalize(text):
+    """照合用の正規化（NFKC・空白除去・「駅」の除去・英字は大文字）"""
+    text = unicodedata.normalize("NFKC", text)
+    text = _SPACE_RE.sub("", text)
+    if len(text) > 1 and text.endswith("駅"):
+        text = text[:-1]
+    return text.upper()
+
+
+def _code_key(text):
+    m = _CODE_RE.match(text)
+    if not m:
+        return None
+    return m.group(1), int(m.group(2))
+
+
+def _variants(name):
+    variants = {name}
+    for src, dsts in _VARIANT_CHARS.items():
+        for v in list(variants):
+            if src in v:
+                for dst in dsts:
+                    variants.add(v.replace(src, dst))
+    return variants
+
+
+def _ngrams(text):
+    # 1文字と2文字の組（2文字の駅名の打ち間違いも拾えるように）
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class StationIndex:
+    """STATION_COORDINATES から一度だけ作る駅名の照合インデックス"""
+
+    def __init__(self, coordinates, readings=None, aliases=None):
+        self._exact = {}
+        self._codes = {}
+        self._gram_index = {}
+        self._search_keys = {}
+
+        for key in coordinates:
+            code = _code_key(key.upper())
+            if code:
+                self._codes[code] = key
+                continue
+            for variant in _variants(normalize(key)):
+                self._add(variant, key)
+
+        for name, reading in (readings or {}).items():
+            if name in coordinates:
+                self._add(normalize(reading), name)
+
+        for alias, name in (aliases or {}).items():
+            if name in coordinates:
+                self._add(normalize(alias), name)
+
+    def _add(self, norm, key):
+        self._exact.setdefault(norm, key)
+        # 候補探し用（比較はひらがなに揃える）
+        search = to_hiragana(norm)
+        if search in self._search_keys:
+            return
+        self._search_keys[search] = key
+        for gram in _ngrams(search):
+            self._gram_index.setdefault(gram, set()).add(search)
+
+    def lookup(self, text):
+        """入力を STATION_COORDINATES のキーに変換する（見つからなければNone）"""
+        if text in self._exact:
+            return self._exact[text]
+        norm = normalize(text)
+        code = _code_key(norm)
+        if code:
+            return self._codes.get(code)
+        key = self._exact.get(norm)
+        if key is None:
+            key = self._search_keys.get(to_hiragana(norm))
+        return key
+
+    def suggest(self, text, limit=3):
+        """近い駅名の候補を返す（n-gramで絞り込んでから編集距離で並べる）"""
+        query = to_hiragana(normalize(text))
+        if not query:
+            return []
+
+        counts = {}
+        for gram in _ngrams(query):
+            for candidate in self._gram_index.get(gram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+        if not counts:
+            return []
+
+        # 共通n-gramの多い順に上位だけ編集距離を計算する
+        shortlist = sorted(counts, key=lambda c: -counts[c])[:30]
+        max_dist = max(1, len(query) // 2)
+        scored = []
+        for candidate in shortlist:
+            dist = edit_distance(query, candidate)
+            if dist <= max_dist:
+                scored.append((dist, -counts[candidate], candidate))
+        scored.sort()
+
+        results = []
+        for _, _, candidate in scored:
+            name = self._search_keys[candidate]
+            if name not in results:
+                results.append(name)
+            if len(results) >= limit:
+                break
+        return results
+
+
+station_index = StationIndex(STATION_COORDINATES, STATION_READINGS, STATION_ALIASES)
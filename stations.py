@@ -0,0 +1,61 @@
+from collections import namedtuple
+import numpy as np
+from station_data import LINES, STATION_COORDINATES, STATION_READINGS
+
+# 物理的な駅1つにつき1レコード（乗換駅は駅名でまとめる）
+#   id       : STATION_XY などの配列の添字
+#   codes    : その駅の駅ナンバリング（例: 銀座 → ("G09", "H09", "M16")）
+#   lines    : その駅を通る路線記号（例: ("G", "H", "M")）
+Station = namedtuple("Station", ["id", "name", "reading", "codes", "lines"])
+
+
+def _build():
+    names = []
+    codes = {}
+    lines = {}
+    line_station_ids = {}
+    name_to_id = {}
+
+    for line_code, _line_name, line_stations in LINES:
+        ids = []
+        for name, number, _xy in line_stations:
+            sid = name_to_id.get(name)
+            if sid is None:
+                sid = len(names)
+                name_to_id[name] = sid
+                names.append(name)
+                codes[sid] = []
+                lines[sid] = []
+            codes[sid].append(number)
+            if line_code not in lines[sid]:
+                lines[sid].append(line_code)
+            ids.append(sid)
+        line_station_ids[line_code] = np.array(ids, dtype=np.int32)
+
+    stations = tuple(
+        Station(sid, name, STATION_READINGS.get(name, ""), tuple(codes[sid]), tuple(lines[sid]))
+        for sid, name in enumerate(names))
+
+    # 座標は駅名で引いたときの値（STATION_COORDINATES と同じ）を使う
+    xy = np.array([STATION_COORDINATES[name] for name in names], dtype=np.float32)
+    xy.setflags(write=False)
+
+    # 駅名・駅ナンバリングのどちらからでも id を引けるようにする
+    key_to_id = dict(name_to_id)
+    for station in stations:
+        for number in station.codes:
+            key_to_id[number] = station.id
+
+    return stations, xy, key_to_id, line_station_ids
+
+
+STATIONS, STATION_XY, KEY_TO_ID, LINE_STATION_IDS = _build()
+
+
+def station_id(key):
+    """駅名または駅ナンバリングから駅の id を返す（無ければNone）"""
+    return KEY_TO_ID.get(key)
+
+
+def station_name(sid):
+    return STATIONS[sid].name
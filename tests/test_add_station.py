@@ -0,0 +1,138 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import add_station
+from benchmarks.fakes import FakeLineBotApi
+from state_store import MemoryStateStore
+from stations import STATIONS
+
+REQUIRED = 3
+
+
+def _event(chat_id, user_id, text):
+    source = SimpleNamespace(type="group", group_id=chat_id, user_id=user_id)
+    return SimpleNamespace(source=source, message=SimpleNamespace(text=text), reply_token=f"reply-{user_id}")
+
+
+def _reports(chat_id, count):
+    return [_event(chat_id, f"user{i}", STATIONS[i].name) for i in range(count)]
+
+
+def _reply_texts(api):
+    return {token: messages.text for kind, token, messages in api.sent if kind == "reply"}
+
+
+@pytest.fixture
+def maps(monkeypatch):
+    """送った地図の (チャット, 参加者, 返信先) を記録する（スコアの取得と描画はしない）"""
+    sent = []
+    monkeypatch.setattr(add_station, "MAP_CROP", False)
+    monkeypatch.setattr(add_station, "MAP_PRERENDER", False)
+    monkeypatch.setattr(add_station, "start_game_logic", lambda event, api: ("スコア", 1, ["赤", "青", "白"]))
+    monkeypatch.setattr(add_station, "send_map_with_pins",
+                        lambda chat_id, participants, api, reply_token=None, render=None:
+                        sent.append((chat_id, participants, reply_token)))
+    return sent
+
+
+def test_reports_after_round_is_full_go_to_next_round(maps):
+    store = MemoryStateStore()
+    api = FakeLineBotApi()
+    events = _reports("batch-full", REQUIRED + 2)
+
+    add_station.handle_chat_reports(events, api, store, {}, REQUIRED)
+
+    # 揃えた報告までの3人で1回だけ地図を送る
+    assert len(maps) == 1
+    chat_id, participants, reply_token = maps[0]
+    assert sorted(participants) == [f"user{i}" for i in range(REQUIRED)]
+    assert reply_token == f"reply-user{REQUIRED - 1}"
+
+    # 後から届いた2件は締めたラウンドに数えない（1件ずつ届いたときと同じく次のラウンドになる）
+    replies = _reply_texts(api)
+    assert f"現在: 1 / {REQUIRED} 人" in replies[f"reply-user{REQUIRED}"]
+    assert f"現在: 2 / {REQUIRED} 人" in replies[f"reply-user{REQUIRED + 1}"]
+    assert not any(f"{REQUIRED + 1} / {REQUIRED}" in text for text in replies.values())
+    assert store.participant_count("batch-full") == 2
+
+
+def test_batch_matches_sequential_delivery(maps):
+    events = _reports("batch-seq", REQUIRED + 2)
+
+    batch_store, batch_api = MemoryStateStore(), FakeLineBotApi()
+    add_station.handle_chat_reports(events, batch_api, batch_store, {}, REQUIRED)
+    batch_maps = list(maps)
+    maps.clear()
+
+    seq_store, seq_api = MemoryStateStore(), FakeLineBotApi()
+    for event in events:
+        add_station.handle_chat_reports([event], seq_api, seq_store, {}, REQUIRED)
+
+    assert batch_maps == maps
+    assert _reply_texts(batch_api) == _reply_texts(seq_api)
+    assert batch_store.get_participants("batch-seq") == seq_store.get_participants("batch-seq")
+
+
+class _SlowStore(MemoryStateStore):
+    """報告の反映に時間がかかるストア（同時に反映していた数の最大を記録する）"""
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.inside = 0
+        self.max_inside = 0
+        self._count_lock = threading.Lock()
+
+    def report_station(self, chat_id, username, team, station):
+        with self._count_lock:
+            self.inside += 1
+            self.max_inside = max(self.max_inside, self.inside)
+        try:
+            time.sleep(self.delay)
+            return super().report_station(chat_id, username, team, station)
+        finally:
+            with self._count_lock:
+                self.inside -= 1
+
+
+def _run_concurrently(store, batches):
+    api = FakeLineBotApi()
+    barrier = threading.Barrier(len(batches))
+
+    def deliver(events):
+        barrier.wait()
+        add_station.handle_chat_reports(events, api, store, {}, REQUIRED)
+
+    threads = [threading.Thread(target=deliver, args=(events,)) for events in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return api
+
+
+def test_same_chat_reports_are_serialized(maps):
+    store = _SlowStore()
+    events = _reports("locked", 2)
+
+    api = _run_concurrently(store, [[events[0]], [events[1]]])
+
+    # 同じチャットの報告は1つずつ反映され、人数は 1 と 2 に分かれる
+    assert store.max_inside == 1
+    counts = sorted(text.split("現在: ")[1] for text in _reply_texts(api).values())
+    assert counts == [f"1 / {REQUIRED} 人", f"2 / {REQUIRED} 人"]
+    assert store.participant_count("locked") == 2
+
+
+def test_other_chats_run_in_parallel(maps):
+    store = _SlowStore(delay=0.2)
+
+    _run_concurrently(store, [_reports("parallel-a", 1), _reports("parallel-b", 1)])
+
+    # ロックはチャットごとなので、別のチャットは待たずに並行して進む
+    assert store.max_inside == 2
+    assert store.participant_count("parallel-a") == 1
+    assert store.participant_count("parallel-b") == 1
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from advantage import ScoreFetcher
+
+
+class _CountingSource:
+    """呼ばれるたびに red_score が 1 ずつ増える取得元"""
+
+    timeout = 5
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            return {"red_score": self.calls}
+
+
+def _wait_for_refresh(fetcher):
+    inflight = fetcher._inflight
+    if inflight is not None:
+        inflight.join(5)
+
+
+def test_fresh_value_is_cached():
+    fetcher = ScoreFetcher(_CountingSource(), ttl=60, max_age=120)
+    assert fetcher.get() == {"red_score": 1}
+    assert fetcher.get() == {"red_score": 1}
+    assert fetcher.source.calls == 1
+
+
+def test_stale_value_is_returned_and_refreshed_in_background():
+    fetcher = ScoreFetcher(_CountingSource(delay=0.1), ttl=0.05, max_age=10)
+    assert fetcher.get() == {"red_score": 1}
+    time.sleep(0.1)
+
+    # ttl を過ぎても max_age までは前回の値をすぐ返す
+    start = time.perf_counter()
+    assert fetcher.get() == {"red_score": 1}
+    assert time.perf_counter() - start < 0.05
+
+    _wait_for_refresh(fetcher)
+    assert fetcher.get() == {"red_score": 2}
+
+
+def test_value_older_than_max_age_waits_for_a_fresh_fetch():
+    fetcher = ScoreFetcher(_CountingSource(), ttl=0.01, max_age=0.05)
+    assert fetcher.get() == {"red_score": 1}
+    time.sleep(0.1)
+
+    # 古すぎる値は返さず、取り直した値を返す
+    assert fetcher.get() == {"red_score": 2}
+
+
+def test_value_older_than_max_age_waits_for_inflight_refresh():
+    fetcher = ScoreFetcher(_CountingSource(delay=0.1), ttl=0.01, max_age=0.05)
+    assert fetcher.get() == {"red_score": 1}
+    time.sleep(0.1)
+    fetcher.prefetch()
+
+    # 取得中のものを待ち、二重に問い合わせない
+    assert fetcher.get() == {"red_score": 2}
+    assert fetcher.source.calls == 2
@@ -0,0 +1,128 @@
+import os
+import queue
+import threading
+import time
+from linebot.exceptions import LineBotApiError
+from env_config import env_int, env_float
+
+# --- 非同期処理の設定 ---
+ASYNC_WEBHOOK = os.environ.get('ASYNC_WEBHOOK', '0') == '1'
+
+WEBHOOK_WORKERS = env_int('WEBHOOK_WORKERS', 4)
+
+WEBHOOK_QUEUE_SIZE = env_int('WEBHOOK_QUEUE_SIZE', 100)
+
+# 終了時（デプロイ・再起動）にキューに残った分を処理し終えるまで待つ秒数
+# （gunicorn の graceful_timeout より短くすること）
+WEBHOOK_SHUTDOWN_TIMEOUT = env_float('WEBHOOK_SHUTDOWN_TIMEOUT', 20.0)
+
+# リプライトークンの有効期限（LINEの仕様では約1分）に余裕を持たせた秒数
+REPLY_TOKEN_TTL = env_float('REPLY_TOKEN_TTL', 50.0)
+
+
+class EventWorkerPool:
+    """上限付きのキューと固定数のワーカースレッドでWebhookを処理する"""
+
+    def __init__(self, num_workers=WEBHOOK_WORKERS, max_queue=WEBHOOK_QUEUE_SIZE):
+        self.num_workers = max(1, num_workers)
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        # gunicornのfork後に初めて使われたプロセスでスレッドを起動する
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._run, name=f"webhook-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, func, *args):
+        """キューに積めたらTrue、満杯か終了処理中ならFalseを返す"""
+        self._ensure_started()
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._queue.put_nowait((func, args))
+            except queue.Full:
+                return False
+        return True
+
+    def shutdown(self, timeout=WEBHOOK_SHUTDOWN_TIMEOUT):
+        """受付を止め、キューに残った分を処理し終えるまで最大 timeout 秒待つ
+
+        200 を返し済みのイベントは LINE から再送されないので、時間内に処理できなかった分はログに残す。
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+        running = sum(1 for t in threads if t.is_alive())
+        left = []
+        while True:
+            try:
+                left.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if running or left:
+            print(f"終了までに処理できなかったWebhook: 処理中 {running} 件 / 未処理 {len(left)} 件")
+        for func, args in left:
+            print(f"未処理のWebhook: {getattr(func, '__name__', func)} {repr(args)[:1000]}")
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            try:
+                func, args = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                # 終了処理中でキューが空になったら抜ける
+                if self._closed:
+                    return
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Webhook処理エラー: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class ReplyFallbackApi:
+    """リプライトークンが期限切れなら push_message に切り替える line_bot_api のラッパー"""
+
+    def __init__(self, line_bot_api, chat_id, event_timestamp=None):
+        self._api = line_bot_api
+        self._chat_id = chat_id
+        # event.timestamp はミリ秒
+        self._received_at = event_timestamp / 1000.0 if event_timestamp else time.time()
+
+    def _token_expired(self):
+        return time.time() - self._received_at > REPLY_TOKEN_TTL
+
+    def reply_message(self, reply_token, messages, *args, **kwargs):
+        if reply_token and not self._token_expired():
+            try:
+                return self._api.reply_message(reply_token, messages, *args, **kwargs)
+            except LineBotApiError as e:
+                # 400 は無効（期限切れ・使用済み）なリプライトークン
+                if e.status_code != 400:
+                    raise
+                print(f"リプライ失敗のためプッシュに切り替え: {e}")
+        return self._api.push_message(self._chat_id, messages)
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)